@@ -6,12 +6,29 @@
 import json
 import os
 
+import click
 import mysql.connector
-from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
-
-from resources import guests, hosts, locations, panelists, scorekeepers, shows
-from resources.dicts import error_dict, fail_dict, success_dict
+from mysql.connector.errors import DatabaseError, PoolError, ProgrammingError
+from flask import Flask, g, abort, current_app, make_response, request
+
+from resources import batch, guests, hosts, locations, panelists, scorekeepers, shows
+from resources.batch import parse_batch, parse_ids
+from resources.bulk import (DEFAULT_BULK_CONFIG, bulk_queries,
+                            describe_differences, verify_collections)
+from resources.cache import DEFAULT_CACHE_CONFIG, response_cache
+from resources.compression import DEFAULT_COMPRESSION_CONFIG, compressor
+from resources.database import LazyConnection, create_pool
+from resources.dicts import error_dict, fail_dict, json_response, success_dict
+from resources.encoding import JSONEncoder, json_provider
+from resources.fields import requested_fields
+from resources.metrics import (DEFAULT_METRICS_CONFIG, finish_request,
+                               metrics_registry, start_request)
+from resources.pagination import parse_page
+from resources.series import negotiate_series
+from resources.snapshot import DEFAULT_SNAPSHOT_CONFIG, dataset
+from resources.statistics import verify_scores_lists
+from resources.tracing import DEFAULT_TRACING_CONFIG, finish_trace, start_trace, tracer
+from resources.version import DEFAULT_VERSION_CONFIG, data_version
 from wwdtm import VERSION as WWDTM_VERSION
 
 API_VERSION = "0.4.0"
@@ -20,6 +37,7 @@ app = Flask(__name__)
 app.url_map.strict_slashes = False
 app.config["JSON_SORT_KEYS"] = False
 app.config["JSONIFY_PRETTYPRINT_REGULAR"] = False
+app.json_encoder = JSONEncoder
 
 #region Bootstrap Functions
 def load_config():
@@ -53,10 +71,141 @@ def load_config():
 
 #endregion
 
+#region Database Connection Functions
+def get_database_connection():
+    """Return the database connection for the current request, which is
+    only checked out from the connection pool when it is first used"""
+    if "database_connection" not in g:
+        g.database_connection = LazyConnection(connection_pool)
+
+    return g.database_connection
+
+@app.teardown_appcontext
+def release_database_connection(exception):
+    """Return the database connection used by the current request to
+    the connection pool"""
+    database_connection = g.pop("database_connection", None)
+    if database_connection is not None:
+        database_connection.close()
+
+#endregion
+
+#region Request Metrics and Tracing Functions
+@app.before_request
+def start_request_metrics():
+    """Start collecting the metrics for the current request"""
+    start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the metrics for the current request once the response
+    has been sent"""
+    return finish_request(response)
+
+@app.before_request
+def start_query_trace():
+    """Start tracing the queries of the current request if query
+    tracing was requested"""
+    start_trace()
+
+@app.after_request
+def add_query_trace(response):
+    """Add the Server-Timing header to traced requests and log their
+    queries once the response has been sent"""
+    return finish_trace(response)
+
+#endregion
+
+#region Request Parameter Functions
+def get_page():
+    """Return the pagination parameters requested with the limit, offset
+    and cursor query parameters, or None if the request is not
+    paginated"""
+    try:
+        return parse_page(request.args)
+    except ValueError as err:
+        response = json_response(fail_dict("paging", str(err)))
+        abort(make_response(response, 400))
+
+def get_ids():
+    """Return the IDs requested with the ids query parameter, or None if
+    the parameter was not provided"""
+    ids = request.args.get("ids")
+    if ids is None:
+        return None
+
+    try:
+        return parse_ids(ids)
+    except ValueError as err:
+        response = json_response(fail_dict("ids", str(err)))
+        abort(make_response(response, 400))
+
+@app.before_request
+def validate_fields():
+    """Reject requests with an invalid fields query parameter before
+    they are handled"""
+    try:
+        requested_fields()
+    except ValueError as err:
+        response = json_response(fail_dict("fields", str(err)))
+        abort(make_response(response, 400))
+
+def stream_requested():
+    """Return whether the client requested a streamed response with the
+    stream query parameter"""
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+def ndjson_requested():
+    """Return whether the client prefers a newline-delimited JSON
+    response based on the Accept request header"""
+    best_match = request.accept_mimetypes.best_match(["application/json",
+                                                      "application/x-ndjson"])
+    return best_match == "application/x-ndjson"
+
+#endregion
+
+#region Response Processing Functions
+NDJSON_ENDPOINTS = ("get_guest_details",
+                    "get_host_details",
+                    "get_location_recordings",
+                    "get_panelists_details",
+                    "get_scorekeeper_details",
+                    "get_show_details")
+
+SERIES_ENDPOINTS = ("get_panelist_scores_ordered_pair_by_id",
+                    "get_panelist_scores_ordered_pair_by_slug")
+
+@app.after_request
+def add_vary_headers(response):
+    """Mark responses from endpoints that negotiate newline-delimited
+    JSON or binary score series as varying by the Accept request
+    header"""
+    if request.endpoint in NDJSON_ENDPOINTS + SERIES_ENDPOINTS:
+        response.vary.add("Accept")
+
+    return response
+
+#endregion
+
 #region Default Error Handlers
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify(fail_dict("resource", "Resource not found")), 404
+    return json_response(fail_dict("resource", "Resource not found")), 404
+
+@app.errorhandler(PoolError)
+def pool_exhausted(error):
+    response = error_dict("Unable to obtain a database connection")
+    return json_response(response), 503
+
+@app.errorhandler(500)
+def internal_server_error(error):
+    # Connections are checked out inside the endpoint handlers, which
+    # turn any unexpected error into a 500 response
+    database_connection = g.get("database_connection")
+    if database_connection is not None and database_connection.checkout_error:
+        return pool_exhausted(database_connection.checkout_error)
+
+    return error
 
 #endregion
 
@@ -68,7 +217,38 @@ def get_version():
         "api": API_VERSION,
         "wwdtm": WWDTM_VERSION
         }
-    return jsonify(success_dict("version", version_info)), 200
+    response = json_response(success_dict("version", version_info))
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route("/v1.0/cache")
+def get_cache_stats():
+    """Returns the response cache hit and miss counters for the worker
+    handling the request"""
+    return json_response(success_dict("cache", response_cache.stats())), 200
+
+@app.route("/metrics")
+def get_metrics():
+    """Returns the request metrics of all workers in the Prometheus text
+    exposition format"""
+    if not metrics_registry.enabled:
+        abort(404)
+
+    return current_app.response_class(metrics_registry.exposition(),
+                                      content_type="text/plain; version=0.0.4; "
+                                                   "charset=utf-8")
+
+@app.route("/v1.0/batch", methods=["POST"])
+def post_batch():
+    """Retrieve the details of many guests, hosts, locations, panelists,
+    scorekeepers or shows by ID in a single request"""
+    try:
+        requested = parse_batch(request.get_json(silent=True))
+    except ValueError as err:
+        response = json_response(fail_dict("batch", str(err)))
+        return response, 400
+
+    return batch.get_batch(requested, get_database_connection())
 
 #endregion
 
@@ -76,32 +256,41 @@ def get_version():
 @app.route("/v1.0/guests", methods=["GET"])
 def get_guests():
     """Retrieve a list of guests and their corresponding information"""
-    return guests.get_guests(database_connection)
+    return guests.get_guests(get_page(), get_database_connection())
 
 @app.route("/v1.0/guests/<int:guest_id>", methods=["GET"])
 def get_guest_by_id(guest_id: int):
     """Retrieve a guest based on their ID"""
-    return guests.get_guest_by_id(guest_id, database_connection)
+    return guests.get_guest_by_id(guest_id, get_database_connection())
 
 @app.route("/v1.0/guests/<int:guest_id>/details", methods=["GET"])
 def get_guest_details_by_id(guest_id: int):
     """Retrieve a guest with their appearance data based on their ID"""
-    return guests.get_guest_details_by_id(guest_id, database_connection)
+    return guests.get_guest_details_by_id(guest_id, get_database_connection())
 
 @app.route("/v1.0/guests/details", methods=["GET"])
 def get_guest_details():
     """Retrieve all guests and their corresponding appearances"""
-    return guests.get_guest_details(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("guests", "guests", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return guests.stream_guest_details(ndjson, get_database_connection())
+
+    return guests.get_guest_details(get_page(), get_database_connection())
 
 @app.route("/v1.0/guests/slug/<string:guest_slug>", methods=["GET"])
 def get_guest_by_slug(guest_slug: str):
     """Retrieve a guest based on their slug"""
-    return guests.get_guest_by_slug(guest_slug, database_connection)
+    return guests.get_guest_by_slug(guest_slug, get_database_connection())
 
 @app.route("/v1.0/guests/slug/<string:guest_slug>/details", methods=["GET"])
 def get_guest_details_by_slug(guest_slug: str):
     """Retrieve a guest with their appearances based on their slug"""
-    return guests.get_guest_details_by_slug(guest_slug, database_connection)
+    return guests.get_guest_details_by_slug(guest_slug, get_database_connection())
 
 #endregion
 
@@ -109,32 +298,41 @@ def get_guest_details_by_slug(guest_slug: str):
 @app.route("/v1.0/hosts", methods=["GET"])
 def get_hosts():
     """Retrieve a list of hosts and their corresponding information"""
-    return hosts.get_hosts(database_connection)
+    return hosts.get_hosts(get_page(), get_database_connection())
 
 @app.route("/v1.0/hosts/<int:host_id>", methods=["GET"])
 def get_host_by_id(host_id: int):
     """Retrieve a host based on their ID"""
-    return hosts.get_host_by_id(host_id, database_connection)
+    return hosts.get_host_by_id(host_id, get_database_connection())
 
 @app.route("/v1.0/hosts/<int:host_id>/details", methods=["GET"])
 def get_host_details_by_id(host_id: int):
     """Retrieve a host and their appearance data based on their ID"""
-    return hosts.get_host_details_by_id(host_id, database_connection)
+    return hosts.get_host_details_by_id(host_id, get_database_connection())
 
 @app.route("/v1.0/hosts/details", methods=["GET"])
 def get_host_details():
     """Retrieve a list of hosts and their corresponding appearances"""
-    return hosts.get_host_details(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("hosts", "hosts", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return hosts.stream_host_details(ndjson, get_database_connection())
+
+    return hosts.get_host_details(get_page(), get_database_connection())
 
 @app.route("/v1.0/hosts/slug/<string:host_slug>", methods=["GET"])
 def get_host_by_slug(host_slug: str):
     """Retrieve a host based on their slug"""
-    return hosts.get_host_by_slug(host_slug, database_connection)
+    return hosts.get_host_by_slug(host_slug, get_database_connection())
 
 @app.route("/v1.0/hosts/slug/<string:host_slug>/details", methods=["GET"])
 def get_host_details_by_slug(host_slug: str):
     """Retrieve a host and their appearance data based on their ID"""
-    return hosts.get_host_details_by_slug(host_slug, database_connection)
+    return hosts.get_host_details_by_slug(host_slug, get_database_connection())
 
 #endregion
 
@@ -142,23 +340,32 @@ def get_host_details_by_slug(host_slug: str):
 @app.route("/v1.0/locations", methods=["GET"])
 def get_locations():
     """Retrieve a list of locations"""
-    return locations.get_locations(database_connection)
+    return locations.get_locations(get_page(), get_database_connection())
 
 @app.route("/v1.0/locations/<int:location_id>", methods=["GET"])
 def get_location_by_id(location_id: int):
     """Retrieve a location and its information based on its ID"""
-    return locations.get_location_by_id(location_id, database_connection)
+    return locations.get_location_by_id(location_id, get_database_connection())
 
 @app.route("/v1.0/locations/<int:location_id>/recordings", methods=["GET"])
 def get_location_recordings_by_id(location_id: int):
     """Retrieve show recordings for a location based on its ID"""
     return locations.get_location_recordings_by_id(location_id,
-                                                   database_connection)
+                                                   get_database_connection())
 
 @app.route("/v1.0/locations/recordings", methods=["GET"])
 def get_location_recordings():
     """Retrieve show recordings for all locations"""
-    return locations.get_location_recordings(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("locations", "locations", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return locations.stream_location_recordings(ndjson, get_database_connection())
+
+    return locations.get_location_recordings(get_page(), get_database_connection())
 
 #endregion
 
@@ -167,44 +374,72 @@ def get_location_recordings():
 def get_panelists():
     """Retrieve a list of panelists and their corresponding
     information"""
-    return panelists.get_panelists(database_connection)
+    return panelists.get_panelists(get_page(), get_database_connection())
 
 @app.route("/v1.0/panelists/<int:panelist_id>", methods=["GET"])
 def get_panelist_by_id(panelist_id: int):
     """Retrieve a panelist based on their ID"""
-    return panelists.get_panelist_by_id(panelist_id, database_connection)
+    return panelists.get_panelist_by_id(panelist_id, get_database_connection())
 
 @app.route("/v1.0/panelists/<int:panelist_id>/details", methods=["GET"])
 def get_panelist_details_by_id(panelist_id: int):
     """Retrieve a panelist with their statistics and appearances based
     on their ID"""
     return panelists.get_panelist_details_by_id(panelist_id,
-                                                database_connection)
+                                                get_database_connection())
 
 @app.route("/v1.0/panelists/<int:panelist_id>/scores", methods=["GET"])
 def get_panelist_scores_by_id(panelist_id: int):
     """Retrieve a list of scores for the requested panelist ID"""
     return panelists.get_panelist_scores_by_id(panelist_id,
-                                               database_connection)
+                                               get_database_connection())
 
 @app.route("/v1.0/panelists/<int:panelist_id>/scores/ordered-pair",
            methods=["GET"])
 def get_panelist_scores_ordered_pair_by_id(panelist_id: int):
     """Retrieve a list of scores, as an ordered pair, for the requested
     panelist ID"""
+    mimetype = negotiate_series()
+    if mimetype:
+        return panelists.get_panelist_scores_series_by_id(panelist_id,
+                                                          mimetype,
+                                                          get_database_connection())
+
     return panelists.get_panelist_scores_ordered_pair_by_id(panelist_id,
-                                                            database_connection)
+                                                            get_database_connection())
+
+@app.route("/v1.0/panelists/<int:panelist_id>/statistics", methods=["GET"])
+def get_panelist_statistics_by_id(panelist_id: int):
+    """Retrieve score statistics and the rank distribution for the
+    requested panelist ID"""
+    return panelists.get_panelist_statistics_by_id(panelist_id,
+                                                   get_database_connection())
+
+@app.route("/v1.0/panelists/statistics", methods=["GET"])
+def get_panelists_statistics():
+    """Retrieve score statistics and rank distributions for all
+    panelists with scores"""
+    return panelists.get_panelists_statistics(get_database_connection())
 
 @app.route("/v1.0/panelists/details", methods=["GET"])
 def get_panelists_details():
     """Retrieve a list of panelists with their corresponding statistics
     and appearances"""
-    return panelists.get_panelists_details(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("panelists", "panelists", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return panelists.stream_panelists_details(ndjson, get_database_connection())
+
+    return panelists.get_panelists_details(get_page(), get_database_connection())
 
 @app.route("/v1.0/panelists/slug/<string:panelist_slug>", methods=["GET"])
 def get_panelist_by_slug(panelist_slug: str):
     """Retrieve a panelist based on their slug"""
-    return panelists.get_panelist_by_slug(panelist_slug, database_connection)
+    return panelists.get_panelist_by_slug(panelist_slug, get_database_connection())
 
 @app.route("/v1.0/panelists/slug/<string:panelist_slug>/details",
            methods=["GET"])
@@ -212,22 +447,36 @@ def get_panelist_details_by_slug(panelist_slug: str):
     """Retrieve a panelist with their statistics and appearances based
     on their slug"""
     return panelists.get_panelist_details_by_slug(panelist_slug,
-                                                  database_connection)
+                                                  get_database_connection())
 
 @app.route("/v1.0/panelists/slug/<string:panelist_slug>/scores",
            methods=["GET"])
 def get_panelist_scores_by_slug(panelist_slug: str):
     """Retrieve a list of scores for the requested panelist slug"""
     return panelists.get_panelist_scores_by_slug(panelist_slug,
-                                                 database_connection)
+                                                 get_database_connection())
 
 @app.route("/v1.0/panelists/slug/<string:panelist_slug>/scores/ordered-pair",
            methods=["GET"])
 def get_panelist_scores_ordered_pair_by_slug(panelist_slug: str):
     """Retrieve a list of scores, as an ordered pair, for the requested
     panelist slug"""
+    mimetype = negotiate_series()
+    if mimetype:
+        return panelists.get_panelist_scores_series_by_slug(panelist_slug,
+                                                            mimetype,
+                                                            get_database_connection())
+
     return panelists.get_panelist_scores_ordered_pair_by_slug(panelist_slug,
-                                                              database_connection)
+                                                              get_database_connection())
+
+@app.route("/v1.0/panelists/slug/<string:panelist_slug>/statistics",
+           methods=["GET"])
+def get_panelist_statistics_by_slug(panelist_slug: str):
+    """Retrieve score statistics and the rank distribution for the
+    requested panelist slug"""
+    return panelists.get_panelist_statistics_by_slug(panelist_slug,
+                                                     get_database_connection())
 
 #endregion
 
@@ -236,33 +485,42 @@ def get_panelist_scores_ordered_pair_by_slug(panelist_slug: str):
 def get_scorekeepers():
     """Retrieve a list of scoreekeepers and their corresponding
     information"""
-    return scorekeepers.get_scorekeepers(database_connection)
+    return scorekeepers.get_scorekeepers(get_page(), get_database_connection())
 
 @app.route("/v1.0/scorekeepers/<int:scorekeeper_id>", methods=["GET"])
 def get_scorekeeper_by_id(scorekeeper_id: int):
     """Retrieve a scorekeeper based on their ID"""
     return scorekeepers.get_scorekeeper_by_id(scorekeeper_id,
-                                              database_connection)
+                                              get_database_connection())
 
 @app.route("/v1.0/scorekeepers/<int:scorekeeper_id>/details", methods=["GET"])
 def get_scorekeeper_details_by_id(scorekeeper_id: int):
     """Retrieve a scorekeeper and their appearance data based on their
     ID"""
     return scorekeepers.get_scorekeeper_details_by_id(scorekeeper_id,
-                                                      database_connection)
+                                                      get_database_connection())
 
 @app.route("/v1.0/scorekeepers/details", methods=["GET"])
 def get_scorekeeper_details():
     """Retrieve a list of scorekeeper and their corresponding
     appearances"""
-    return scorekeepers.get_scorekeeper_details(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("scorekeepers", "scorekeepers", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return scorekeepers.stream_scorekeeper_details(ndjson, get_database_connection())
+
+    return scorekeepers.get_scorekeeper_details(get_page(), get_database_connection())
 
 @app.route("/v1.0/scorekeepers/slug/<string:scorekeeper_slug>",
            methods=["GET"])
 def get_scorekeepers_by_slug(scorekeeper_slug: str):
     """Retrieve a scorekeeper based on their slug"""
     return scorekeepers.get_scorekeeper_by_slug(scorekeeper_slug,
-                                                database_connection)
+                                                get_database_connection())
 
 @app.route("/v1.0/scorekeepers/slug/<string:scorekeeper_slug>/details",
            methods=["GET"])
@@ -270,7 +528,7 @@ def get_scorekeeper_details_by_slug(scorekeeper_slug: str):
     """Retrieve a scorekeeper and their appearance data based on their
     slug"""
     return scorekeepers.get_scorekeeper_details_by_slug(scorekeeper_slug,
-                                                        database_connection)
+                                                        get_database_connection())
 
 #endregion
 
@@ -278,30 +536,30 @@ def get_scorekeeper_details_by_slug(scorekeeper_slug: str):
 @app.route("/v1.0/shows", methods=["GET"])
 def get_shows():
     """Return a list of shows and the corresponding information"""
-    return shows.get_shows(database_connection)
+    return shows.get_shows(get_page(), get_database_connection())
 
 @app.route("/v1.0/shows/<int:show_id>", methods=["GET"])
 def get_show_by_id(show_id: int):
     """Retrieve a show and corresponding information based on the
     show ID"""
-    return shows.get_show_by_id(show_id, database_connection)
+    return shows.get_show_by_id(show_id, get_database_connection())
 
 @app.route("/v1.0/shows/<int:show_id>/details", methods=["GET"])
 def get_show_details_by_id(show_id: int):
     """Retrieve a show and detailed information based on the show ID"""
-    return shows.get_show_details_by_id(show_id, database_connection)
+    return shows.get_show_details_by_id(show_id, get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>", methods=["GET"])
 def get_show_by_year(show_year: int):
     """Retrieve a list of shows and corresponding information for a
     requested year"""
-    return shows.get_show_by_year(show_year, database_connection)
+    return shows.get_show_by_year(show_year, get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>/details", methods=["GET"])
 def get_show_details_by_year(show_year: int):
     """Retrieve a list of shows and detailed information for the
     requested year"""
-    return shows.get_show_details_by_year(show_year, database_connection)
+    return shows.get_show_details_by_year(show_year, get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>/<int:show_month>",
            methods=["GET"])
@@ -310,7 +568,7 @@ def get_show_by_year_month(show_year: int, show_month: int):
     requested year and month"""
     return shows.get_show_by_year_month(show_year,
                                         show_month,
-                                        database_connection)
+                                        get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>/<int:show_month>/details",
            methods=["GET"])
@@ -319,7 +577,7 @@ def get_show_details_by_year_month(show_year: int, show_month: int):
     requested year and month"""
     return shows.get_show_details_by_year_month(show_year,
                                                 show_month,
-                                                database_connection)
+                                                get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>/<int:show_month>/<int:show_day>",
            methods=["GET"])
@@ -329,7 +587,7 @@ def get_show_by_date(show_year: int, show_month: int, show_day: int):
     return shows.get_show_by_date(show_year,
                                   show_month,
                                   show_day,
-                                  database_connection)
+                                  get_database_connection())
 
 @app.route("/v1.0/shows/date/<int:show_year>/<int:show_month>/<int:show_day>/details",
            methods=["GET"])
@@ -339,7 +597,7 @@ def get_show_details_by_date(show_year: int, show_month: int, show_day: int):
     return shows.get_show_details_by_date(show_year,
                                           show_month,
                                           show_day,
-                                          database_connection)
+                                          get_database_connection())
 
 @app.route("/v1.0/shows/date/iso/<string:show_date>",
            methods=["GET"])
@@ -347,7 +605,7 @@ def get_show_by_date_string(show_date: str):
     """Retrieve a list of shows and corresponding information for the
     requested year, month and day"""
     return shows.get_show_by_date_string(show_date,
-                                         database_connection)
+                                         get_database_connection())
 
 @app.route("/v1.0/shows/date/iso/<string:show_date>/details",
            methods=["GET"])
@@ -355,31 +613,126 @@ def get_show_details_by_date_string(show_date: str):
     """Retrieve a list of shows and detailed information for the
     requested year, month and day"""
     return shows.get_show_details_by_date_string(show_date,
-                                                 database_connection)
+                                                 get_database_connection())
 
 @app.route("/v1.0/shows/details", methods=["GET"])
 def get_show_details():
     """Retrieve a list of all shows and corresponding detailed
     information"""
-    return shows.get_show_details(database_connection)
+    ids = get_ids()
+    if ids:
+        return batch.get_details_by_ids("shows", "show", ids,
+                                        get_database_connection())
+
+    ndjson = ndjson_requested()
+    if ndjson or stream_requested():
+        return shows.stream_show_details(ndjson, get_database_connection())
+
+    return shows.get_show_details(get_page(), get_database_connection())
 
 @app.route("/v1.0/shows/recent", methods=["GET"])
 def get_recent_shows():
     """Retrieve a list of recent shows and corresponding information"""
-    return shows.get_recent_shows(database_connection)
+    return shows.get_recent_shows(get_database_connection())
 
 @app.route("/v1.0/shows/recent/details", methods=["GET"])
 def get_recent_shows_details():
     """Retrieve a list of recent shows and corresponding detailed
     information"""
-    return shows.get_recent_shows_details(database_connection)
+    return shows.get_recent_shows_details(get_database_connection())
+
+#endregion
+
+#region Export API Endpoints
+@app.route("/v1.0/export/guests.ndjson", methods=["GET"])
+def export_guests():
+    """Stream all guests and their corresponding appearances as
+    newline-delimited JSON"""
+    return guests.stream_guest_details(True, get_database_connection())
+
+@app.route("/v1.0/export/hosts.ndjson", methods=["GET"])
+def export_hosts():
+    """Stream all hosts and their corresponding appearances as
+    newline-delimited JSON"""
+    return hosts.stream_host_details(True, get_database_connection())
+
+@app.route("/v1.0/export/locations.ndjson", methods=["GET"])
+def export_locations():
+    """Stream show recordings for all locations as newline-delimited
+    JSON"""
+    return locations.stream_location_recordings(True,
+                                                get_database_connection())
+
+@app.route("/v1.0/export/panelists.ndjson", methods=["GET"])
+def export_panelists():
+    """Stream all panelists with their corresponding statistics and
+    appearances as newline-delimited JSON"""
+    return panelists.stream_panelists_details(True, get_database_connection())
+
+@app.route("/v1.0/export/scorekeepers.ndjson", methods=["GET"])
+def export_scorekeepers():
+    """Stream all scorekeepers and their corresponding appearances as
+    newline-delimited JSON"""
+    return scorekeepers.stream_scorekeeper_details(True,
+                                                   get_database_connection())
+
+@app.route("/v1.0/export/shows.ndjson", methods=["GET"])
+def export_shows():
+    """Stream all shows and corresponding detailed information as
+    newline-delimited JSON"""
+    return shows.stream_show_details(True, get_database_connection())
+
+#endregion
+
+#region Command Line Interface
+@app.cli.command("verify-bulk")
+def verify_bulk():
+    """Compare the details collections retrieved with set-based queries
+    with the records returned by wwdtm, and exit with an error if any
+    record differs"""
+    differences = verify_collections(connection_pool)
+    if differences:
+        raise click.ClickException(describe_differences(differences))
+
+    click.echo("Set-based queries match wwdtm for all collections")
+
+@app.cli.command("verify-scores")
+def verify_scores():
+    """Compare the panelist score lists and ordered pairs retrieved from
+    the score arrays with those returned by wwdtm, and exit with an error
+    if any of them differ"""
+    differences = verify_scores_lists(connection_pool)
+    if differences:
+        raise click.ClickException(
+            "Scores of {} panelists differ from wwdtm, including panelist "
+            "IDs {}".format(len(differences),
+                            ", ".join(str(panelist_id)
+                                      for panelist_id in differences[:10])))
+
+    click.echo("Score lists and ordered pairs match wwdtm for all panelists")
 
 #endregion
 
 #region Application Initialization
 config_dict = load_config()
-database_connection = mysql.connector.connect(**config_dict["database"])
-database_connection.autocommit = True
+json_provider.configure(**config_dict.get("json", {}))
+connection_pool = create_pool(config_dict)
+response_cache.configure(**{**DEFAULT_CACHE_CONFIG,
+                            **config_dict.get("cache", {})})
+data_version.configure(**{**DEFAULT_VERSION_CONFIG,
+                          **config_dict.get("data_version", {})})
+compressor.configure(**{**DEFAULT_COMPRESSION_CONFIG,
+                        **config_dict.get("compression", {})})
+metrics_registry.configure(**{**DEFAULT_METRICS_CONFIG,
+                              **config_dict.get("metrics", {})})
+tracer.configure(**{**DEFAULT_TRACING_CONFIG,
+                    **config_dict.get("tracing", {})})
+bulk_queries.configure(**{**DEFAULT_BULK_CONFIG,
+                          **config_dict.get("bulk_queries", {})})
+bulk_queries.check_collections(connection_pool)
+dataset.configure(**{**DEFAULT_SNAPSHOT_CONFIG,
+                     **config_dict.get("snapshot", {})})
+dataset.load_before_fork(connection_pool)
 
 if __name__ == '__main__':    
     app.run(debug=False, host="0.0.0.0", port="9248")
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Compare two reports written by replay.py, such as reports for two
+commits, and exit with status 1 if the p95 or p99 latency of any route
+increased or its throughput decreased by more than the threshold"""
+
+import argparse
+import json
+import sys
+
+def _change(baseline: float, current: float) -> float:
+    """Return the relative change from a baseline value, in percent"""
+    if not baseline:
+        return 0.0
+    return (current - baseline) / baseline * 100
+
+def main():
+    """Print the per-route differences between two reports"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", help="report to compare against")
+    parser.add_argument("current", help="report to compare")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="allowed regression, in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.current) as current_file:
+        current = json.load(current_file)
+
+    if baseline["settings"] != current["settings"]:
+        print("Warning: the reports were produced with different settings",
+              file=sys.stderr)
+
+    print("{} -> {}".format(baseline.get("commit"), current.get("commit")))
+    print("{:<58} {:>9} {:>9} {:>9}".format("route", "p95", "p99", "rps"))
+
+    regressions = []
+    routes = dict(current["routes"], overall=current["overall"])
+    baseline_routes = dict(baseline["routes"], overall=baseline["overall"])
+    for route, summary in routes.items():
+        baseline_summary = baseline_routes.get(route)
+        if not baseline_summary:
+            print("{:<58} {:>9}".format(route, "new"))
+            continue
+
+        changes = {
+            "p95": _change(baseline_summary["p95_ms"], summary["p95_ms"]),
+            "p99": _change(baseline_summary["p99_ms"], summary["p99_ms"]),
+            "rps": _change(baseline_summary["rps"], summary["rps"])
+        }
+        print("{:<58} {:>+8.1f}% {:>+8.1f}% {:>+8.1f}%".format(
+            route, changes["p95"], changes["p99"], changes["rps"]))
+        if (changes["p95"] > args.threshold
+                or changes["p99"] > args.threshold
+                or -changes["rps"] > args.threshold):
+            regressions.append(route)
+
+    if regressions:
+        print("\nRegressed beyond {}%: {}".format(args.threshold,
+                                                  ", ".join(regressions)))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Generate a synthetic Wait Wait... Don't Tell Me! Stats dataset as a
+MySQL/MariaDB SQL script. The dataset has the same tables and columns
+that the API and wwdtm query, with a weekly show schedule, Best Of and
+repeat shows, and panelist, guest, host, scorekeeper and location
+appearances in roughly the proportions of the real dataset. The last
+show falls on the last Saturday on or before the end date, today by
+default, so that the recent shows endpoints have shows to return. The
+same seed, sizes and end date always produce the same script.
+
+The schema is checked against the API's own queries by
+tests/test_generate_dataset.py. Queries issued by wwdtm are checked by
+loading the script and running benchmarks/replay.py --validate, which
+requests every route in the request mix once.
+
+Load the script into a local database that the API is configured to
+use, for example:
+
+    python benchmarks/generate_dataset.py --output fixture.sql
+    mysql -u wwdtm -p wwdtm_bench < fixture.sql
+"""
+
+import argparse
+import datetime
+import hashlib
+import random
+import sys
+
+SCHEMA = """
+DROP TABLE IF EXISTS ww_showguestmap, ww_showbluffmap, ww_showpnlmap,
+    ww_showskmap, ww_showhostmap, ww_showlocationmap, ww_shownotes,
+    ww_showdescriptions, ww_shows, ww_guests, ww_panelists,
+    ww_scorekeepers, ww_hosts, ww_locations;
+
+CREATE TABLE ww_locations (
+    locationid INT NOT NULL PRIMARY KEY,
+    city VARCHAR(255) NULL,
+    state VARCHAR(255) NULL,
+    venue VARCHAR(255) NULL,
+    locationslug VARCHAR(255) NULL
+);
+
+CREATE TABLE ww_hosts (
+    hostid INT NOT NULL PRIMARY KEY,
+    host VARCHAR(255) NOT NULL,
+    hostslug VARCHAR(255) NULL,
+    hostgender CHAR(1) NOT NULL
+);
+
+CREATE TABLE ww_scorekeepers (
+    scorekeeperid INT NOT NULL PRIMARY KEY,
+    scorekeeper VARCHAR(255) NOT NULL,
+    scorekeeperslug VARCHAR(255) NULL,
+    scorekeepergender CHAR(1) NOT NULL
+);
+
+CREATE TABLE ww_panelists (
+    panelistid INT NOT NULL PRIMARY KEY,
+    panelist VARCHAR(255) NOT NULL,
+    panelistslug VARCHAR(255) NULL,
+    panelistgender CHAR(1) NOT NULL
+);
+
+CREATE TABLE ww_guests (
+    guestid INT NOT NULL PRIMARY KEY,
+    guest VARCHAR(255) NOT NULL,
+    guestslug VARCHAR(255) NULL
+);
+
+CREATE TABLE ww_shows (
+    showid INT NOT NULL PRIMARY KEY,
+    showdate DATE NOT NULL UNIQUE,
+    repeatshowid INT NULL,
+    bestof TINYINT(1) NOT NULL DEFAULT 0,
+    bestofuniquebluff TINYINT(1) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE ww_showdescriptions (
+    showdescriptionid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    showdescription TEXT NULL
+);
+
+CREATE TABLE ww_shownotes (
+    shownotesid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    shownotes TEXT NULL
+);
+
+CREATE TABLE ww_showlocationmap (
+    showlocationmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    locationid INT NOT NULL
+);
+
+CREATE TABLE ww_showhostmap (
+    showhostmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    hostid INT NOT NULL,
+    guest TINYINT(1) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE ww_showskmap (
+    showskmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    scorekeeperid INT NOT NULL,
+    guest TINYINT(1) NOT NULL DEFAULT 0,
+    description TEXT NULL
+);
+
+CREATE TABLE ww_showpnlmap (
+    showpnlmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    panelistid INT NOT NULL,
+    panelistlrndstart INT NULL,
+    panelistlrndcorrect INT NULL,
+    panelistscore INT NULL,
+    showpnlrank CHAR(2) NULL,
+    KEY (showid),
+    KEY (panelistid)
+);
+
+CREATE TABLE ww_showbluffmap (
+    showbluffmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    chosenbluffpnlid INT NULL,
+    correctbluffpnlid INT NULL
+);
+
+CREATE TABLE ww_showguestmap (
+    showguestmapid INT NOT NULL PRIMARY KEY,
+    showid INT NOT NULL,
+    guestid INT NOT NULL,
+    guestscore INT NULL,
+    exception TINYINT(1) NOT NULL DEFAULT 0,
+    KEY (showid),
+    KEY (guestid)
+);
+"""
+
+def _sql_value(value) -> str:
+    """Return a value as a SQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime.date):
+        return "'{}'".format(value.isoformat())
+
+    return "'{}'".format(str(value).replace("\\", "\\\\").replace("'", "''"))
+
+def _inserts(table: str, rows: list, batch_size: int = 500):
+    """Yield multi-row INSERT statements for a table"""
+    for start in range(0, len(rows), batch_size):
+        values = ",\n".join("({})".format(", ".join(_sql_value(value)
+                                                     for value in row))
+                            for row in rows[start:start + batch_size])
+        yield "INSERT INTO {} VALUES\n{};".format(table, values)
+
+def _people(prefix: str, count: int, rng: random.Random, gender: bool = True) -> list:
+    """Return ID, name, slug and, if gender is set, gender rows for a
+    number of synthetic people"""
+    rows = []
+    for person_id in range(1, count + 1):
+        name = "{} {}".format(prefix, person_id)
+        row = [person_id, name, name.lower().replace(" ", "-")]
+        if gender:
+            row.append(rng.choice("FM"))
+        rows.append(row)
+    return rows
+
+def _ranks(scores: list) -> list:
+    """Return the ranks of panelist scores, highest score first, with
+    ties marked as in the real dataset"""
+    ranks = []
+    for score in scores:
+        higher = sum(1 for other in scores if other > score)
+        tied = sum(1 for other in scores if other == score) > 1
+        rank = str(higher + 1)
+        ranks.append("{}t".format(rank) if tied and rank != "3" else rank)
+    return ranks
+
+def generate(shows: int,
+             panelists: int,
+             guests: int,
+             locations: int,
+             seed: int,
+             end_date: datetime.date) -> dict:
+    """Return the rows of each table for a synthetic dataset with weekly
+    shows ending on the last Saturday on or before the end date"""
+    rng = random.Random(seed)
+    days_since_saturday = (end_date.weekday() - 5) % 7
+    last_show_date = end_date - datetime.timedelta(days=days_since_saturday)
+    first_show_date = last_show_date - datetime.timedelta(weeks=shows - 1)
+    tables = {
+        "ww_locations": [[location_id,
+                          "City {}".format(location_id),
+                          rng.choice(["CA", "IL", "MA", "NY", "OR", "TX", "WA"]),
+                          "Venue {}".format(location_id),
+                          "venue-{}-city-{}".format(location_id, location_id)]
+                         for location_id in range(1, locations + 1)],
+        "ww_hosts": _people("Host", 8, rng),
+        "ww_scorekeepers": _people("Scorekeeper", 12, rng),
+        "ww_panelists": _people("Panelist", panelists, rng),
+        "ww_guests": _people("Guest", guests, rng, gender=False),
+        "ww_shows": [],
+        "ww_showdescriptions": [],
+        "ww_shownotes": [],
+        "ww_showlocationmap": [],
+        "ww_showhostmap": [],
+        "ww_showskmap": [],
+        "ww_showpnlmap": [],
+        "ww_showbluffmap": [],
+        "ww_showguestmap": []
+    }
+
+    # A core group of regular panelists appears far more often than the
+    # rest, as in the real dataset
+    panelist_weights = [20 if panelist_id <= panelists // 4 else 1
+                        for panelist_id in range(1, panelists + 1)]
+    panelist_ids = list(range(1, panelists + 1))
+
+    for show_id in range(1, shows + 1):
+        show_date = first_show_date + datetime.timedelta(weeks=show_id - 1)
+        best_of = rng.random() < 0.06
+        repeat_show_id = (rng.randint(1, show_id - 1)
+                          if show_id > 52 and rng.random() < 0.08 else None)
+        tables["ww_shows"].append([show_id, show_date, repeat_show_id,
+                                   best_of, best_of and rng.random() < 0.2])
+        tables["ww_showdescriptions"].append(
+            [show_id, show_id, "Description of show {}".format(show_id)])
+        tables["ww_shownotes"].append(
+            [show_id, show_id, "Notes for show {}".format(show_id)
+             if rng.random() < 0.3 else None])
+
+        location_id = 1 if rng.random() < 0.7 else rng.randint(2, locations)
+        tables["ww_showlocationmap"].append([show_id, show_id, location_id])
+
+        guest_host = rng.random() < 0.03
+        host_id = rng.randint(2, 8) if guest_host else 1
+        tables["ww_showhostmap"].append([show_id, show_id, host_id, guest_host])
+        guest_scorekeeper = rng.random() < 0.05
+        scorekeeper_id = rng.randint(2, 12) if guest_scorekeeper else 1
+        tables["ww_showskmap"].append([show_id, show_id, scorekeeper_id,
+                                       guest_scorekeeper, None])
+
+        show_panelists = set()
+        while len(show_panelists) < 3:
+            show_panelists.add(rng.choices(panelist_ids, panelist_weights)[0])
+        show_panelists = sorted(show_panelists)
+        scores = [rng.randint(0, 20) for _ in show_panelists]
+        for panelist_id, score, rank in zip(show_panelists, scores, _ranks(scores)):
+            start = rng.randint(0, max(score - 2, 0))
+            tables["ww_showpnlmap"].append(
+                [len(tables["ww_showpnlmap"]) + 1, show_id, panelist_id,
+                 start, (score - start) // 2, score, rank])
+
+        chosen, correct = rng.choice(show_panelists), rng.choice(show_panelists)
+        tables["ww_showbluffmap"].append([show_id, show_id, chosen, correct])
+
+        for _ in range(2 if rng.random() < 0.1 else 1):
+            score = rng.choices([0, 1, 2, 3], [1, 2, 3, 6])[0]
+            tables["ww_showguestmap"].append(
+                [len(tables["ww_showguestmap"]) + 1, show_id,
+                 rng.randint(1, guests), score, score < 2 and rng.random() < 0.1])
+
+    return tables
+
+def sql_script(tables: dict) -> str:
+    """Return the SQL script that creates the tables and inserts the
+    rows of a synthetic dataset"""
+    statements = [SCHEMA.strip()]
+    for table, rows in tables.items():
+        statements.extend(_inserts(table, rows))
+    return "\n\n".join(statements) + "\n"
+
+def main():
+    """Write the SQL script for a synthetic dataset"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--shows", type=int, default=1250)
+    parser.add_argument("--panelists", type=int, default=100)
+    parser.add_argument("--guests", type=int, default=1200)
+    parser.add_argument("--locations", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=1998)
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat,
+                        default=datetime.date.today(),
+                        help="date of the last show, as YYYY-MM-DD; "
+                             "defaults to today")
+    parser.add_argument("--output", default="-",
+                        help="path of the SQL script, or - for stdout")
+    args = parser.parse_args()
+
+    tables = generate(args.shows, args.panelists, args.guests,
+                      args.locations, args.seed, args.end_date)
+    script = sql_script(tables)
+
+    if args.output == "-":
+        sys.stdout.write(script)
+    else:
+        with open(args.output, "w") as script_file:
+            script_file.write(script)
+
+    print("Dataset ending {}, SHA-256: {}".format(
+        args.end_date.isoformat(),
+        hashlib.sha256(script.encode("utf-8")).hexdigest()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
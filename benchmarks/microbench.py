@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Microbenchmarks for the response pipeline: envelope construction,
+field selection, JSON encoding, compression and ETag hashing, run on
+synthetic show and panelist details shaped like the full dataset.
+
+Each benchmark reports the best time per call over several rounds.
+Two kinds of regression thresholds are checked, and the script exits
+with status 1 if either is exceeded:
+
+- Relative budgets, which hold on any machine, limit the time of a
+  benchmark to a multiple of another, such as encoding with the
+  configured JSON provider compared with flask.jsonify, or with the
+  orjson provider compared with calling orjson directly
+- With --baseline, each benchmark is compared with a report saved on
+  the same machine with --save, and may be at most --threshold percent
+  slower
+
+Run from the repository root:
+
+    python benchmarks/microbench.py --save microbench-baseline.json
+    python benchmarks/microbench.py --baseline microbench-baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=C0413
+from flask import Flask, jsonify
+
+from resources.compression import brotli, compressor
+from resources.conditional import compute_etag
+from resources.dicts import encode, error_dict, fail_dict, json_response, success_dict
+from resources.encoding import JSONEncoder, StdlibJSONProvider, json_provider, orjson
+# pylint: enable=C0413
+
+# Benchmarks whose time per call may not exceed a multiple of another
+# benchmark's time per call, as (benchmark, reference, multiple)
+RELATIVE_BUDGETS = [
+    ("encode.show_details", "encode.show_details.jsonify", 1.0),
+    ("encode.show_details", "encode.show_details.orjson", 2.5),
+    ("encode.panelist_details", "encode.panelist_details.jsonify", 1.0),
+    ("encode.panelist_details", "encode.panelist_details.orjson", 2.5),
+    ("envelope.success_dict.show_details", "encode.show_details", 0.01),
+    ("envelope.success_dict.fields", "encode.show_details", 1.0),
+    ("response.json_response.show_details", "encode.show_details", 1.5),
+    ("etag.show_details", "encode.show_details", 1.0)
+]
+
+def show_details(count: int, rng: random.Random) -> list:
+    """Return synthetic show details records"""
+    shows = []
+    for show_id in range(1, count + 1):
+        show_date = datetime.date(1998, 1, 3) + datetime.timedelta(weeks=show_id - 1)
+        shows.append({
+            "id": show_id,
+            "date": show_date.isoformat(),
+            "best_of": rng.random() < 0.06,
+            "repeat_show": rng.random() < 0.08,
+            "location": {"id": 1, "slug": "studebaker-theater-chicago-il",
+                         "city": "Chicago", "state": "IL",
+                         "venue": "Studebaker Theater"},
+            "description": "Description of show {} with guest and "
+                           "panelist information".format(show_id),
+            "notes": None,
+            "host": {"id": 1, "name": "Host 1", "slug": "host-1",
+                     "guest": False},
+            "scorekeeper": {"id": 1, "name": "Scorekeeper 1",
+                            "slug": "scorekeeper-1", "guest": False,
+                            "description": None},
+            "panelists": [{"id": panelist_id,
+                           "name": "Panelist {}".format(panelist_id),
+                           "slug": "panelist-{}".format(panelist_id),
+                           "lightning_round_start": rng.randint(0, 5),
+                           "lightning_round_correct": rng.randint(0, 8),
+                           "score": rng.randint(0, 20),
+                           "rank": rng.choice(["1", "1t", "2", "2t", "3"])}
+                          for panelist_id in rng.sample(range(1, 101), 3)],
+            "bluff": {"chosen_panelist": {"id": 7, "name": "Panelist 7"},
+                      "correct_panelist": {"id": 9, "name": "Panelist 9"}},
+            "guests": [guest(rng.randint(1, 1200), rng)]
+        })
+    return shows
+
+def guest(guest_id: int, rng: random.Random) -> dict:
+    """Return a synthetic guest appearance, with a name containing
+    non-ASCII characters for about one guest in twenty"""
+    if rng.random() < 0.05:
+        name = "Guest Ünïcode {}".format(guest_id)
+    else:
+        name = "Guest {}".format(guest_id)
+    return {"id": guest_id, "name": name, "slug": "guest-{}".format(guest_id),
+            "score": rng.randint(0, 3), "score_exception": False}
+
+def panelist_details(shows: list) -> list:
+    """Return synthetic panelist details records built from the
+    appearances in show details records"""
+    panelists = {}
+    for show in shows:
+        for appearance in show["panelists"]:
+            panelist = panelists.setdefault(appearance["id"], {
+                "id": appearance["id"],
+                "name": appearance["name"],
+                "slug": appearance["slug"],
+                "gender": "F",
+                "statistics": {
+                    "scoring": {"minimum": 0, "maximum": 20, "mean": 9.4321,
+                                "median": 9.5, "standard_deviation": 4.1234,
+                                "total": 0},
+                    "ranking": {"first": 0, "first_tied": 0, "second": 0,
+                                "second_tied": 0, "third": 0}
+                },
+                "appearances": []
+            })
+            panelist["appearances"].append({
+                "show_id": show["id"],
+                "date": show["date"],
+                "best_of": show["best_of"],
+                "repeat_show": show["repeat_show"],
+                "lightning_round_start": appearance["lightning_round_start"],
+                "lightning_round_correct": appearance["lightning_round_correct"],
+                "score": appearance["score"],
+                "rank": appearance["rank"]
+            })
+    return [panelists[panelist_id] for panelist_id in sorted(panelists)]
+
+def benchmarks(app: Flask, shows: list, panelists: list) -> dict:
+    """Return the benchmarks to run, by name, as functions that take no
+    arguments"""
+    stdlib = StdlibJSONProvider()
+    show_response = success_dict("shows", shows)
+    panelist_response = success_dict("panelists", panelists)
+    show_body = encode(show_response)
+
+    def jsonify_body(response_dict):
+        with app.app_context():
+            return jsonify(response_dict).get_data()
+
+    def selected_fields():
+        with app.test_request_context("/?fields=id,date,panelists.name"):
+            return success_dict("shows", shows)
+
+    def response_body():
+        with app.app_context():
+            return json_response(success_dict("shows", shows)).get_data()
+
+    cases = {
+        "envelope.success_dict.show_details": lambda: success_dict("shows", shows),
+        "envelope.success_dict.fields": selected_fields,
+        "envelope.fail_dict": lambda: fail_dict("show", "Show ID 1 not found"),
+        "envelope.error_dict": lambda: error_dict("Database error occurred"),
+        "encode.show_details": lambda: encode(show_response),
+        "encode.show_details.stdlib": lambda: stdlib.dumps(show_response),
+        "encode.show_details.jsonify": lambda: jsonify_body(show_response),
+        "encode.panelist_details": lambda: encode(panelist_response),
+        "encode.panelist_details.jsonify": lambda: jsonify_body(panelist_response),
+        "response.json_response.show_details": response_body,
+        "compress.gzip.show_details": lambda: compressor.compress(show_body, "gzip"),
+        "etag.show_details": lambda: compute_etag("v1", show_body)
+    }
+    # Raw orjson output shows the cost of matching the output of
+    # flask.jsonify with the orjson provider
+    if json_provider.name == "orjson":
+        cases["encode.show_details.orjson"] = lambda: orjson.dumps(show_response)
+        cases["encode.panelist_details.orjson"] = lambda: orjson.dumps(
+            panelist_response)
+    if brotli:
+        cases["compress.br.show_details"] = lambda: compressor.compress(show_body,
+                                                                        "br")
+    return cases
+
+def measure(function, rounds: int) -> float:
+    """Return the best time per call of a function, in seconds"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=rounds, number=number)) / number
+
+def main():
+    """Run the benchmarks and check the regression thresholds"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shows", type=int, default=1250)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1998)
+    parser.add_argument("--filter", default="",
+                        help="only run benchmarks whose names contain this")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--baseline", help="compare with saved results")
+    parser.add_argument("--threshold", type=float, default=25.0,
+                        help="allowed slowdown compared with the baseline, "
+                             "in percent")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["JSON_SORT_KEYS"] = False
+    app.config["JSONIFY_PRETTYPRINT_REGULAR"] = False
+    app.json_encoder = JSONEncoder
+
+    rng = random.Random(args.seed)
+    shows = show_details(args.shows, rng)
+    panelists = panelist_details(shows)
+    cases = benchmarks(app, shows, panelists)
+
+    results = {}
+    for name, function in cases.items():
+        if args.filter in name:
+            results[name] = measure(function, args.rounds)
+            print("{:<42} {:>12.3f} us".format(name, results[name] * 1e6))
+
+    failures = []
+    for name, reference, limit in RELATIVE_BUDGETS:
+        if name in results and reference in results:
+            ratio = results[name] / results[reference]
+            if ratio > limit:
+                failures.append("{} took {:.2f}x {}, budget {}x".format(
+                    name, ratio, reference, limit))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        for name, seconds in results.items():
+            if name in baseline:
+                change = (seconds - baseline[name]) / baseline[name] * 100
+                if change > args.threshold:
+                    failures.append("{} is {:.1f}% slower than the "
+                                    "baseline".format(name, change))
+
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump({"json_provider": json_provider.name,
+                       "shows": args.shows,
+                       "results": results}, results_file, indent=2)
+            results_file.write("\n")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
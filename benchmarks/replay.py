@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Replay a weighted mix of API requests and report the p50, p95 and
+p99 latency and requests per second for each route, and the peak
+resident set size of the process serving them.
+
+Requests are sent to the Flask application in api.py in-process, which
+requires config.json to point at the benchmark database and the script
+to be run from the repository root, or to a running server with --url.
+
+A request mix is a JSON Lines file with one request per line:
+
+    {"path": "/v1.0/shows/{show_id}/details", "weight": 10}
+    {"method": "POST", "path": "/v1.0/batch", "body": {"shows": [1, 2]}}
+
+Paths can contain the placeholders {show_id}, {show_year},
+{show_month}, {show_day}, {show_date}, {guest_id}, {guest_slug},
+{host_id}, {host_slug}, {location_id}, {panelist_id},
+{panelist_slug}, {scorekeeper_id} and {scorekeeper_slug}, which are
+filled with values from the dataset being served. Without --mix, a
+built-in mix weighted like production traffic is used. The requests
+replayed are fully determined by the mix, the dataset and --seed, so
+reports from different commits can be compared with compare.py.
+
+The resident set size is sampled from the serving process, or the
+combined --pid processes, after each request. Requests for different
+routes are served concurrently by the same processes, so it is reported
+for the whole replay rather than for each route.
+
+With --validate, each request in the mix is sent once instead, and the
+script exits with status 1 if any of them does not succeed. Run it after
+loading a generated dataset to check that the API and wwdtm queries
+work against the dataset's schema."""
+
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_MIX = [
+    {"path": "/v1.0/shows/{show_id}/details", "weight": 20},
+    {"path": "/v1.0/shows/date/iso/{show_date}/details", "weight": 12},
+    {"path": "/v1.0/shows/recent/details", "weight": 10},
+    {"path": "/v1.0/panelists/slug/{panelist_slug}/details", "weight": 8},
+    {"path": "/v1.0/shows/date/{show_year}/details", "weight": 6},
+    {"path": "/v1.0/shows/{show_id}", "weight": 6},
+    {"path": "/v1.0/guests/slug/{guest_slug}/details", "weight": 6},
+    {"path": "/v1.0/panelists/{panelist_id}/scores/ordered-pair", "weight": 5},
+    {"path": "/v1.0/panelists", "weight": 4},
+    {"path": "/v1.0/guests/{guest_id}", "weight": 4},
+    {"path": "/v1.0/shows/date/{show_year}/{show_month}", "weight": 4},
+    {"path": "/v1.0/locations/{location_id}/recordings", "weight": 3},
+    {"path": "/v1.0/hosts/slug/{host_slug}/details", "weight": 2},
+    {"path": "/v1.0/scorekeepers/slug/{scorekeeper_slug}/details", "weight": 2},
+    {"path": "/v1.0/panelists/statistics", "weight": 2},
+    {"path": "/v1.0/shows/details?limit=25", "weight": 2},
+    {"path": "/v1.0/guests/details", "weight": 1},
+    {"path": "/v1.0/panelists/details", "weight": 1},
+    {"path": "/v1.0/shows/details", "weight": 1},
+    {"path": "/v1.0/version", "weight": 1}
+]
+
+ENTITIES = ("guest", "host", "location", "panelist", "scorekeeper")
+
+class InProcessClient:
+    """Sends requests to the Flask application in api.py"""
+
+    def __init__(self):
+        sys.path.insert(0, os.getcwd())
+        import api  # pylint: disable=C0415
+        self._app = api.app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body, headers: dict) -> tuple:
+        """Send a request and return its status and body"""
+        if not hasattr(self._local, "client"):
+            self._local.client = self._app.test_client()
+
+        response = self._local.client.open(path,
+                                           method=method,
+                                           json=body,
+                                           headers=headers)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+class HTTPClient:
+    """Sends requests to a running API server"""
+
+    def __init__(self, url: str):
+        self._url = url.rstrip("/")
+
+    def request(self, method: str, path: str, body, headers: dict) -> tuple:
+        """Send a request and return its status and body"""
+        data = None
+        headers = dict(headers)
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        http_request = urllib.request.Request(self._url + path,
+                                              data=data,
+                                              headers=headers,
+                                              method=method)
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as err:
+            return err.code, err.read()
+
+def rss_bytes(pids: list) -> int:
+    """Return the combined resident set size of a list of processes, or
+    of this process if the list is empty, or None if it is unknown"""
+    page_size = resource.getpagesize()
+    total = 0
+    for pid in pids or ["self"]:
+        try:
+            with open("/proc/{}/statm".format(pid)) as statm:
+                total += int(statm.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            return None
+    return total
+
+def load_mix(path: str) -> list:
+    """Load a request mix from a JSON Lines file"""
+    mix = []
+    with open(path) as mix_file:
+        for line in mix_file:
+            if line.strip():
+                entry = json.loads(line)
+                if "path" not in entry:
+                    raise ValueError("Request mix entries must have a path")
+                mix.append(entry)
+    return mix
+
+def harvest_values(client) -> dict:
+    """Collect the IDs, slugs and show dates that placeholders are
+    filled with from the dataset being served"""
+    values = {}
+    for entity in ENTITIES:
+        status, body = client.request("GET", "/v1.0/{}s".format(entity), None, {})
+        if status != 200:
+            raise RuntimeError("Unable to retrieve {}s: HTTP {}".format(entity,
+                                                                        status))
+        items = json.loads(body)["data"]["{}s".format(entity)]
+        values["{}_id".format(entity)] = sorted(item["id"] for item in items)
+        values["{}_slug".format(entity)] = sorted(item["slug"] for item in items
+                                                  if item.get("slug"))
+
+    status, body = client.request("GET", "/v1.0/shows", None, {})
+    if status != 200:
+        raise RuntimeError("Unable to retrieve shows: HTTP {}".format(status))
+    shows = json.loads(body)["data"]["shows"]
+    values["show_id"] = sorted(show["id"] for show in shows)
+    values["show_date"] = sorted(show["date"] for show in shows)
+    return values
+
+def fill_request(entry: dict, values: dict, rng: random.Random) -> tuple:
+    """Return the route, method, path, body and headers of a request in
+    the mix, with its placeholders filled with values from the
+    dataset"""
+    show_date = datetime.date.fromisoformat(rng.choice(values["show_date"]))
+    fill = {name: rng.choice(choices) if choices else ""
+            for name, choices in values.items()}
+    fill.update(show_date=show_date.isoformat(),
+                show_year=show_date.year,
+                show_month=show_date.month,
+                show_day=show_date.day)
+    return (entry["path"],
+            entry.get("method", "GET"),
+            entry["path"].format(**fill),
+            entry.get("body"),
+            entry.get("headers", {}))
+
+def build_requests(mix: list, values: dict, count: int, seed: int) -> list:
+    """Return the requests to replay, chosen from the mix by weight with
+    their placeholders filled"""
+    rng = random.Random(seed)
+    weights = [entry.get("weight", 1) for entry in mix]
+    return [fill_request(entry, values, rng)
+            for entry in rng.choices(mix, weights, k=count)]
+
+def validate(client, mix: list, values: dict, seed: int) -> list:
+    """Send each request in the mix once, print its status, and return
+    the routes of the requests that did not succeed"""
+    rng = random.Random(seed)
+    failures = []
+    for entry in mix:
+        route, method, path, body, headers = fill_request(entry, values, rng)
+        status, _ = client.request(method, path, body, headers)
+        print("{:<6} {} {}".format(status, method, path))
+        if not 200 <= status < 300:
+            failures.append(route)
+    return failures
+
+def percentile(values: list, percent: float) -> float:
+    """Return the nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+def replay(client, requests: list, concurrency: int, pids: list) -> tuple:
+    """Send the requests using a number of threads and return the
+    latency and status samples for each route, the process RSS samples
+    and the elapsed time"""
+    samples = {}
+    rss_samples = []
+    lock = threading.Lock()
+    position = iter(range(len(requests)))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+
+            route, method, path, body, headers = requests[index]
+            started = time.perf_counter()
+            status, _ = client.request(method, path, body, headers)
+            elapsed = time.perf_counter() - started
+            rss = rss_bytes(pids)
+            with lock:
+                sample = samples.setdefault(route, {"latencies": [],
+                                                    "statuses": {}})
+                sample["latencies"].append(elapsed)
+                sample["statuses"][str(status)] = sample["statuses"].get(str(status), 0) + 1
+                if rss is not None:
+                    rss_samples.append(rss)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, rss_samples, time.perf_counter() - started
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """Return the latency percentiles, throughput and status codes for
+    a route"""
+    latencies = sorted(samples["latencies"])
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statuses": samples["statuses"]
+    }
+
+def git_commit() -> str:
+    """Return the current commit, marked if the tree has changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"],
+                                capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain",
+                                "--untracked-files=no"],
+                               capture_output=True, text=True,
+                               check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """Replay the request mix and write the report"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; "
+                                      "defaults to in-process requests")
+    parser.add_argument("--mix", help="request mix JSON Lines file")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1998)
+    parser.add_argument("--pid", type=int, action="append", default=[],
+                        help="server process to include in the process "
+                             "RSS; repeat for each uWSGI worker")
+    parser.add_argument("--output", help="path of the JSON report")
+    parser.add_argument("--validate", action="store_true",
+                        help="send each request in the mix once and exit "
+                             "with status 1 if any of them fails")
+    args = parser.parse_args()
+
+    client = HTTPClient(args.url) if args.url else InProcessClient()
+    mix = load_mix(args.mix) if args.mix else DEFAULT_MIX
+    pids = args.pid if args.url else []
+
+    values = harvest_values(client)
+    if args.validate:
+        failures = validate(client, mix, values, args.seed)
+        if failures:
+            print("\nFailed: {}".format(", ".join(failures)))
+            sys.exit(1)
+        return
+
+    warmup = build_requests(mix, values, args.warmup, args.seed + 1)
+    requests = build_requests(mix, values, args.requests, args.seed)
+    replay(client, warmup, args.concurrency, pids)
+    samples, rss_samples, elapsed = replay(client, requests,
+                                           args.concurrency, pids)
+
+    routes = {route: summarize(route_samples, elapsed)
+              for route, route_samples in sorted(samples.items())}
+    overall = summarize({"latencies": [latency for sample in samples.values()
+                                       for latency in sample["latencies"]],
+                         "statuses": {}},
+                        elapsed)
+    overall.pop("statuses")
+    overall["process_rss_max_mb"] = (round(max(rss_samples) / 1048576, 1)
+                                     if rss_samples else None)
+    report = {
+        "commit": git_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "target": args.url or "in-process",
+            "mix": hashlib.sha256(json.dumps(mix, sort_keys=True)
+                                  .encode("utf-8")).hexdigest(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed
+        },
+        "overall": overall,
+        "routes": routes
+    }
+
+    print("{:<58} {:>6} {:>8} {:>9} {:>9} {:>9}".format(
+        "route", "count", "rps", "p50 ms", "p95 ms", "p99 ms"))
+    for route, summary in list(routes.items()) + [("overall", overall)]:
+        print("{:<58} {:>6} {:>8} {:>9} {:>9} {:>9}".format(
+            route, summary["requests"], summary["rps"], summary["p50_ms"],
+            summary["p95_ms"], summary["p99_ms"]))
+    print("peak process RSS MB: {}".format(
+        overall["process_rss_max_mb"]
+        if overall["process_rss_max_mb"] is not None else "-"))
+
+    if args.output:
+        with open(args.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,8 @@
 # wwdtm is relased under the terms of the Apache License 2.0
 """Explicitly listing all modules in this package"""
 
-from resources import dicts
+from resources import batch, bulk, cache, cache_backends, compression, conditional
+from resources import database, dicts, encoding, fields, indexes
+from resources import metrics, pagination, series, snapshot, statistics
+from resources import streaming, tracing, version
 from resources import guests, hosts, locations, panelists, scorekeepers, shows
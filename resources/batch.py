@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides functions that handle batch requests, which
+retrieve the details of many guests, hosts, locations, panelists,
+scorekeepers or shows by ID in a single request"""
+
+import mysql.connector
+from mysql.connector.errors import DatabaseError, ProgrammingError
+from flask import abort
+
+import wwdtm.guest.details
+import wwdtm.host.details
+import wwdtm.location.details
+import wwdtm.panelist.details
+import wwdtm.scorekeeper.details
+import wwdtm.show.details
+
+from .bulk import bulk_queries
+from .cache import cached_response
+from .database import with_reconnect
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .fields import select_fields
+from .snapshot import dataset, snapshot_retriever
+
+MAX_BATCH_IDS = 100
+
+BATCH_COLLECTIONS = {
+    "guests": ("guest_details",
+               wwdtm.guest.details.retrieve_by_id),
+    "hosts": ("host_details",
+              wwdtm.host.details.retrieve_by_id),
+    "locations": ("location_recordings",
+                  wwdtm.location.details.retrieve_recordings_by_id),
+    "panelists": ("panelist_details",
+                  wwdtm.panelist.details.retrieve_by_id),
+    "scorekeepers": ("scorekeeper_details",
+                     wwdtm.scorekeeper.details.retrieve_by_id),
+    "shows": ("show_details",
+              wwdtm.show.details.retrieve_by_id)
+}
+
+def _validate_ids(ids: list) -> tuple:
+    """Return the unique IDs from a list of IDs, in the order requested
+
+    Raises ValueError if an ID is not a positive integer or if too many
+    IDs are requested."""
+    unique_ids = []
+    for item_id in ids:
+        if isinstance(item_id, bool) or not isinstance(item_id, int) or item_id < 1:
+            raise ValueError("IDs must be positive integers")
+        if item_id not in unique_ids:
+            unique_ids.append(item_id)
+
+    if not unique_ids:
+        raise ValueError("At least one ID must be provided")
+    if len(unique_ids) > MAX_BATCH_IDS:
+        raise ValueError("No more than {} IDs can be requested"
+                         .format(MAX_BATCH_IDS))
+
+    return tuple(unique_ids)
+
+def parse_ids(value: str) -> tuple:
+    """Return the unique IDs from a comma-separated list of IDs, in the
+    order requested
+
+    Raises ValueError if the list is not valid."""
+    try:
+        ids = [int(item_id) for item_id in value.split(",") if item_id.strip()]
+    except ValueError as err:
+        raise ValueError("IDs must be positive integers") from err
+
+    return _validate_ids(ids)
+
+def parse_batch(request_dict: dict) -> dict:
+    """Return the collections and IDs requested in a batch request body,
+    which maps collection names to lists of IDs
+
+    Raises ValueError if the request body is not valid."""
+    if not isinstance(request_dict, dict) or not request_dict:
+        raise ValueError("Request body must be a JSON object mapping "
+                         "collection names to lists of IDs")
+
+    batch = {}
+    for collection, ids in request_dict.items():
+        if collection not in BATCH_COLLECTIONS:
+            raise ValueError("Unknown collection '{}'".format(collection))
+        if not isinstance(ids, list):
+            raise ValueError("IDs for '{}' must be a list".format(collection))
+        batch[collection] = _validate_ids(ids)
+
+    return batch
+
+def retrieve_by_ids(collection: str,
+                    ids: tuple,
+                    database_connection: mysql.connector.connect) -> list:
+    """Retrieve the details of the items in a collection with the
+    requested IDs, in the order requested. IDs that do not exist are
+    skipped. Items are retrieved from the dataset snapshot if it is
+    loaded, or otherwise with a constant number of set-based queries
+    filtered by the requested IDs if set-based queries are enabled. Only
+    when neither is available are the details of each item retrieved
+    with wwdtm."""
+    snapshot_name, retrieve_by_id = BATCH_COLLECTIONS[collection]
+    if (dataset.current(database_connection) is None
+            and bulk_queries.supports(snapshot_name)):
+        items = with_reconnect(bulk_queries.retrieve_by_ids,
+                               snapshot_name,
+                               ids,
+                               database_connection)
+        if items is not None:
+            return items
+
+    retrieve = snapshot_retriever(snapshot_name, "id", retrieve_by_id)
+    items = [with_reconnect(retrieve, item_id, database_connection)
+             for item_id in ids]
+    return [item for item in items if item]
+
+@cached_response
+def get_details_by_ids(collection: str,
+                       key_name: str,
+                       ids: tuple,
+                       database_connection: mysql.connector.connect):
+    """Retrieve the details of the items in a collection with the
+    requested IDs"""
+    try:
+        items = retrieve_by_ids(collection, ids, database_connection)
+        if not items:
+            message = "No {} found with the requested IDs".format(collection)
+            response = fail_dict(key_name, message)
+            return json_response(response), 404
+
+        return json_response(success_dict(key_name, items)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve {} from the database"
+                              .format(collection))
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "{} information".format(collection))
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def get_batch(batch: dict, database_connection: mysql.connector.connect):
+    """Retrieve the details of the items with the requested IDs for each
+    requested collection"""
+    try:
+        results = {}
+        for collection, ids in batch.items():
+            items = retrieve_by_ids(collection, ids, database_connection)
+            results[collection] = select_fields(items)
+
+        return json_response(success_dict("batch", results, prune=False)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve batch items from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "batch items")
+        return json_response(response), 500
+    except:
+        abort(500)
@@ -0,0 +1,611 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides set-based replacements for the wwdtm functions
+that retrieve the details of all guests, hosts, locations, panelists,
+scorekeepers and shows. Instead of querying the appearances of each
+item separately, each collection is assembled from its wwdtm info
+records and a constant number of joined queries whose rows are grouped
+by item.
+
+The records follow the structure of the wwdtm details records. The
+collections can be compared with the records returned by wwdtm with the
+verify-bulk command, which exits with an error if any record differs:
+
+    FLASK_APP=api flask verify-bulk
+
+With verification turned on, the application also runs the comparison
+when it starts and fails to start if any record differs."""
+
+import collections
+import functools
+
+import mysql.connector
+from mysql.connector.errors import ProgrammingError
+from slugify import slugify
+
+import wwdtm.guest.details
+import wwdtm.guest.info
+import wwdtm.host.details
+import wwdtm.host.info
+import wwdtm.location.details
+import wwdtm.location.info
+import wwdtm.panelist.details
+import wwdtm.panelist.info
+import wwdtm.scorekeeper.details
+import wwdtm.scorekeeper.info
+import wwdtm.show.details
+import wwdtm.show.info
+
+from .encoding import json_provider
+from .statistics import RANKS, score_statistics
+
+DEFAULT_BULK_CONFIG = {
+    "enabled": True,
+    "verify": False
+}
+
+RANK_NAMES = dict(zip(RANKS, ("first", "first_tied", "second",
+                              "second_tied", "third")))
+
+def _id_filter(column: str, ids: tuple) -> tuple:
+    """Return a WHERE clause limiting a query to a set of IDs, and its
+    parameters, or an empty clause if all IDs are requested"""
+    if ids is None:
+        return "", ()
+
+    return ("WHERE {} IN ({})".format(column, ", ".join(["%s"] * len(ids))),
+            tuple(ids))
+
+def _query(query: str,
+           params: tuple,
+           database_connection: mysql.connector.connect) -> list:
+    """Run a query and return all of its rows"""
+    cursor = database_connection.cursor()
+    cursor.execute(query, params)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+def _group(rows: list) -> dict:
+    """Group rows by the ID in their first column, keeping the order of
+    the rows within each group"""
+    groups = collections.defaultdict(list)
+    for row in rows:
+        groups[row[0]].append(row)
+    return groups
+
+def _first(rows: list) -> dict:
+    """Return the first row for each ID in the first column"""
+    first = {}
+    for row in rows:
+        first.setdefault(row[0], row)
+    return first
+
+def _person_info(row: tuple) -> dict:
+    """Return a guest, host, panelist or scorekeeper info record from
+    its ID, name, slug and, except for guests, gender"""
+    record = {"id": row[0], "name": row[1], "slug": row[2] or slugify(row[1])}
+    if len(row) > 3:
+        record["gender"] = row[3]
+    return record
+
+def _location_info(row: tuple) -> dict:
+    """Return a location info record"""
+    return {"id": row[0], "city": row[1], "state": row[2], "venue": row[3],
+            "slug": row[4]}
+
+def _show_info(row: tuple) -> dict:
+    """Return a show info record, including the original show of a
+    repeat show"""
+    record = {"id": row[0], "date": row[1].isoformat(),
+              "best_of": bool(row[2]), "repeat_show": bool(row[3])}
+    if row[3]:
+        record["original_show_id"] = row[3]
+        record["original_show_date"] = row[4].isoformat() if row[4] else None
+    return record
+
+# Queries for the info records of the items with the requested IDs,
+# with the ID column that they are filtered by and the function that
+# builds each record
+INFO_QUERIES = {
+    "guest": ("SELECT guestid, guest, guestslug FROM ww_guests {};",
+              "guestid", _person_info),
+    "host": ("SELECT hostid, host, hostslug, hostgender FROM ww_hosts {};",
+             "hostid", _person_info),
+    "location": ("SELECT locationid, city, state, venue, locationslug "
+                 "FROM ww_locations {};", "locationid", _location_info),
+    "panelist": ("SELECT panelistid, panelist, panelistslug, panelistgender "
+                 "FROM ww_panelists {};", "panelistid", _person_info),
+    "scorekeeper": ("SELECT scorekeeperid, scorekeeper, scorekeeperslug, "
+                    "scorekeepergender FROM ww_scorekeepers {};",
+                    "scorekeeperid", _person_info),
+    "show": ("SELECT s.showid, s.showdate, s.bestof, s.repeatshowid, "
+             "o.showdate FROM ww_shows s "
+             "LEFT JOIN ww_shows o ON o.showid = s.repeatshowid {};",
+             "s.showid", _show_info)
+}
+
+def _info_records(entity: str,
+                  retrieve_all,
+                  ids: tuple,
+                  database_connection: mysql.connector.connect) -> list:
+    """Retrieve the info records of a collection: all records with the
+    wwdtm retrieve_all function, which uses a single query, or only the
+    records with the requested IDs with a query filtered by ID"""
+    if ids is None:
+        return [dict(record) for record in retrieve_all(database_connection) or []]
+
+    query, column, build = INFO_QUERIES[entity]
+    clause, params = _id_filter(column, ids)
+    return [build(row)
+            for row in _query(query.format(clause), params, database_connection)]
+
+def _show_appearance(show_id: int, show_date, best_of, repeat_show_id) -> dict:
+    """Return the show fields shared by all appearance records"""
+    return {
+        "show_id": show_id,
+        "date": show_date.isoformat(),
+        "best_of": bool(best_of),
+        "repeat_show": bool(repeat_show_id)
+    }
+
+def retrieve_guest_details(ids: tuple,
+                           database_connection: mysql.connector.connect) -> list:
+    """Retrieve guests with their appearances, either all guests or the
+    guests with the requested IDs"""
+    guests = _info_records("guest",
+                           wwdtm.guest.info.retrieve_all,
+                           ids,
+                           database_connection)
+    clause, params = _id_filter("gm.guestid", ids)
+    query = ("SELECT gm.guestid, s.showid, s.showdate, s.bestof, "
+             "s.repeatshowid, gm.guestscore, gm.exception "
+             "FROM ww_showguestmap gm "
+             "JOIN ww_shows s ON s.showid = gm.showid "
+             "{} ORDER BY s.showdate ASC;".format(clause))
+    appearances = _group(_query(query, params, database_connection))
+
+    for guest in guests:
+        guest["appearances"] = [
+            {**_show_appearance(*row[1:5]),
+             "score": row[5],
+             "score_exception": bool(row[6])}
+            for row in appearances.get(guest["id"], [])
+        ]
+
+    return guests
+
+def retrieve_host_details(ids: tuple,
+                          database_connection: mysql.connector.connect) -> list:
+    """Retrieve hosts with their appearances, either all hosts or the
+    hosts with the requested IDs"""
+    hosts = _info_records("host",
+                          wwdtm.host.info.retrieve_all,
+                          ids,
+                          database_connection)
+    clause, params = _id_filter("hm.hostid", ids)
+    query = ("SELECT hm.hostid, s.showid, s.showdate, s.bestof, "
+             "s.repeatshowid, hm.guest "
+             "FROM ww_showhostmap hm "
+             "JOIN ww_shows s ON s.showid = hm.showid "
+             "{} ORDER BY s.showdate ASC;".format(clause))
+    appearances = _group(_query(query, params, database_connection))
+
+    for host in hosts:
+        host["appearances"] = [
+            {**_show_appearance(*row[1:5]), "guest": bool(row[5])}
+            for row in appearances.get(host["id"], [])
+        ]
+
+    return hosts
+
+def retrieve_location_recordings(ids: tuple,
+                                 database_connection: mysql.connector.connect) -> list:
+    """Retrieve locations with their recordings, either all locations or
+    the locations with the requested IDs"""
+    locations = _info_records("location",
+                              wwdtm.location.info.retrieve_all,
+                              ids,
+                              database_connection)
+    clause, params = _id_filter("lm.locationid", ids)
+    query = ("SELECT lm.locationid, s.showid, s.showdate, s.bestof, "
+             "s.repeatshowid "
+             "FROM ww_showlocationmap lm "
+             "JOIN ww_shows s ON s.showid = lm.showid "
+             "{} ORDER BY s.showdate ASC;".format(clause))
+    recordings = _group(_query(query, params, database_connection))
+
+    for location in locations:
+        location["recordings"] = [_show_appearance(*row[1:5])
+                                  for row in recordings.get(location["id"], [])]
+
+    return locations
+
+def _panelist_statistics(statistics: dict) -> dict:
+    """Return panelist score statistics in the structure used by the
+    wwdtm panelist details records"""
+    scores = statistics["scores"] if statistics else {}
+    ranks = statistics["ranks"] if statistics else {}
+    return {
+        "scoring": {
+            "minimum": scores.get("minimum", 0),
+            "maximum": scores.get("maximum", 0),
+            "mean": scores.get("mean", 0),
+            "median": scores.get("median", 0),
+            "standard_deviation": scores.get("standard_deviation", 0),
+            "total": scores.get("total", 0)
+        },
+        "ranking": {name: ranks.get(rank, 0)
+                    for rank, name in RANK_NAMES.items()}
+    }
+
+def retrieve_panelist_details(ids: tuple,
+                              database_connection: mysql.connector.connect) -> list:
+    """Retrieve panelists with their score statistics and appearances,
+    either all panelists or the panelists with the requested IDs"""
+    panelists = _info_records("panelist",
+                              wwdtm.panelist.info.retrieve_all,
+                              ids,
+                              database_connection)
+    clause, params = _id_filter("pm.panelistid", ids)
+    query = ("SELECT pm.panelistid, s.showid, s.showdate, s.bestof, "
+             "s.repeatshowid, pm.panelistlrndstart, pm.panelistlrndcorrect, "
+             "pm.panelistscore, pm.showpnlrank "
+             "FROM ww_showpnlmap pm "
+             "JOIN ww_shows s ON s.showid = pm.showid "
+             "{} ORDER BY s.showdate ASC;".format(clause))
+    rows = _query(query, params, database_connection)
+    appearances = _group(rows)
+
+    # Score statistics only include regular shows, as with the panelist
+    # statistics endpoints, and are computed for all panelists at once
+    # for each data version
+    statistics = score_statistics.current(database_connection)
+
+    for panelist in panelists:
+        panelist["statistics"] = _panelist_statistics(
+            statistics.for_panelist(panelist["id"]))
+        panelist["appearances"] = [
+            {**_show_appearance(*row[1:5]),
+             "lightning_round_start": row[5],
+             "lightning_round_correct": row[6],
+             "score": row[7],
+             "rank": row[8]}
+            for row in appearances.get(panelist["id"], [])
+        ]
+
+    return panelists
+
+def retrieve_scorekeeper_details(ids: tuple,
+                                 database_connection: mysql.connector.connect) -> list:
+    """Retrieve scorekeepers with their appearances, either all
+    scorekeepers or the scorekeepers with the requested IDs"""
+    scorekeepers = _info_records("scorekeeper",
+                                 wwdtm.scorekeeper.info.retrieve_all,
+                                 ids,
+                                 database_connection)
+    clause, params = _id_filter("skm.scorekeeperid", ids)
+    query = ("SELECT skm.scorekeeperid, s.showid, s.showdate, s.bestof, "
+             "s.repeatshowid, skm.guest "
+             "FROM ww_showskmap skm "
+             "JOIN ww_shows s ON s.showid = skm.showid "
+             "{} ORDER BY s.showdate ASC;".format(clause))
+    appearances = _group(_query(query, params, database_connection))
+
+    for scorekeeper in scorekeepers:
+        scorekeeper["appearances"] = [
+            {**_show_appearance(*row[1:5]), "guest": bool(row[5])}
+            for row in appearances.get(scorekeeper["id"], [])
+        ]
+
+    return scorekeepers
+
+def retrieve_show_details(ids: tuple,
+                          database_connection: mysql.connector.connect) -> list:
+    """Retrieve shows with their location, host, scorekeeper, panelists,
+    Bluff the Listener and guest information, either all shows or the
+    shows with the requested IDs"""
+    shows = _info_records("show",
+                          wwdtm.show.info.retrieve_all,
+                          ids,
+                          database_connection)
+
+    # Hosts and scorekeepers are queried separately from the location,
+    # description and notes, so that a show with more than one of them
+    # does not multiply the rows of the others. As with wwdtm, which
+    # returns a single host and scorekeeper for each show, the first
+    # mapping of each show is used.
+    clause, params = _id_filter("s.showid", ids)
+    query = ("SELECT s.showid, l.locationid, l.city, l.state, l.venue, "
+             "l.locationslug, sd.showdescription, sn.shownotes "
+             "FROM ww_shows s "
+             "LEFT JOIN ww_showlocationmap lm ON lm.showid = s.showid "
+             "LEFT JOIN ww_locations l ON l.locationid = lm.locationid "
+             "LEFT JOIN ww_showdescriptions sd ON sd.showid = s.showid "
+             "LEFT JOIN ww_shownotes sn ON sn.showid = s.showid "
+             "{} ORDER BY s.showid ASC, lm.showlocationmapid ASC, "
+             "sd.showdescriptionid ASC, sn.shownotesid ASC;".format(clause))
+    show_rows = _first(_query(query, params, database_connection))
+
+    clause, params = _id_filter("hm.showid", ids)
+    query = ("SELECT hm.showid, h.hostid, h.host, h.hostslug, hm.guest "
+             "FROM ww_showhostmap hm "
+             "JOIN ww_hosts h ON h.hostid = hm.hostid "
+             "{} ORDER BY hm.showid ASC, hm.showhostmapid ASC;".format(clause))
+    hosts = _first(_query(query, params, database_connection))
+
+    clause, params = _id_filter("skm.showid", ids)
+    query = ("SELECT skm.showid, sk.scorekeeperid, sk.scorekeeper, "
+             "sk.scorekeeperslug, skm.guest, skm.description "
+             "FROM ww_showskmap skm "
+             "JOIN ww_scorekeepers sk ON sk.scorekeeperid = skm.scorekeeperid "
+             "{} ORDER BY skm.showid ASC, skm.showskmapid ASC;".format(clause))
+    scorekeepers = _first(_query(query, params, database_connection))
+
+    clause, params = _id_filter("pm.showid", ids)
+    query = ("SELECT pm.showid, p.panelistid, p.panelist, p.panelistslug, "
+             "pm.panelistlrndstart, pm.panelistlrndcorrect, "
+             "pm.panelistscore, pm.showpnlrank "
+             "FROM ww_showpnlmap pm "
+             "JOIN ww_panelists p ON p.panelistid = pm.panelistid "
+             "{} ORDER BY pm.showid ASC, pm.panelistscore DESC, "
+             "pm.showpnlmapid ASC;".format(clause))
+    panelists = _group(_query(query, params, database_connection))
+
+    clause, params = _id_filter("bm.showid", ids)
+    query = ("SELECT bm.showid, bm.chosenbluffpnlid, cp.panelist, "
+             "bm.correctbluffpnlid, rp.panelist "
+             "FROM ww_showbluffmap bm "
+             "LEFT JOIN ww_panelists cp ON cp.panelistid = bm.chosenbluffpnlid "
+             "LEFT JOIN ww_panelists rp ON rp.panelistid = bm.correctbluffpnlid "
+             "{};".format(clause))
+    bluffs = _first(_query(query, params, database_connection))
+
+    clause, params = _id_filter("gm.showid", ids)
+    query = ("SELECT gm.showid, g.guestid, g.guest, g.guestslug, "
+             "gm.guestscore, gm.exception "
+             "FROM ww_showguestmap gm "
+             "JOIN ww_guests g ON g.guestid = gm.guestid "
+             "{} ORDER BY gm.showid ASC, gm.showguestmapid ASC;"
+             .format(clause))
+    guests = _group(_query(query, params, database_connection))
+
+    for show in shows:
+        row = show_rows.get(show["id"])
+        if row:
+            show["location"] = {
+                "id": row[1],
+                "slug": row[5],
+                "city": row[2],
+                "state": row[3],
+                "venue": row[4]
+            }
+            show["description"] = row[6]
+            show["notes"] = row[7]
+
+        host = hosts.get(show["id"], (None,) * 5)
+        show["host"] = {
+            "id": host[1],
+            "name": host[2],
+            "slug": host[3],
+            "guest": bool(host[4])
+        }
+        scorekeeper = scorekeepers.get(show["id"], (None,) * 6)
+        show["scorekeeper"] = {
+            "id": scorekeeper[1],
+            "name": scorekeeper[2],
+            "slug": scorekeeper[3],
+            "guest": bool(scorekeeper[4]),
+            "description": scorekeeper[5]
+        }
+
+        show["panelists"] = [{
+            "id": panelist[1],
+            "name": panelist[2],
+            "slug": panelist[3],
+            "lightning_round_start": panelist[4],
+            "lightning_round_correct": panelist[5],
+            "score": panelist[6],
+            "rank": panelist[7]
+        } for panelist in panelists.get(show["id"], [])]
+
+        bluff = bluffs.get(show["id"])
+        show["bluff"] = {
+            "chosen_panelist": {"id": bluff[1], "name": bluff[2]},
+            "correct_panelist": {"id": bluff[3], "name": bluff[4]}
+        } if bluff else {}
+
+        show["guests"] = [{
+            "id": guest[1],
+            "name": guest[2],
+            "slug": guest[3],
+            "score": guest[4],
+            "score_exception": bool(guest[5])
+        } for guest in guests.get(show["id"], [])]
+
+    return shows
+
+# Set-based replacements for the wwdtm retrieve_all functions of the
+# details collections, keyed by snapshot collection name
+BULK_COLLECTIONS = {
+    "guest_details": (wwdtm.guest.details.retrieve_all,
+                      retrieve_guest_details),
+    "host_details": (wwdtm.host.details.retrieve_all,
+                     retrieve_host_details),
+    "location_recordings": (wwdtm.location.details.retrieve_all_recordings,
+                            retrieve_location_recordings),
+    "panelist_details": (wwdtm.panelist.details.retrieve_all,
+                         retrieve_panelist_details),
+    "scorekeeper_details": (wwdtm.scorekeeper.details.retrieve_all,
+                            retrieve_scorekeeper_details),
+    "show_details": (wwdtm.show.details.retrieve_all,
+                     retrieve_show_details)
+}
+
+BULK_FUNCTIONS = {retrieve_all: collection
+                  for collection, (retrieve_all, _) in BULK_COLLECTIONS.items()}
+
+# The wwdtm functions that retrieve a single details record, whose
+# records are retrieved with the same set-based queries filtered by ID
+BULK_BY_ID_FUNCTIONS = {
+    wwdtm.guest.details.retrieve_by_id: "guest_details",
+    wwdtm.host.details.retrieve_by_id: "host_details",
+    wwdtm.location.details.retrieve_recordings_by_id: "location_recordings",
+    wwdtm.panelist.details.retrieve_by_id: "panelist_details",
+    wwdtm.scorekeeper.details.retrieve_by_id: "scorekeeper_details",
+    wwdtm.show.details.retrieve_by_id: "show_details"
+}
+
+def _retrieve_all(retrieve_bulk,
+                  fallback,
+                  database_connection: mysql.connector.connect) -> list:
+    """Retrieve a collection using set-based queries, falling back to the
+    wwdtm function if the queries do not match the database schema"""
+    try:
+        return retrieve_bulk(None, database_connection)
+    except ProgrammingError:
+        return fallback(database_connection)
+
+def _retrieve_by_id(retrieve_bulk,
+                    fallback,
+                    item_id: int,
+                    database_connection: mysql.connector.connect) -> dict:
+    """Retrieve a single record using set-based queries filtered by its
+    ID, falling back to the wwdtm function if the queries do not match
+    the database schema. Returns None if the ID does not exist."""
+    try:
+        records = retrieve_bulk((item_id,), database_connection)
+    except ProgrammingError:
+        return fallback(item_id, database_connection)
+
+    return records[0] if records else None
+
+def verify_collection(collection: str,
+                      database_connection: mysql.connector.connect) -> list:
+    """Compare the records of a collection retrieved with set-based
+    queries, both all records and by ID, with the records returned by
+    wwdtm, and return the IDs of the records that differ, are in a
+    different position or only appear in one of them. Records are
+    compared as encoded in responses, so that differences in the order
+    of their keys are also found."""
+    retrieve_all, retrieve_bulk = BULK_COLLECTIONS[collection]
+    records = retrieve_all(database_connection) or []
+    expected = [json_provider.dumps(record) for record in records]
+    expected_ids = [record["id"] for record in records]
+    records = retrieve_bulk(None, database_connection)
+    actual = [json_provider.dumps(record) for record in records]
+    actual_ids = [record["id"] for record in records]
+
+    differences = {record_id
+                   for record_id, other_id, body, other_body
+                   in zip(expected_ids, actual_ids, expected, actual)
+                   if record_id != other_id or body != other_body}
+    differences.update(expected_ids[len(actual_ids):])
+    differences.update(actual_ids[len(expected_ids):])
+
+    by_id = {record["id"]: json_provider.dumps(record)
+             for record in retrieve_bulk(tuple(expected_ids),
+                                         database_connection)}
+    differences.update(record_id
+                       for record_id, body in zip(expected_ids, expected)
+                       if by_id.get(record_id) != body)
+    return sorted(differences)
+
+def verify_collections(connection_pool) -> dict:
+    """Verify each collection with verify_collection and return the IDs
+    of the records that differ, by collection, for the collections that
+    have differences. The connection used is closed, so that no sockets
+    are inherited by uWSGI workers when run at startup."""
+    differences = {}
+    try:
+        database_connection = connection_pool.get_connection()
+        try:
+            for collection in BULK_COLLECTIONS:
+                collection_differences = verify_collection(collection,
+                                                           database_connection)
+                if collection_differences:
+                    differences[collection] = collection_differences
+        finally:
+            database_connection.close()
+    finally:
+        connection_pool.close_idle()
+
+    return differences
+
+def describe_differences(differences: dict) -> str:
+    """Return a description of the differences found by
+    verify_collections, listing up to ten record IDs per collection"""
+    return "; ".join("{}: {} records differ from wwdtm, including IDs {}".format(
+        collection, len(ids), ", ".join(str(item_id) for item_id in ids[:10]))
+                     for collection, ids in differences.items())
+
+class BulkQueries:
+    """Decides whether the details collections are retrieved with
+    set-based queries or with the wwdtm functions"""
+
+    def __init__(self):
+        self.enabled = False
+        self.verify = False
+
+    def configure(self, enabled: bool = True, verify: bool = False):
+        """Enable or disable set-based queries and their verification
+        at startup"""
+        self.enabled = enabled
+        self.verify = verify
+
+    def check_collections(self, connection_pool):
+        """If set-based queries and their verification are turned on,
+        verify every collection and raise a RuntimeError if any record
+        differs from the wwdtm records. Database errors are raised as
+        well, so that the application does not start with set-based
+        queries that were not verified."""
+        if not self.enabled or not self.verify:
+            return
+
+        differences = verify_collections(connection_pool)
+        if differences:
+            raise RuntimeError("Set-based queries differ from wwdtm: "
+                               + describe_differences(differences))
+
+    def retriever(self, function):
+        """Return the set-based replacement for a wwdtm retrieve_all or
+        details retrieve_by_id function if set-based queries are enabled,
+        otherwise the function itself"""
+        collection = BULK_FUNCTIONS.get(function)
+        if self.supports(collection):
+            return functools.partial(_retrieve_all,
+                                     BULK_COLLECTIONS[collection][1],
+                                     function)
+
+        collection = BULK_BY_ID_FUNCTIONS.get(function)
+        if self.supports(collection):
+            return functools.partial(_retrieve_by_id,
+                                     BULK_COLLECTIONS[collection][1],
+                                     function)
+
+        return function
+
+    def supports(self, collection: str) -> bool:
+        """Return whether the items of a collection can be retrieved
+        with set-based queries"""
+        return self.enabled and collection in BULK_COLLECTIONS
+
+    def retrieve_by_ids(self,
+                        collection: str,
+                        ids: tuple,
+                        database_connection: mysql.connector.connect) -> list:
+        """Retrieve the items of a collection with the requested IDs,
+        in the order requested, using set-based queries. IDs that do
+        not exist are skipped. Returns None if the queries do not match
+        the database schema."""
+        retrieve_bulk = BULK_COLLECTIONS[collection][1]
+        try:
+            items = {item["id"]: item
+                     for item in retrieve_bulk(ids, database_connection)}
+        except ProgrammingError:
+            return None
+
+        return [items[item_id] for item_id in ids if item_id in items]
+
+bulk_queries = BulkQueries()
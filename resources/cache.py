@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides a cache for responses returned by the API
+endpoint request handlers"""
+
+import functools
+import json
+import struct
+
+from .cache_backends import CacheBackend, MemoryBackend, create_backend
+from .compression import compressor
+from .conditional import compute_etag, not_modified
+from .dicts import encoded_response
+from .fields import requested_fields
+from .snapshot import served_stale_snapshot
+from .tracing import current_trace
+from .version import data_version
+
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Vary")
+
+DEFAULT_CACHE_CONFIG = {
+    "backend": "memory",
+    "ttl": 3600,
+    "max_size": 64 * 1024 * 1024
+}
+
+class ResponseCache:
+    """Cache of encoded responses stored in a pluggable backend, with
+    entries expiring after a time-to-live. Hit and miss counters are
+    kept per worker."""
+
+    def __init__(self, backend: CacheBackend = None, ttl: float = 3600):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl: float = 3600, **backend_config):
+        """Replace the cache backend and time-to-live using the cache
+        section of the application configuration"""
+        self.backend = create_backend(**backend_config)
+        self.ttl = ttl
+
+    def get(self, key: str):
+        """Return the cached (body, status, headers) entry for the key,
+        or None if the key is not cached or the entry has expired"""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return unpack_entry(value)
+
+    def set(self, key: str, body: bytes, status: int, headers: list):
+        """Store an encoded response body along with its status code and
+        headers"""
+        if self.ttl > 0:
+            self.backend.set(key, pack_entry(body, status, headers), self.ttl)
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Return hit and miss counters along with backend statistics"""
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl": self.ttl
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+def pack_entry(body: bytes, status: int, headers: list) -> bytes:
+    """Serialize an encoded response into the bytes stored by a cache
+    backend: the status code and header block length, the headers as a
+    JSON list of name and value pairs, and the body"""
+    header_block = json.dumps(headers, separators=(",", ":")).encode("utf-8")
+    return struct.pack("!HI", status, len(header_block)) + header_block + body
+
+def unpack_entry(value: bytes) -> tuple:
+    """Return the (body, status, headers) tuple for bytes stored by a
+    cache backend"""
+    status, header_length = struct.unpack_from("!HI", value)
+    header_end = 6 + header_length
+    headers = json.loads(value[6:header_end])
+    return value[header_end:], status, headers
+
+response_cache = ResponseCache()
+
+def _cached_response(entry: tuple, cache_status: str):
+    """Return the response for a (body, status, headers) cache entry,
+    or a 304 Not Modified response if the current request is a matching
+    conditional request"""
+    body, status, headers = entry
+    if status == 200:
+        response = not_modified(headers)
+        if response:
+            return response
+
+    response = encoded_response(body, status, headers)
+    response.headers["X-Cache"] = cache_status
+    return response
+
+def cached_response(handler):
+    """Decorator for request handlers that caches successful and not
+    found responses, keyed by the current data version, the handler and
+    its arguments. The last argument of a handler, the database
+    connection, is not part of the key, and the fields requested with
+    the fields query parameter are. Responses are not cached while
+    the data version is unknown, if the request is traced or if it was
+    answered from a snapshot older than the data version.
+
+    Successful responses are given ETag and Last-Modified validators,
+    and conditional requests matching them are answered with a 304 Not
+    Modified response. Compressed variants of successful responses are
+    created on first request for each accepted encoding and cached
+    alongside the uncompressed response."""
+    @functools.wraps(handler)
+    def wrapper(*args):
+        version = data_version.current(args[-1])
+        if not version or current_trace():
+            return handler(*args)
+
+        key = "{}:{}.{}{}".format(version,
+                                  handler.__module__,
+                                  handler.__name__,
+                                  args[:-1])
+        selection = requested_fields()
+        if selection:
+            key = "{}?fields={}".format(key, selection)
+
+        encoding = compressor.negotiate()
+        if encoding:
+            entry = response_cache.get("{}:{}".format(key, encoding))
+            if entry:
+                return _cached_response(entry, "HIT")
+
+        cache_status = "HIT"
+        entry = response_cache.get(key)
+        if not entry:
+            response, status = handler(*args)
+            if status >= 500 or served_stale_snapshot():
+                return response, status
+
+            body = response.get_data()
+            response.vary.add("Accept-Encoding")
+            if status == 200:
+                response.headers["ETag"] = compute_etag(version, body)
+                if data_version.last_modified:
+                    response.headers["Last-Modified"] = data_version.last_modified
+
+            headers = [(name, response.headers[name])
+                       for name in CACHED_HEADERS if name in response.headers]
+            entry = (body, status, headers)
+            response_cache.set(key, *entry)
+            cache_status = "MISS"
+
+        if encoding:
+            compressed_entry = compressor.compress_entry(entry, encoding)
+            if compressed_entry:
+                response_cache.set("{}:{}".format(key, encoding),
+                                   *compressed_entry)
+                entry = compressed_entry
+
+        return _cached_response(entry, cache_status)
+
+    return wrapper
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides the storage backends used by the response
+cache. Each backend stores serialized responses as bytes."""
+
+import collections
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+class CacheBackend:
+    """Interface implemented by response cache storage backends"""
+
+    def get(self, key: str):
+        """Return the bytes stored for the key, or None if the key is
+        not stored or has expired"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        """Store bytes for the key for ttl seconds"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries stored by the backend"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Return backend specific statistics"""
+        return {}
+
+class MemoryBackend(CacheBackend):
+    """Per-process least recently used cache bounded by the total size
+    of the stored values"""
+
+    def __init__(self, max_size: int = 64 * 1024 * 1024):
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.max_size = max_size
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            expires, size, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._size -= size
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        size = len(key) + len(value)
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+            while self._entries and self._size + size > self.max_size:
+                self._size -= self._entries.popitem(last=False)[1][1]
+
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._size += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size
+            }
+
+class UWSGIBackend(CacheBackend):
+    """Cache shared by all uWSGI workers, stored in a uWSGI cache2
+    shared memory cache. The cache must be declared in the uWSGI
+    configuration, for example:
+
+        cache2 = name=api_wwdtm,items=2048,blocks=8192,blocksize=8192,bitmap=1
+    """
+
+    def __init__(self, cache_name: str = "api_wwdtm", uwsgi_module=None):
+        uwsgi_module = uwsgi_module or uwsgi
+        if not uwsgi_module:
+            raise ImportError("The uwsgi cache backend is only available "
+                              "when running under uWSGI")
+        self._uwsgi = uwsgi_module
+        self.cache_name = cache_name
+
+    def get(self, key: str):
+        return self._uwsgi.cache_get(key, self.cache_name)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        # uWSGI silently refuses values larger than the cache can hold
+        self._uwsgi.cache_update(key, value, max(int(ttl), 1), self.cache_name)
+
+    def clear(self):
+        self._uwsgi.cache_clear(self.cache_name)
+
+class RedisBackend(CacheBackend):
+    """Cache shared by all workers and hosts, stored in Redis. A client
+    instance, such as a fakeredis client, can be passed in place of
+    connecting to the Redis server at the given URL. Redis errors are
+    treated as cache misses rather than failing the request."""
+
+    def __init__(self,
+                 redis_url: str = "redis://localhost:6379/0",
+                 key_prefix: str = "api_wwdtm:",
+                 client=None):
+        if client is None:
+            if not redis:
+                raise ImportError("The redis cache backend requires the "
+                                  "redis package")
+            client = redis.Redis.from_url(redis_url)
+        self._client = client
+        self._errors = (redis.RedisError,) if redis else ()
+        self.key_prefix = key_prefix
+
+    def get(self, key: str):
+        try:
+            return self._client.get(self.key_prefix + key)
+        except self._errors:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        try:
+            self._client.set(self.key_prefix + key,
+                             value,
+                             px=max(int(ttl * 1000), 1))
+        except self._errors:
+            pass
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(match=self.key_prefix + "*"))
+            if keys:
+                self._client.delete(*keys)
+        except self._errors:
+            pass
+
+def create_backend(backend: str = "memory",
+                   max_size: int = 64 * 1024 * 1024,
+                   uwsgi_cache: str = "api_wwdtm",
+                   redis_url: str = "redis://localhost:6379/0",
+                   key_prefix: str = "api_wwdtm:",
+                   redis_client=None) -> CacheBackend:
+    """Create the cache backend named in the cache configuration. A
+    Redis client instance can be passed in place of connecting to the
+    Redis URL."""
+    if backend == "memory":
+        return MemoryBackend(max_size)
+    if backend == "uwsgi":
+        return UWSGIBackend(uwsgi_cache)
+    if backend == "redis":
+        return RedisBackend(redis_url, key_prefix, client=redis_client)
+
+    raise ValueError("Unknown cache backend '{}'".format(backend))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides gzip and Brotli compression of encoded response
+bodies based on the Accept-Encoding request header"""
+
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_COMPRESSION_CONFIG = {
+    "enabled": True,
+    "min_size": 1024,
+    "gzip_level": 9,
+    "brotli_quality": 11
+}
+
+class Compressor:
+    """Compresses response bodies using the best encoding accepted by
+    the client. Compressed bodies are meant to be cached, so the
+    highest compression levels are used by default."""
+
+    def __init__(self,
+                 enabled: bool = True,
+                 min_size: int = 1024,
+                 gzip_level: int = 9,
+                 brotli_quality: int = 11):
+        self.configure(enabled, min_size, gzip_level, brotli_quality)
+
+    def configure(self,
+                  enabled: bool = True,
+                  min_size: int = 1024,
+                  gzip_level: int = 9,
+                  brotli_quality: int = 11):
+        """Update the compression settings"""
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli else ("gzip",)
+
+    def negotiate(self) -> str:
+        """Return the preferred content encoding accepted by the client
+        for the current request, or None if the response should not be
+        compressed"""
+        if not self.enabled:
+            return None
+
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """Return the body compressed with the requested encoding"""
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+
+        # A gzip container written by zlib has no timestamp, so the same
+        # body always compresses to the same bytes
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    def compress_entry(self, entry: tuple, encoding: str) -> tuple:
+        """Return a compressed copy of a (body, status, headers) cache
+        entry, or None if the entry should not be compressed. The ETag
+        of the compressed entry is suffixed with the encoding so that
+        each representation has its own strong validator."""
+        body, status, headers = entry
+        if status != 200 or len(body) < self.min_size:
+            return None
+
+        compressed_headers = []
+        for name, value in headers:
+            if name == "ETag":
+                value = '{}-{}"'.format(value[:-1], encoding)
+            compressed_headers.append((name, value))
+        compressed_headers.append(("Content-Encoding", encoding))
+        return self.compress(body, encoding), status, compressed_headers
+
+compressor = Compressor()
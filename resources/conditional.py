@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides functions that generate ETag response
+validators and handle conditional GET requests"""
+
+import hashlib
+
+from flask import current_app, request
+from werkzeug.http import is_resource_modified, quote_etag
+
+def compute_etag(version: str, body: bytes) -> str:
+    """Return a quoted strong ETag made up of the data version token and
+    a hash of the response body"""
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return quote_etag("{}-{}".format(version, digest))
+
+def not_modified(headers: list):
+    """Return a 304 Not Modified response if the ETag or Last-Modified
+    values in the response headers satisfy the conditional headers of
+    the current request, otherwise return None"""
+    validators = dict(headers)
+    etag = validators.get("ETag")
+    last_modified = validators.get("Last-Modified")
+    if not etag and not last_modified:
+        return None
+
+    if is_resource_modified(request.environ,
+                            etag=etag,
+                            last_modified=last_modified):
+        return None
+
+    # A 304 response has no body, so it does not get the default
+    # Content-Type that response classes add
+    validator_headers = [(name, value) for name, value in headers
+                         if name in ("ETag", "Last-Modified", "Vary")]
+    response = current_app.response_class(status=304, headers=validator_headers)
+    del response.headers["Content-Type"]
+    return response
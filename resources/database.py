@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides a MySQL connection pool used to hand out one
+database connection per API request"""
+
+import queue
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errorcode, errors, pooling
+
+from .metrics import record_database_time, record_reconnect
+from .tracing import trace_query, trace_rows
+
+DEFAULT_POOL_CONFIG = {
+    "pool_size": 5,
+    "max_overflow": 5,
+    "timeout": 10,
+    "max_age": 3600,
+    "health_check_interval": 30
+}
+
+DISCONNECT_ERRORS = (errorcode.CR_SERVER_GONE_ERROR,
+                     errorcode.CR_SERVER_LOST,
+                     errorcode.CR_CONNECTION_ERROR,
+                     errorcode.CR_CONN_HOST_ERROR)
+
+class MeteredCursor:
+    """Wraps a cursor to add the time spent sending queries and reading
+    their results, and the number of queries sent, to the metrics of
+    the current request. Statements and row counts are also added to
+    the query trace of traced requests."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _record_query(self, operation, started: float):
+        """Record a statement that was sent, preferring the statement
+        with its parameters filled in when the cursor provides it"""
+        seconds = time.perf_counter() - started
+        record_database_time(seconds, queries=1)
+        trace_query(getattr(self._cursor, "statement", None) or operation,
+                    seconds)
+
+    def _record_rows(self, count: int, started: float):
+        """Record rows that were read"""
+        seconds = time.perf_counter() - started
+        record_database_time(seconds)
+        trace_rows(count, seconds)
+
+    def execute(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            self._record_query(operation, started)
+
+    def executemany(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, *args, **kwargs)
+        finally:
+            self._record_query(operation, started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = None
+        try:
+            row = self._cursor.fetchone()
+            return row
+        finally:
+            self._record_rows(1 if row is not None else 0, started)
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = None
+        try:
+            rows = self._cursor.fetchmany(*args, **kwargs)
+            return rows
+        finally:
+            self._record_rows(len(rows) if rows else 0, started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = None
+        try:
+            rows = self._cursor.fetchall()
+            return rows
+        finally:
+            self._record_rows(len(rows) if rows else 0, started)
+
+class MeteredConnection:
+    """Wraps a connection opened with mysql.connector.connect, which is
+    a CMySQLConnection when the C extension is installed, so that every
+    cursor it creates is a MeteredCursor. Wrapping the connection rather
+    than subclassing MySQLConnection keeps the C extension in use."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, attr):
+        return getattr(self._connection, attr)
+
+    def cursor(self, *args, **kwargs):
+        """Return a metered cursor for the connection"""
+        return MeteredCursor(self._connection.cursor(*args, **kwargs))
+
+class PooledConnection:
+    """Connection checked out from a ConnectionPool, which is returned
+    to the pool rather than disconnected when it is closed. Used instead
+    of mysql.connector's PooledMySQLConnection, which only accepts
+    unwrapped connections."""
+
+    def __init__(self, pool, connection: MeteredConnection):
+        self._pool = pool
+        self._connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, attr):
+        return getattr(self._connection, attr)
+
+    def close(self):
+        """Return the connection to the pool, after reading any result
+        left unread and rolling back any open transaction so that the
+        next request gets a clean connection. Connections that cannot be
+        cleaned up are discarded instead."""
+        if self._connection is None:
+            return
+
+        connection, self._connection = self._connection, None
+        try:
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+        except errors.Error:
+            self._pool.discard_connection(connection)
+            return
+
+        self._pool.add_connection(connection)
+
+class LazyConnection:
+    """Stands in for a connection from a ConnectionPool and only checks
+    one out when it is first used, so that requests that are served
+    without querying the database, such as from the response cache or
+    the dataset snapshot, do not hold a connection. The error raised if
+    no connection was available is kept in checkout_error."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._connection = None
+        self.checkout_error = None
+
+    def __getattr__(self, attr):
+        if self._connection is None:
+            try:
+                self._connection = self._pool.get_connection()
+            except errors.PoolError as err:
+                self.checkout_error = err
+                raise
+
+        return getattr(self._connection, attr)
+
+    @property
+    def checked_out(self) -> bool:
+        """Return whether a connection has been checked out"""
+        return self._connection is not None
+
+    def close(self):
+        """Return the connection to the pool if one was checked out"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            connection.close()
+
+def reconnect(database_connection: MeteredConnection):
+    """Reconnect a connection to the database server and record the
+    reconnect in the metrics"""
+    started = time.perf_counter()
+    try:
+        database_connection.reconnect()
+    finally:
+        record_reconnect(time.perf_counter() - started)
+
+class ConnectionPool(pooling.MySQLConnectionPool):
+    """MySQL connection pool built on top of mysql.connector's pooling
+    support that opens connections on demand, allows a number of
+    overflow connections beyond the pool size, waits up to a checkout
+    timeout for a connection to be returned and recycles connections
+    that are older than a maximum age. Connections that have been idle
+    for longer than the health check interval are pinged on checkout
+    and only reconnected if the ping fails."""
+
+    def __init__(self,
+                 pool_size: int = 5,
+                 max_overflow: int = 0,
+                 timeout: float = 10,
+                 max_age: float = 3600,
+                 health_check_interval: float = 30,
+                 pool_name: str = "api_wwdtm",
+                 **kwargs):
+        # Connections are opened on first use rather than up front so
+        # that no sockets are shared between forked uWSGI workers
+        super().__init__(pool_size=pool_size,
+                         pool_name=pool_name,
+                         pool_reset_session=False)
+        self.set_config(**kwargs)
+        self._max_overflow = max(max_overflow, 0)
+        self._timeout = timeout
+        self._max_age = max_age
+        self._health_check_interval = health_check_interval
+        self._connection_count = 0
+        self._condition = threading.Condition()
+
+    @property
+    def max_overflow(self):
+        """Return the number of connections allowed beyond the pool
+        size"""
+        return self._max_overflow
+
+    def _connect(self):
+        """Open a new MySQL connection using the pool configuration"""
+        connection = MeteredConnection(mysql.connector.connect(**self._cnx_config))
+        # pylint: disable=W0201,W0212
+        connection._pool_config_version = self._config_version
+        connection._pool_connected_at = time.monotonic()
+        connection._pool_last_used = connection._pool_connected_at
+        # pylint: enable=W0201,W0212
+        return connection
+
+    def add_connection(self, cnx=None):
+        """Add a connection to the pool, or return a connection that
+        was checked out. Overflow connections that do not fit back into
+        the pool are closed."""
+        with self._condition:
+            if not cnx:
+                cnx = self._connect()
+                self._connection_count += 1
+
+            cnx._pool_last_used = time.monotonic()
+            try:
+                self._cnx_queue.put(cnx, block=False)
+            except queue.Full:
+                self._connection_count -= 1
+                try:
+                    cnx.disconnect()
+                except errors.Error:
+                    pass
+
+            self._condition.notify()
+
+    def discard_connection(self, cnx):
+        """Disconnect a connection that was checked out instead of
+        returning it to the pool, making room for a new connection"""
+        with self._condition:
+            self._connection_count -= 1
+            self._condition.notify()
+
+        try:
+            cnx.disconnect()
+        except errors.Error:
+            pass
+
+    def get_connection(self):
+        """Check out a connection from the pool, opening a new one if
+        the pool or the overflow allowance has room, or waiting up to
+        the checkout timeout for one to be returned
+
+        Raises PoolError if no connection becomes available in time."""
+        deadline = time.monotonic() + self._timeout
+        with self._condition:
+            while True:
+                try:
+                    cnx = self._cnx_queue.get(block=False)
+                    break
+                except queue.Empty:
+                    pass
+
+                if self._connection_count < self.pool_size + self._max_overflow:
+                    cnx = None
+                    self._connection_count += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise errors.PoolError("Timed out waiting for a database "
+                                           "connection; pool exhausted")
+                self._condition.wait(remaining)
+
+        try:
+            now = time.monotonic()
+            if not cnx:
+                cnx = self._connect()
+            elif now - cnx._pool_connected_at > self._max_age:
+                reconnect(cnx)
+                cnx._pool_connected_at = time.monotonic()
+            elif now - cnx._pool_last_used > self._health_check_interval:
+                cnx.ping(reconnect=True, attempts=1)
+        except errors.Error:
+            with self._condition:
+                self._connection_count -= 1
+                self._condition.notify()
+            raise
+
+        return PooledConnection(self, cnx)
+
+    def close_idle(self):
+        """Close all connections that are not checked out, such as
+        before the uWSGI master forks its workers, so that no sockets
+        are shared between processes"""
+        with self._condition:
+            while True:
+                try:
+                    cnx = self._cnx_queue.get(block=False)
+                except queue.Empty:
+                    break
+
+                self._connection_count -= 1
+                try:
+                    cnx.disconnect()
+                except errors.Error:
+                    pass
+
+def with_reconnect(function, *args):
+    """Call a wwdtm function that takes the database connection as its
+    last argument. If the call fails because the connection to the
+    database server was lost, reconnect and retry the call once."""
+    try:
+        return function(*args)
+    except (errors.InterfaceError, errors.OperationalError) as err:
+        database_connection = args[-1]
+        if (err.errno not in DISCONNECT_ERRORS
+                and database_connection.is_connected()):
+            raise
+
+        reconnect(database_connection)
+        return function(*args)
+
+def create_pool(config_dict: dict) -> ConnectionPool:
+    """Create a connection pool from the "database" and optional
+    "database_pool" sections of the application configuration"""
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+    pool_config.update(config_dict.get("database_pool", {}))
+    database_config = dict(config_dict["database"])
+    database_config.setdefault("autocommit", True)
+    return ConnectionPool(**pool_config, **database_config)
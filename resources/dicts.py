@@ -2,12 +2,29 @@
 # Copyright (c) 2018-2019 Linh Pham
 # wwdtm is relased under the terms of the Apache License 2.0
 """This module provides functions that wrap data or messages being
-returned in a formatted dictionary"""
+returned in a formatted dictionary, and functions that encode those
+dictionaries into response bodies"""
 
-def success_dict(key_name: str, data: object):
-    """Return a success dictionary containing response data"""
-    data_dict = {key_name: data}
-    return {"status": "success", "data": data_dict}
+import time
+
+from flask import current_app
+
+from .encoding import json_provider
+from .fields import select_fields
+from .metrics import record_serialization_time
+
+def success_dict(key_name: str,
+                 data: object,
+                 paging: dict = None,
+                 prune: bool = True):
+    """Return a success dictionary containing response data and, for
+    paginated responses, the paging information. Unless prune is unset,
+    the data only includes the fields requested for the request."""
+    data_dict = {key_name: select_fields(data) if prune else data}
+    if paging is None:
+        return {"status": "success", "data": data_dict}
+
+    return {"status": "success", "data": data_dict, "paging": paging}
 
 def fail_dict(key_name: str, value: str):
     """Return a fail dictionary containing the failed request and
@@ -16,4 +33,30 @@ def fail_dict(key_name: str, value: str):
 
 def error_dict(error_message: str):
     """Return an error dictionary containing the error message"""
-    return {"status": "error", "error": error_message}
\ No newline at end of file
+    return {"status": "error", "error": error_message}
+
+def encode(response_dict: dict) -> bytes:
+    """Return the encoded JSON body for a response dictionary, formatted
+    the same way as flask.jsonify"""
+    started = time.perf_counter()
+    body = json_provider.dumps(response_dict) + b"\n"
+    record_serialization_time(time.perf_counter() - started)
+    return body
+
+def encoded_response(body: bytes, status: int = 200, headers: list = None):
+    """Return a response for an already encoded body without encoding it
+    again. The body is served as JSON unless the headers include a
+    Content-Type, such as for cached binary responses."""
+    mimetype = "application/json"
+    if headers and any(name.lower() == "content-type" for name, _ in headers):
+        mimetype = None
+
+    return current_app.response_class(body,
+                                      status=status,
+                                      headers=headers,
+                                      mimetype=mimetype)
+
+def json_response(response_dict: dict):
+    """Return a response containing the encoded JSON body for a response
+    dictionary"""
+    return encoded_response(encode(response_dict))
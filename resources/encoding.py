@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides the JSON providers used to encode response
+bodies. The orjson provider is used when orjson is installed and
+produces the same output as the standard library provider, which
+matches the output of flask.jsonify.
+
+The one deliberate difference from flask.jsonify is that NaN and
+infinite floats are encoded as null by both providers, as orjson does,
+rather than as the NaN and Infinity literals, which are not valid
+JSON."""
+
+import datetime
+import decimal
+import json
+import math
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+import numpy
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask JSON encoder that also encodes Decimal values, which are
+    encoded as strings to preserve their precision"""
+
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+
+        return super().default(o)
+
+def _escape_char(char: str) -> str:
+    """Return the \\u escape sequence for a non-ASCII character, using a
+    surrogate pair for characters outside of the Basic Multilingual
+    Plane, in the same way as json.dumps with ensure_ascii"""
+    code_point = ord(char)
+    if code_point < 0x10000:
+        return "\\u{:04x}".format(code_point)
+
+    code_point -= 0x10000
+    return "\\u{:04x}\\u{:04x}".format(0xd800 | (code_point >> 10),
+                                       0xdc00 | (code_point & 0x3ff))
+
+def _ascii(body: bytes) -> bytes:
+    """Escape the characters in UTF-8 encoded JSON that json.dumps with
+    ensure_ascii escapes: non-ASCII characters and DEL. Only the escaped
+    characters are decoded and visited by Python code."""
+    if b"\x7f" in body:
+        body = body.replace(b"\x7f", b"\\u007f")
+    if body.isascii():
+        return body
+
+    # Every byte of a multi-byte UTF-8 character is at least 0x80, so
+    # each run of such bytes holds whole characters
+    high = numpy.flatnonzero(numpy.frombuffer(body, dtype=numpy.uint8) >= 0x80)
+    breaks = numpy.flatnonzero(numpy.diff(high) > 1)
+    starts = [high[0].item()] + high[breaks + 1].tolist()
+    ends = (high[breaks] + 1).tolist() + [high[-1].item() + 1]
+
+    parts = []
+    position = 0
+    for start, end in zip(starts, ends):
+        chars = body[start:end].decode("utf-8")
+        parts.append(body[position:start])
+        parts.append("".join([_escape_char(char) for char in chars]).encode("ascii"))
+        position = end
+    parts.append(body[position:])
+    return b"".join(parts)
+
+def _repr_floats_differ(body: bytes) -> bool:
+    """Return whether JSON written by orjson may contain a float that
+    repr writes differently.
+
+    orjson writes floats of at least 1e16 or less than 1e-4 differently
+    from repr, which uses exponents with a sign and two or more digits,
+    such as 1e+16 and 1e-07, and which orjson writes as 1e16, 1e-7 or
+    0.00001. Other floats are written the same way. orjson does not pass
+    floats to the default function, so only the bytes following a digit
+    and an e, or a zero and a decimal point, are compared. Matches inside
+    strings only cost encoding the object again."""
+    data = numpy.frombuffer(body, dtype=numpy.uint8)
+    digits = (data - ord("0")) < 10
+
+    # A digit, e and a digit or minus sign, as in 1e16 or 1e-7
+    exponents = numpy.flatnonzero(digits[:-2] & (data[1:-1] == ord("e"))) + 2
+    if exponents.size and (digits[exponents]
+                           | (data[exponents] == ord("-"))).any():
+        return True
+
+    # A zero, decimal point and four zeros, as in 0.00001
+    if b"." not in body:
+        return False
+
+    points = numpy.flatnonzero(data[1:-4] == ord(".")) + 1
+    zeros = data[points - 1] == ord("0")
+    for offset in range(1, 5):
+        zeros &= data[points + offset] == ord("0")
+    return bool(zeros.any())
+
+def _orjson_default(o):
+    """Encode types that orjson passes through or does not support in
+    the same way as the Flask JSON encoder"""
+    if isinstance(o, datetime.date):
+        return http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+
+    raise TypeError("Object of type {} is not JSON serializable"
+                    .format(type(o).__name__))
+
+def _finite(obj):
+    """Return a copy of an object with NaN and infinite floats replaced
+    with None"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+
+    return obj
+
+class StdlibJSONProvider:
+    """JSON provider using the standard library json module"""
+    name = "stdlib"
+
+    def dumps(self, obj) -> bytes:
+        """Return the compact, ASCII-only JSON encoding of an object,
+        with NaN and infinite floats encoded as null"""
+        try:
+            body = json.dumps(obj,
+                              cls=JSONEncoder,
+                              separators=(",", ":"),
+                              allow_nan=False)
+        except ValueError:
+            body = json.dumps(_finite(obj),
+                              cls=JSONEncoder,
+                              separators=(",", ":"))
+        return body.encode("ascii")
+
+class OrjsonJSONProvider:
+    """JSON provider using orjson, falling back to the standard library
+    for objects that orjson cannot encode, such as integers larger than
+    64 bits, or writes differently, such as floats with exponents"""
+    name = "orjson"
+
+    def __init__(self):
+        self._fallback = StdlibJSONProvider()
+
+    def dumps(self, obj) -> bytes:
+        """Return the compact, ASCII-only JSON encoding of an object"""
+        # Dictionaries with keys other than strings are rare, and
+        # allowing them makes orjson noticeably slower, so they are only
+        # allowed when encoding without them fails
+        try:
+            body = orjson.dumps(obj,
+                                default=_orjson_default,
+                                option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            try:
+                body = orjson.dumps(obj,
+                                    default=_orjson_default,
+                                    option=(orjson.OPT_NON_STR_KEYS
+                                            | orjson.OPT_PASSTHROUGH_DATETIME))
+            except orjson.JSONEncodeError:
+                return self._fallback.dumps(obj)
+
+        if _repr_floats_differ(body):
+            return self._fallback.dumps(obj)
+
+        # orjson always writes UTF-8, so escape non-ASCII characters to
+        # match json.dumps with ensure_ascii
+        return _ascii(body)
+
+class JSONProvider:
+    """Configurable JSON provider used for all response bodies"""
+
+    def __init__(self, provider: str = "orjson"):
+        self.configure(provider)
+
+    def configure(self, provider: str = "orjson"):
+        """Select the JSON provider by name. The standard library
+        provider is used if orjson is requested but not installed."""
+        if provider == "orjson" and orjson:
+            self._provider = OrjsonJSONProvider()
+        elif provider in ("orjson", "stdlib"):
+            self._provider = StdlibJSONProvider()
+        else:
+            raise ValueError("Unknown JSON provider '{}'".format(provider))
+
+    @property
+    def name(self) -> str:
+        """Return the name of the selected JSON provider"""
+        return self._provider.name
+
+    def dumps(self, obj) -> bytes:
+        """Return the compact, ASCII-only JSON encoding of an object"""
+        return self._provider.dumps(obj)
+
+json_provider = JSONProvider()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides functions that handle field selection with the
+fields query parameter, which limits the fields returned for each item
+in a response to the requested fields"""
+
+import re
+
+from flask import g, has_request_context, request
+
+MAX_FIELDS = 50
+
+_FIELD_PATH = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+# Top-level fields of the records in each snapshot collection, as seen
+# in the records returned by lookups
+_collection_fields = {}
+
+class FieldSelection:
+    """Requested fields, as a tree of field names. Nested fields are
+    requested as dotted paths, such as location.city, and requesting a
+    field returns the whole value of that field."""
+
+    def __init__(self, paths: list):
+        self.paths = tuple(sorted(set(paths)))
+        self.tree = {}
+        for path in self.paths:
+            node = self.tree
+            names = path.split(".")
+            for name in names[:-1]:
+                if node.get(name, {}) is None:
+                    break
+                node = node.setdefault(name, {})
+            else:
+                node[names[-1]] = None
+
+    @property
+    def top_level(self) -> frozenset:
+        """Return the names of the requested top-level fields"""
+        return frozenset(self.tree)
+
+    def __str__(self):
+        return ",".join(self.paths)
+
+    def select(self, data):
+        """Return a copy of the data containing only the requested
+        fields. If the data is a list, the fields are selected from
+        each item in the list."""
+        return _select(data, self.tree)
+
+def _select(value, tree: dict):
+    """Return the parts of a value selected by a field tree, without
+    modifying the value"""
+    if tree is None:
+        return value
+    if isinstance(value, dict):
+        return {name: _select(field_value, tree[name])
+                for name, field_value in value.items() if name in tree}
+    if isinstance(value, (list, tuple)):
+        return [_select(item, tree) for item in value]
+
+    return value
+
+def parse_fields(value: str) -> FieldSelection:
+    """Return the field selection for a comma-separated list of field
+    paths, or None if no fields were requested
+
+    Raises ValueError if a field path is not valid."""
+    if value is None:
+        return None
+
+    paths = [path.strip() for path in value.split(",") if path.strip()]
+    if not paths:
+        raise ValueError("At least one field must be provided")
+    if len(paths) > MAX_FIELDS:
+        raise ValueError("No more than {} fields can be requested"
+                         .format(MAX_FIELDS))
+    for path in paths:
+        if not _FIELD_PATH.match(path):
+            raise ValueError("Invalid field '{}'".format(path))
+
+    return FieldSelection(paths)
+
+def requested_fields() -> FieldSelection:
+    """Return the field selection requested for the current request,
+    or None if no fields were requested or there is no request
+
+    Raises ValueError if the fields query parameter is not valid."""
+    if not has_request_context():
+        return None
+
+    if "field_selection" not in g:
+        g.field_selection = parse_fields(request.args.get("fields"))
+    return g.field_selection
+
+def select_fields(data):
+    """Return the data with only the fields requested for the current
+    request, or the data itself if no fields were requested"""
+    selection = requested_fields()
+    if selection is None:
+        return data
+
+    return selection.select(data)
+
+def note_fields(collection: str, records):
+    """Record the top-level fields of the records in a collection, as
+    returned by a lookup"""
+    if collection in _collection_fields:
+        return
+    if isinstance(records, (list, tuple)):
+        records = records[0] if records else None
+    if isinstance(records, dict):
+        _collection_fields[collection] = frozenset(records)
+
+def fields_covered(collection: str, selection: FieldSelection) -> bool:
+    """Return whether all of the selected top-level fields are known to
+    be present in the records of a collection"""
+    known_fields = _collection_fields.get(collection)
+    return known_fields is not None and selection.top_level <= known_fields
@@ -6,140 +6,208 @@ for /guest"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .indexes import from_slug
+from .pagination import Page, paginate_items, retrieve_page
+from .snapshot import from_snapshot, snapshot_retriever
+from .streaming import retrieve_each, stream_response
 from wwdtm.guest import details, info
 
-def get_guests(database_connection: mysql.connector.connect):
+@cached_response
+def get_guests(page: Page,
+               database_connection: mysql.connector.connect):
     """Retrieve a list of guests and their corresponding information"""
     try:
-        database_connection.reconnect()
-        guests = info.retrieve_all(database_connection)
+        guests = from_snapshot("guest_info", "all",
+                               info.retrieve_all,
+                               database_connection)
         if not guests:
             response = fail_dict("guests", "No guests found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("guests", guests)), 200
+        paging = None
+        if page:
+            guests, paging = paginate_items(guests, page)
+
+        return json_response(success_dict("guests", guests, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guests from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guests from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_guest_by_id(guest_id: int,
                     database_connection: mysql.connector.connect):
     """Retrieve a guest based on their ID"""
     try:
-        database_connection.reconnect()
-        guest_info = info.retrieve_by_id(guest_id, database_connection)
+        guest_info = from_snapshot("guest_info", "id",
+                                   info.retrieve_by_id,
+                                   guest_id,
+                                   database_connection)
         if not guest_info:
             message = "Guest ID {} not found".format(guest_id)
             response = fail_dict("guest", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("guest", guest_info)), 200
+        return json_response(success_dict("guest", guest_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guest information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guest information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_guest_details_by_id(guest_id: int,
                             database_connection: mysql.connector.connect):
     """Retrieve a guest with their appearance data based on their ID"""
     try:
-        database_connection.reconnect()
-        guest_details = details.retrieve_by_id(guest_id, database_connection)
+        guest_details = from_snapshot("guest_details", "id",
+                                      details.retrieve_by_id,
+                                      guest_id,
+                                      database_connection)
         if not guest_details:
             message = "Guest ID {} not found".format(guest_id)
             response = fail_dict("guest", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("guest", guest_details)), 200
+        return json_response(success_dict("guest", guest_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guest information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guest information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_guest_details(database_connection: mysql.connector.connect):
+@cached_response
+def get_guest_details(page: Page,
+                      database_connection: mysql.connector.connect):
     """Retrieve all guests and their corresponding appearances"""
     try:
-        database_connection.reconnect()
-        guest_details = details.retrieve_all(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("guest_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("guest_details", "id",
+                                                details.retrieve_by_id)
+            guest_details, paging = retrieve_page(retrieve_all,
+                                                  retrieve_by_id,
+                                                  page,
+                                                  database_connection)
+            return json_response(success_dict("guests", guest_details, paging)), 200
+
+        guest_details = from_snapshot("guest_details", "all",
+                                      details.retrieve_all,
+                                      database_connection)
         if not guest_details:
             response = fail_dict("guests", "No guests found")
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("guests", guest_details)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve guests from the database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "guests information")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def stream_guest_details(ndjson: bool,
+                         database_connection: mysql.connector.connect):
+    """Stream all guests and their corresponding appearances, retrieving
+    and encoding one guest at a time"""
+    try:
+        guests = from_snapshot("guest_info", "all",
+                               info.retrieve_all,
+                               database_connection)
+        if not guests:
+            response = fail_dict("guests", "No guests found")
+            return json_response(response), 404
 
-        return jsonify(success_dict("guests", guest_details)), 200
+        guest_ids = [guest["id"] for guest in guests]
+        retrieve_by_id = snapshot_retriever("guest_details", "id",
+                                            details.retrieve_by_id)
+        guest_details = retrieve_each(retrieve_by_id,
+                                      guest_ids,
+                                      database_connection)
+        return stream_response("guests", guest_details, ndjson), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guests from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guests information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_guest_by_slug(guest_slug: str,
                       database_connection: mysql.connector.connect):
     """Retrieve a guest based on their slug"""
     try:
-        database_connection.reconnect()
-        guest_info = info.retrieve_by_slug(guest_slug, database_connection)
+        guest_info = from_slug("guest",
+                               snapshot_retriever("guest_info", "id",
+                                                  info.retrieve_by_id),
+                               guest_slug,
+                               database_connection)
         if not guest_info:
             message = "Guest slug '{}' not found".format(guest_slug)
             response = fail_dict("guest", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("guest", guest_info)), 200
+        return json_response(success_dict("guest", guest_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guest information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guest information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_guest_details_by_slug(guest_slug: str,
                               database_connection: mysql.connector.connect):
     """Retrieve a guest with their appearances based on their slug"""
     try:
-        database_connection.reconnect()
-        guest_details = details.retrieve_by_slug(guest_slug,
-                                                 database_connection)
+        guest_details = from_slug("guest",
+                                  snapshot_retriever("guest_details", "id",
+                                                     details.retrieve_by_id),
+                                  guest_slug,
+                                  database_connection)
         if not guest_details:
             message = "Guest slug '{}' not found".format(guest_slug)
             response = fail_dict("guest", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("guest", guest_details)), 200
+        return json_response(success_dict("guest", guest_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve guest information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "guest information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
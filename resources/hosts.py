@@ -6,140 +6,207 @@ for /hosts"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .indexes import from_slug
+from .pagination import Page, paginate_items, retrieve_page
+from .snapshot import from_snapshot, snapshot_retriever
+from .streaming import retrieve_each, stream_response
 from wwdtm.host import details, info
 
-def get_hosts(database_connection: mysql.connector.connect):
+@cached_response
+def get_hosts(page: Page,
+              database_connection: mysql.connector.connect):
     """Retrieve a list of hosts and their corresponding information"""
     try:
-        database_connection.reconnect()
-        hosts = info.retrieve_all(database_connection)
+        hosts = from_snapshot("host_info", "all",
+                              info.retrieve_all,
+                              database_connection)
         if not hosts:
             response = fail_dict("hosts", "No hosts found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("hosts", hosts)), 200
+        paging = None
+        if page:
+            hosts, paging = paginate_items(hosts, page)
+
+        return json_response(success_dict("hosts", hosts, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve hosts from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "hosts from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_host_by_id(host_id: int, database_connection: mysql.connector.connect):
     """Retrieve a host based on their ID"""
     try:
-        database_connection.reconnect()
-        host_info = info.retrieve_by_id(host_id, database_connection)
+        host_info = from_snapshot("host_info", "id",
+                                  info.retrieve_by_id,
+                                  host_id,
+                                  database_connection)
         if not host_info:
             message = "Host ID {} not found".format(host_id)
             response = fail_dict("host", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("host", host_info)), 200
+        return json_response(success_dict("host", host_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve host information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "host information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_host_details_by_id(host_id: int,
                            database_connection: mysql.connector.connect):
     """Retrieve a host and their appearance data based on their ID"""
     try:
-        database_connection.reconnect()
-        host_details = details.retrieve_by_id(host_id,
-                                              database_connection)
+        host_details = from_snapshot("host_details", "id",
+                                     details.retrieve_by_id,
+                                     host_id,
+                                     database_connection)
         if not host_details:
             message = "Host ID {} not found".format(host_id)
             response = fail_dict("host", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("host", host_details)), 200
+        return json_response(success_dict("host", host_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve host information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "host information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_host_details(database_connection: mysql.connector.connect):
+@cached_response
+def get_host_details(page: Page,
+                     database_connection: mysql.connector.connect):
     """Retrieve a list of hosts and their corresponding appearances"""
     try:
-        database_connection.reconnect()
-        host_details = details.retrieve_all(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("host_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("host_details", "id",
+                                                details.retrieve_by_id)
+            host_details, paging = retrieve_page(retrieve_all,
+                                                 retrieve_by_id,
+                                                 page,
+                                                 database_connection)
+            return json_response(success_dict("hosts", host_details, paging)), 200
+
+        host_details = from_snapshot("host_details", "all",
+                                     details.retrieve_all,
+                                     database_connection)
         if not host_details:
             response = fail_dict("hosts", "No hosts found")
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("hosts", host_details)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve hosts from the database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "host information")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def stream_host_details(ndjson: bool,
+                        database_connection: mysql.connector.connect):
+    """Stream all hosts and their corresponding appearances, retrieving
+    and encoding one host at a time"""
+    try:
+        hosts = from_snapshot("host_info", "all",
+                              info.retrieve_all,
+                              database_connection)
+        if not hosts:
+            response = fail_dict("hosts", "No hosts found")
+            return json_response(response), 404
 
-        return jsonify(success_dict("hosts", host_details)), 200
+        host_ids = [host["id"] for host in hosts]
+        retrieve_by_id = snapshot_retriever("host_details", "id",
+                                            details.retrieve_by_id)
+        host_details = retrieve_each(retrieve_by_id,
+                                     host_ids,
+                                     database_connection)
+        return stream_response("hosts", host_details, ndjson), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve hosts from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "host information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_host_by_slug(host_slug: str,
                      database_connection: mysql.connector.connect):
     """Retrieve a host based on their slug"""
     try:
-        database_connection.reconnect()
-        host_info = info.retrieve_by_slug(host_slug, database_connection)
+        host_info = from_slug("host",
+                              snapshot_retriever("host_info", "id",
+                                                 info.retrieve_by_id),
+                              host_slug,
+                              database_connection)
         if not host_info:
             message = "Host slug '{}' not found".format(host_slug)
             response = fail_dict("host", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("host", host_info)), 200
+        return json_response(success_dict("host", host_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve host information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "host information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_host_details_by_slug(host_slug: str,
                              database_connection: mysql.connector.connect):
     """Retrieve a host and their appearance data based on their ID"""
     try:
-        database_connection.reconnect()
-        host_details = details.retrieve_by_slug(host_slug,
-                                                database_connection)
+        host_details = from_slug("host",
+                                 snapshot_retriever("host_details", "id",
+                                                    details.retrieve_by_id),
+                                 host_slug,
+                                 database_connection)
         if not host_details:
             message = "Host slug '{}' not found".format(host_slug)
             response = fail_dict("host", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("host", host_details)), 200
+        return json_response(success_dict("host", host_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve host information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "host information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
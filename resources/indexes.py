@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides resident lookup indexes that resolve slugs to
+IDs and check whether there are shows on a date without querying the
+database. The indexes are rebuilt when the data version changes.
+
+Slugs are resolved, and shows looked up by date, using the dataset
+snapshot instead when it is loaded, so the indexes are only built when
+it is not."""
+
+import datetime
+import threading
+
+import mysql.connector
+
+from .database import with_reconnect
+from .snapshot import dataset
+from .version import data_version
+
+def _retrieve_slugs(database_connection: mysql.connector.connect) -> list:
+    """Retrieve the ID and slug of every guest, host, panelist and
+    scorekeeper"""
+    cursor = database_connection.cursor()
+    query = ("SELECT 'guest', guestid, guestslug FROM ww_guests "
+             "UNION ALL "
+             "SELECT 'host', hostid, hostslug FROM ww_hosts "
+             "UNION ALL "
+             "SELECT 'panelist', panelistid, panelistslug FROM ww_panelists "
+             "UNION ALL "
+             "SELECT 'scorekeeper', scorekeeperid, scorekeeperslug "
+             "FROM ww_scorekeepers;")
+    cursor.execute(query)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+def _retrieve_show_dates(database_connection: mysql.connector.connect) -> list:
+    """Retrieve the distinct dates of all shows"""
+    cursor = database_connection.cursor()
+    query = "SELECT DISTINCT showdate FROM ww_shows;"
+    cursor.execute(query)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+class SlugIndex:
+    """Maps slugs to IDs for each entity type. Slugs are matched
+    case-insensitively, in the same way as the database."""
+
+    def __init__(self, rows: list):
+        self.ids = {}
+        for entity, entity_id, slug in rows:
+            if slug:
+                self.ids.setdefault(entity, {})[slug.lower()] = entity_id
+
+    def id_for_slug(self, entity: str, slug: str) -> int:
+        """Return the ID for an entity slug, or None if the slug does
+        not exist"""
+        return self.ids.get(entity, {}).get(slug.lower())
+
+class DateIndex:
+    """Maps show years to the months with shows, and months to the days
+    with shows"""
+
+    def __init__(self, rows: list):
+        self.years = {}
+        for (show_date,) in rows:
+            months = self.years.setdefault(show_date.year, {})
+            months.setdefault(show_date.month, set()).add(show_date.day)
+
+    def has_shows(self, year: int, month: int = None, day: int = None) -> bool:
+        """Return whether there are any shows in a year, a month of a
+        year or on a date
+
+        Raises ValueError if the year, month or day is not valid."""
+        datetime.date(year, month or 1, day or 1)
+        months = self.years.get(year)
+        if not months or month is None:
+            return bool(months)
+
+        days = months.get(month)
+        if not days or day is None:
+            return bool(days)
+
+        return day in days
+
+class LookupIndexes:
+    """Holds the lookup indexes for the worker and rebuilds them when
+    the data version changes"""
+
+    def __init__(self):
+        self.version = None
+        self.slugs = None
+        self.dates = None
+        self._lock = threading.Lock()
+
+    def current(self, database_connection: mysql.connector.connect):
+        """Return the indexes for the current data version, rebuilding
+        them if the data version has changed
+
+        Raises DatabaseError if the indexes have to be built and the
+        database cannot be queried."""
+        version = data_version.current(database_connection)
+        if self.slugs and (not version or version == self.version):
+            return self
+
+        with self._lock:
+            if not self.slugs or (version and version != self.version):
+                slug_rows = with_reconnect(_retrieve_slugs, database_connection)
+                date_rows = with_reconnect(_retrieve_show_dates,
+                                           database_connection)
+                self.slugs = SlugIndex(slug_rows)
+                self.dates = DateIndex(date_rows)
+                self.version = version
+
+        return self
+
+lookup_indexes = LookupIndexes()
+
+def from_slug(entity: str,
+              retrieve_by_id,
+              slug: str,
+              database_connection: mysql.connector.connect):
+    """Resolve an entity slug to its ID using the info records in the
+    dataset snapshot, or the slug index if no snapshot is available, and
+    call the retrieve_by_id function with the ID. Returns None, without
+    querying the database, if the slug does not exist."""
+    snapshot = dataset.current(database_connection)
+    if snapshot is not None:
+        record = snapshot.lookup("{}_info".format(entity), "slug", slug)
+        entity_id = record["id"] if record else None
+    else:
+        indexes = lookup_indexes.current(database_connection)
+        entity_id = indexes.slugs.id_for_slug(entity, slug)
+
+    if entity_id is None:
+        return None
+
+    return with_reconnect(retrieve_by_id, entity_id, database_connection)
+
+def from_show_date(retrieve, *args):
+    """Call the retrieve function, a snapshot retriever, with the
+    arguments. If no dataset snapshot is available, the date index is
+    checked first for shows in the requested year, month of a year or
+    date, and None is returned, without querying the database, if there
+    are none. The arguments, other than the trailing database
+    connection, are a year, a year and month, a year, month and day or
+    an ISO formatted (YYYY-MM-DD) date string.
+
+    Raises ValueError if the date is not valid."""
+    database_connection = args[-1]
+    if dataset.current(database_connection) is not None:
+        return with_reconnect(retrieve, *args)
+
+    show_date = args[:-1]
+    if len(show_date) == 1 and isinstance(show_date[0], str):
+        date_value = datetime.datetime.strptime(show_date[0], "%Y-%m-%d")
+        show_date = (date_value.year, date_value.month, date_value.day)
+
+    indexes = lookup_indexes.current(database_connection)
+    if not indexes.dates.has_shows(*show_date):
+        return None
+
+    return with_reconnect(retrieve, *args)
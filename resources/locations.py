@@ -6,95 +6,155 @@ for /locations"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .pagination import Page, paginate_items, retrieve_page
+from .snapshot import from_snapshot, snapshot_retriever
+from .streaming import retrieve_each, stream_response
 from wwdtm.location import details, info
 
-def get_locations(database_connection: mysql.connector.connect):
+@cached_response
+def get_locations(page: Page,
+                  database_connection: mysql.connector.connect):
     """Retrieve a list of locations"""
     try:
-        database_connection.reconnect()
-        locations = info.retrieve_all(database_connection)
+        locations = from_snapshot("location_info", "all",
+                                  info.retrieve_all,
+                                  database_connection)
         if not locations:
             response = fail_dict("locations", "No locations found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("locations", locations)), 200
+        paging = None
+        if page:
+            locations, paging = paginate_items(locations, page)
+
+        return json_response(success_dict("locations", locations, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve locations from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "locations from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_location_by_id(location_id: int,
                        database_connection: mysql.connector.connect):
     """Retrieve a location and its information based on its ID"""
     try:
-        database_connection.reconnect()
-        location_info = info.retrieve_by_id(location_id, database_connection)
+        location_info = from_snapshot("location_info", "id",
+                                      info.retrieve_by_id,
+                                      location_id,
+                                      database_connection)
         if not location_info:
             message = "Location ID {} not found".format(location_id)
             response = fail_dict("location", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("location", location_info)), 200
+        return json_response(success_dict("location", location_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve location information from "
                               "the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "location information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_location_recordings_by_id(location_id: int,
                                   database_connection: mysql.connector.connect):
     """Retrieve show recordings for a location based on its ID"""
     try:
-        database_connection.reconnect()
-        recordings = details.retrieve_recordings_by_id(location_id,
-                                                       database_connection)
+        recordings = from_snapshot("location_recordings", "id",
+                                   details.retrieve_recordings_by_id,
+                                   location_id,
+                                   database_connection)
         if not recordings:
             message = "Location ID {} not found".format(location_id)
             response = fail_dict("location", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("location", recordings)), 200
+        return json_response(success_dict("location", recordings)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve location recording "
                               "information from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "location recording information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_location_recordings(database_connection: mysql.connector.connect):
+@cached_response
+def get_location_recordings(page: Page,
+                            database_connection: mysql.connector.connect):
     """Retrieve show recordings for all locations"""
     try:
-        database_connection.reconnect()
-        recordings = details.retrieve_all_recordings(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("location_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("location_recordings", "id",
+                                                details.retrieve_recordings_by_id)
+            recordings, paging = retrieve_page(retrieve_all,
+                                               retrieve_by_id,
+                                               page,
+                                               database_connection)
+            return json_response(success_dict("locations", recordings, paging)), 200
+
+        recordings = from_snapshot("location_recordings", "all",
+                                   details.retrieve_all_recordings,
+                                   database_connection)
         if not recordings:
             response = fail_dict("locations", "No locations found")
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("locations", recordings)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve location recording "
+                              "information from the database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "location recording information")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def stream_location_recordings(ndjson: bool,
+                               database_connection: mysql.connector.connect):
+    """Stream show recordings for all locations, retrieving and
+    encoding one location at a time"""
+    try:
+        locations = from_snapshot("location_info", "all",
+                                  info.retrieve_all,
+                                  database_connection)
+        if not locations:
+            response = fail_dict("locations", "No locations found")
+            return json_response(response), 404
 
-        return jsonify(success_dict("locations", recordings)), 200
+        location_ids = [location["id"] for location in locations]
+        retrieve_by_id = snapshot_retriever("location_recordings", "id",
+                                            details.retrieve_recordings_by_id)
+        location_details = retrieve_each(retrieve_by_id,
+                                         location_ids,
+                                         database_connection)
+        return stream_response("locations", location_details, ndjson), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve location recording "
                               "information from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "location recording information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides per-route request metrics, including request,
+database and serialization time histograms, query counts, response
+sizes and status codes, exposed in the Prometheus text exposition
+format. Each uWSGI worker periodically writes its metrics to a shared
+directory so that the metrics of all workers can be combined, and the
+files of workers that have exited are removed when they are
+combined."""
+
+import functools
+import json
+import os
+import threading
+import time
+
+from flask import has_request_context, request
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "directory": None,
+    "flush_interval": 5
+}
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216)
+
+METRICS = {
+    "wwdtm_api_requests_total": (
+        "counter", "Requests handled, by route, method and status code", None),
+    "wwdtm_api_request_duration_seconds": (
+        "histogram", "Request handling time, by route", DURATION_BUCKETS),
+    "wwdtm_api_database_duration_seconds": (
+        "histogram", "Time spent sending queries and reading results per "
+        "request, by route", DURATION_BUCKETS),
+    "wwdtm_api_serialization_duration_seconds": (
+        "histogram", "Time spent encoding response bodies per request, by "
+        "route", DURATION_BUCKETS),
+    "wwdtm_api_database_queries": (
+        "histogram", "Database queries per request, by route", QUERY_BUCKETS),
+    "wwdtm_api_response_size_bytes": (
+        "histogram", "Response body size, by route", SIZE_BUCKETS),
+    "wwdtm_api_database_reconnects_total": (
+        "counter", "Reconnects to the database server", None),
+    "wwdtm_api_database_reconnect_seconds_total": (
+        "counter", "Time spent reconnecting to the database server", None)
+}
+
+class RequestMetrics:
+    """Times and counts collected while handling a request"""
+    __slots__ = ("started", "database_seconds", "serialization_seconds",
+                 "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.database_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.queries = 0
+
+def _labels(**labels) -> str:
+    """Return the label set for a sample in exposition format"""
+    escaped = []
+    for name, value in labels.items():
+        value = (str(value).replace("\\", "\\\\")
+                 .replace("\"", "\\\"")
+                 .replace("\n", "\\n"))
+        escaped.append('{}="{}"'.format(name, value))
+    return ",".join(escaped)
+
+def _process_exists(pid: int) -> bool:
+    """Return whether a process with an ID exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MetricsRegistry:
+    """Counters and histograms for the worker, which are written to the
+    metrics directory once every flush interval, if they changed, by a
+    thread started in each worker, and combined with the metrics
+    written by other workers when collected"""
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 5
+        self._counters = {}
+        self._histograms = {}
+        self._flushed_at = 0
+        self._changed = False
+        self._timer_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self,
+                  enabled: bool = True,
+                  directory: str = None,
+                  flush_interval: float = 5):
+        """Enable or disable metrics and set the directory shared by
+        the workers. Metrics files left in the directory by a previous
+        run are removed, so the application should be loaded once, in
+        the uWSGI master process, when a directory is set."""
+        self.enabled = enabled
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if enabled and directory:
+            os.makedirs(directory, exist_ok=True)
+            for file_name in os.listdir(directory):
+                if file_name.endswith(".json"):
+                    os.remove(os.path.join(directory, file_name))
+
+    def inc(self, name: str, labels: str, value: float = 1):
+        """Increment a counter"""
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._changed = True
+
+    def observe(self, name: str, labels: str, value: float):
+        """Add an observation to a histogram"""
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if not histogram:
+                histogram = [[0] * (len(buckets) + 1), 0.0, 0]
+                self._histograms[key] = histogram
+
+            index = len(buckets)
+            for bucket_index, bound in enumerate(buckets):
+                if value <= bound:
+                    index = bucket_index
+                    break
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            self._changed = True
+
+    def record_request(self,
+                       route: str,
+                       method: str,
+                       status: int,
+                       size: int,
+                       request_metrics: RequestMetrics):
+        """Record the metrics of a completed request"""
+        duration = time.perf_counter() - request_metrics.started
+        labels = _labels(route=route)
+        self.inc("wwdtm_api_requests_total",
+                 _labels(route=route, method=method, status=status))
+        self.observe("wwdtm_api_request_duration_seconds", labels, duration)
+        self.observe("wwdtm_api_database_duration_seconds",
+                     labels,
+                     request_metrics.database_seconds)
+        self.observe("wwdtm_api_serialization_duration_seconds",
+                     labels,
+                     request_metrics.serialization_seconds)
+        self.observe("wwdtm_api_database_queries",
+                     labels,
+                     request_metrics.queries)
+        if size is not None:
+            self.observe("wwdtm_api_response_size_bytes", labels, size)
+
+        if self.directory:
+            self._start_timer()
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def _start_timer(self):
+        """Start the thread that flushes the metrics of the worker, once
+        per process, since threads do not survive forking"""
+        with self._lock:
+            if self._timer_pid == os.getpid():
+                return
+            self._timer_pid = os.getpid()
+
+        thread = threading.Thread(target=self._flush_periodically,
+                                  name="wwdtm-metrics",
+                                  daemon=True)
+        thread.start()
+
+    def _flush_periodically(self):
+        """Flush the metrics once every flush interval if they changed,
+        so that the last requests of a worker that becomes idle are
+        written"""
+        while True:
+            time.sleep(self.flush_interval)
+            if self._changed:
+                self.flush()
+
+    def state(self) -> dict:
+        """Return a copy of the worker's counters and histograms"""
+        with self._lock:
+            return {
+                "counters": [[name, labels, value]
+                             for (name, labels), value in self._counters.items()],
+                "histograms": [[name, labels, list(buckets), total, count]
+                               for (name, labels), (buckets, total, count)
+                               in self._histograms.items()]
+            }
+
+    def _worker_file(self) -> str:
+        """Return the path of the metrics file for the worker"""
+        return os.path.join(self.directory, "{}.json".format(os.getpid()))
+
+    def flush(self):
+        """Write the worker's metrics to the metrics directory"""
+        self._flushed_at = time.monotonic()
+        self._changed = False
+        if not self.directory:
+            return
+
+        worker_file = self._worker_file()
+        temp_file = "{}.tmp".format(worker_file)
+        try:
+            with open(temp_file, "w") as metrics_file:
+                json.dump(self.state(), metrics_file)
+            os.replace(temp_file, worker_file)
+        except OSError:
+            pass
+
+    def collect(self) -> tuple:
+        """Return the counters and histograms of all workers, combining
+        the worker's current metrics with those written by the other
+        workers. Files written by workers that have exited are
+        removed."""
+        states = [self.state()]
+        if self.directory:
+            worker_file = self._worker_file()
+            for file_name in os.listdir(self.directory):
+                path = os.path.join(self.directory, file_name)
+                if not file_name.endswith(".json") or path == worker_file:
+                    continue
+                try:
+                    pid = int(file_name[:-len(".json")])
+                except ValueError:
+                    continue
+                if not _process_exists(pid):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+
+                try:
+                    with open(path) as metrics_file:
+                        states.append(json.load(metrics_file))
+                except (OSError, ValueError):
+                    continue
+
+        counters = {}
+        histograms = {}
+        for state in states:
+            for name, labels, value in state["counters"]:
+                counters[(name, labels)] = counters.get((name, labels), 0) + value
+            for name, labels, buckets, total, count in state["histograms"]:
+                histogram = histograms.setdefault((name, labels),
+                                                  [[0] * len(buckets), 0.0, 0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+
+        return counters, histograms
+
+    def exposition(self) -> str:
+        """Return the metrics of all workers in the Prometheus text
+        exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (metric_type, description, buckets) in METRICS.items():
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            if metric_type == "counter":
+                for (sample_name, labels), value in sorted(counters.items()):
+                    if sample_name == name:
+                        lines.append("{}{} {}".format(name,
+                                                      "{" + labels + "}" if labels else "",
+                                                      value))
+                continue
+
+            for (sample_name, labels), histogram in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+
+                bucket_counts, total, count = histogram
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ("+Inf",), bucket_counts):
+                    cumulative += bucket_count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name,
+                                                                    labels,
+                                                                    bound,
+                                                                    cumulative))
+                lines.append("{}_sum{{{}}} {}".format(name, labels, total))
+                lines.append("{}_count{{{}}} {}".format(name, labels, count))
+
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+# The metrics are kept in the WSGI environment rather than in flask.g so
+# that they are still available while a streamed response is generated
+_ENVIRON_KEY = "wwdtm.request_metrics"
+
+def current_request_metrics() -> RequestMetrics:
+    """Return the metrics being collected for the current request, or
+    None if metrics are disabled or there is no request"""
+    if not has_request_context():
+        return None
+
+    return request.environ.get(_ENVIRON_KEY)
+
+def record_database_time(seconds: float, queries: int = 0):
+    """Add database time and queries to the current request's metrics"""
+    request_metrics = current_request_metrics()
+    if request_metrics:
+        request_metrics.database_seconds += seconds
+        request_metrics.queries += queries
+
+def record_serialization_time(seconds: float):
+    """Add response encoding time to the current request's metrics"""
+    request_metrics = current_request_metrics()
+    if request_metrics:
+        request_metrics.serialization_seconds += seconds
+
+def record_reconnect(seconds: float):
+    """Count a reconnect to the database server"""
+    if metrics_registry.enabled:
+        metrics_registry.inc("wwdtm_api_database_reconnects_total", "")
+        metrics_registry.inc("wwdtm_api_database_reconnect_seconds_total",
+                             "",
+                             seconds)
+
+def start_request():
+    """Start collecting metrics for the current request"""
+    if metrics_registry.enabled:
+        request.environ[_ENVIRON_KEY] = RequestMetrics()
+
+def finish_request(response):
+    """Record the metrics for the current request once the response has
+    been sent, which for streamed responses is after the last item"""
+    request_metrics = current_request_metrics()
+    if not request_metrics:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    size = None if response.is_streamed else response.content_length
+    response.call_on_close(functools.partial(metrics_registry.record_request,
+                                             route,
+                                             request.method,
+                                             response.status_code,
+                                             size,
+                                             request_metrics))
+    return response
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides functions that handle limit/offset and keyset
+cursor pagination for collection endpoints. Paginated collections are
+ordered by ID."""
+
+import base64
+import binascii
+import bisect
+import collections
+
+import mysql.connector
+
+from .database import with_reconnect
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+Page = collections.namedtuple("Page", ["limit", "offset", "cursor"])
+
+def encode_cursor(direction: str, item_id: int) -> str:
+    """Return an opaque cursor pointing after ("n") or before ("p") the
+    given ID"""
+    value = "{}{}".format(direction, item_id).encode("ascii")
+    return base64.urlsafe_b64encode(value).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return the (direction, ID) pair encoded in a cursor
+
+    Raises ValueError if the cursor is not valid."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(cursor + padding).decode("ascii")
+        direction, item_id = value[0], int(value[1:])
+    except (binascii.Error, UnicodeError, IndexError, ValueError) as err:
+        raise ValueError("Invalid cursor '{}'".format(cursor)) from err
+
+    if direction not in ("n", "p"):
+        raise ValueError("Invalid cursor '{}'".format(cursor))
+
+    return direction, item_id
+
+def parse_page(args: dict) -> Page:
+    """Return the requested page from the limit, offset and cursor
+    query parameters, or None if pagination was not requested
+
+    Raises ValueError if the parameters are not valid."""
+    limit = args.get("limit")
+    offset = args.get("offset")
+    cursor = args.get("cursor")
+    if limit is None and offset is None and cursor is None:
+        return None
+
+    if offset is not None and cursor is not None:
+        raise ValueError("Only one of offset or cursor can be provided")
+
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_LIMIT
+        offset = int(offset) if offset is not None else 0
+    except ValueError as err:
+        raise ValueError("Limit and offset must be integers") from err
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError("Limit must be between 1 and {}".format(MAX_LIMIT))
+    if offset < 0:
+        raise ValueError("Offset must not be negative")
+    if cursor is not None:
+        decode_cursor(cursor)
+
+    return Page(limit, offset, cursor)
+
+def paginate(ids: list, page: Page) -> tuple:
+    """Return the IDs on the requested page, in ascending order, along
+    with a dictionary of paging information containing the cursors for
+    the next and previous pages"""
+    ids = sorted(ids)
+    if page.cursor:
+        direction, item_id = decode_cursor(page.cursor)
+        if direction == "n":
+            start = bisect.bisect_right(ids, item_id)
+            end = min(start + page.limit, len(ids))
+        else:
+            end = bisect.bisect_left(ids, item_id)
+            start = max(end - page.limit, 0)
+    else:
+        start = min(page.offset, len(ids))
+        end = min(start + page.limit, len(ids))
+
+    page_ids = ids[start:end]
+    paging = {
+        "limit": page.limit,
+        "next": None,
+        "prev": None
+    }
+    if not page.cursor:
+        paging["offset"] = start
+    if page_ids and end < len(ids):
+        paging["next"] = encode_cursor("n", page_ids[-1])
+    if page_ids and start > 0:
+        paging["prev"] = encode_cursor("p", page_ids[0])
+
+    return page_ids, paging
+
+def paginate_items(items: list, page: Page) -> tuple:
+    """Return the items on the requested page, ordered by ID, along with
+    the paging information"""
+    items_by_id = {item["id"]: item for item in items}
+    page_ids, paging = paginate(list(items_by_id), page)
+    return [items_by_id[item_id] for item_id in page_ids], paging
+
+def retrieve_page(retrieve_all,
+                  retrieve_by_id,
+                  page: Page,
+                  database_connection: mysql.connector.connect) -> tuple:
+    """Retrieve the IDs of a collection using the wwdtm retrieve_all
+    function and then retrieve only the items on the requested page
+    using the wwdtm retrieve_by_id function"""
+    items = with_reconnect(retrieve_all, database_connection)
+    page_ids, paging = paginate([item["id"] for item in items], page)
+    page_items = [with_reconnect(retrieve_by_id, item_id, database_connection)
+                  for item_id in page_ids]
+    return page_items, paging
@@ -6,244 +6,452 @@ for /panelists"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .database import with_reconnect
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .indexes import from_slug
+from .pagination import Page, paginate_items, retrieve_page
+from .series import series_response
+from .snapshot import from_snapshot, snapshot_retriever
+from .statistics import (retrieve_all_statistics, retrieve_ordered_pairs_by_id,
+                         retrieve_scores_list_by_id, retrieve_series_by_id,
+                         retrieve_statistics_by_id)
+from .streaming import retrieve_each, stream_response
 from wwdtm.panelist import details, info
 
-def get_panelists(database_connection: mysql.connector.connect):
+@cached_response
+def get_panelists(page: Page,
+                  database_connection: mysql.connector.connect):
     """Retrieve a list of panelists and their corresponding
     information"""
     try:
-        database_connection.reconnect()
-        panelists = info.retrieve_all(database_connection)
+        panelists = from_snapshot("panelist_info", "all",
+                                  info.retrieve_all,
+                                  database_connection)
         if not panelists:
             response = fail_dict("panelists", "No panelists found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelists", panelists)), 200
+        paging = None
+        if page:
+            panelists, paging = paginate_items(panelists, page)
+
+        return json_response(success_dict("panelists", panelists, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelists from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelists from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_by_id(panelist_id: int,
                        database_connection: mysql.connector.connect):
     """Retrieve a panelist based on their ID"""
     try:
-        database_connection.reconnect()
-        panelist_info = info.retrieve_by_id(panelist_id, database_connection)
+        panelist_info = from_snapshot("panelist_info", "id",
+                                      info.retrieve_by_id,
+                                      panelist_id,
+                                      database_connection)
         if not panelist_info:
             message = "Panelist ID {} not found".format(panelist_id)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelist", panelist_info)), 200
+        return json_response(success_dict("panelist", panelist_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist information from "
                               "the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_details_by_id(panelist_id: int,
                                database_connection: mysql.connector.connect):
     """Retrieve a panelist with their statistics and appearances based
     on their ID"""
     try:
-        database_connection.reconnect()
-        panelist_details = details.retrieve_by_id(panelist_id,
-                                                  database_connection)
+        panelist_details = from_snapshot("panelist_details", "id",
+                                         details.retrieve_by_id,
+                                         panelist_id,
+                                         database_connection)
         if not panelist_details:
             message = "Panelist ID {} not found".format(panelist_id)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelist", panelist_details)), 200
+        return json_response(success_dict("panelist", panelist_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist information from "
                               "the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist details")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_scores_by_id(panelist_id: int,
                               database_connection: mysql.connector.connect):
     """Retrieve a list of scores for the requested panelist ID"""
     try:
-        database_connection.reconnect()
-        scores = info.retrieve_scores_list_by_id(panelist_id,
-                                                 database_connection)
+        scores = with_reconnect(retrieve_scores_list_by_id,
+                                panelist_id,
+                                database_connection)
         if not scores:
             message = "Panelist ID {} not found".format(panelist_id)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scores", scores)), 200
+        return json_response(success_dict("scores", scores)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist scores from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist scores")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_scores_ordered_pair_by_id(panelist_id: int,
                                            database_connection: mysql.connector.connect):
     """Retrieve a list of scores, as an ordered pair, for the requested
     panelist ID"""
     try:
-        database_connection.reconnect()
-        scores = info.retrieve_scores_ordered_pair_by_id(panelist_id,
-                                                         database_connection)
+        scores = with_reconnect(retrieve_ordered_pairs_by_id,
+                                panelist_id,
+                                database_connection)
         if not scores:
             message = "Panelist ID {} not found".format(panelist_id)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("scores", scores)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelist scores from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelist scores")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
+def get_panelist_scores_series_by_id(panelist_id: int,
+                                     mimetype: str,
+                                     database_connection: mysql.connector.connect):
+    """Retrieve the scores, as an ordered pair series encoded in the
+    requested binary format, for the requested panelist ID"""
+    try:
+        series = with_reconnect(retrieve_series_by_id,
+                                panelist_id,
+                                database_connection)
+        if not series:
+            message = "Panelist ID {} not found".format(panelist_id)
+            response = fail_dict("panelist", message)
+            return json_response(response), 404
 
-        return jsonify(success_dict("scores", scores)), 200
+        return series_response(series, mimetype), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist scores from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist scores")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_panelists_details(database_connection: mysql.connector.connect):
+@cached_response
+def get_panelist_statistics_by_id(panelist_id: int,
+                                  database_connection: mysql.connector.connect):
+    """Retrieve score statistics and the rank distribution for the
+    requested panelist ID"""
+    try:
+        statistics = with_reconnect(retrieve_statistics_by_id,
+                                    panelist_id,
+                                    database_connection)
+        if not statistics:
+            message = "Panelist ID {} not found".format(panelist_id)
+            response = fail_dict("panelist", message)
+            return json_response(response), 404
+
+        return json_response(success_dict("statistics", statistics)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelist scores from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelist scores")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
+def get_panelists_statistics(database_connection: mysql.connector.connect):
+    """Retrieve score statistics and rank distributions for all
+    panelists with scores"""
+    try:
+        statistics = with_reconnect(retrieve_all_statistics,
+                                    database_connection)
+        if not statistics:
+            response = fail_dict("panelists", "No panelist scores found")
+            return json_response(response), 404
+
+        return json_response(success_dict("statistics", statistics)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelist scores from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelist scores")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
+def get_panelists_details(page: Page,
+                          database_connection: mysql.connector.connect):
     """Retrieve a list of panelists with their corresponding statistics
     and appearances"""
     try:
-        database_connection.reconnect()
-        panelist_details = details.retrieve_all(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("panelist_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("panelist_details", "id",
+                                                details.retrieve_by_id)
+            panelist_details, paging = retrieve_page(retrieve_all,
+                                                     retrieve_by_id,
+                                                     page,
+                                                     database_connection)
+            return json_response(success_dict("panelists", panelist_details, paging)), 200
+
+        panelist_details = from_snapshot("panelist_details", "all",
+                                         details.retrieve_all,
+                                         database_connection)
         if not panelist_details:
             response = fail_dict("panelists", "No panelists found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelists", panelist_details)), 200
+        return json_response(success_dict("panelists", panelist_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelists from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelists from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+def stream_panelists_details(ndjson: bool,
+                             database_connection: mysql.connector.connect):
+    """Stream all panelists with their corresponding statistics and
+    appearances, retrieving and encoding one panelist at a time"""
+    try:
+        panelists = from_snapshot("panelist_info", "all",
+                                  info.retrieve_all,
+                                  database_connection)
+        if not panelists:
+            response = fail_dict("panelists", "No panelists found")
+            return json_response(response), 404
+
+        panelist_ids = [panelist["id"] for panelist in panelists]
+        retrieve_by_id = snapshot_retriever("panelist_details", "id",
+                                            details.retrieve_by_id)
+        panelist_details = retrieve_each(retrieve_by_id,
+                                         panelist_ids,
+                                         database_connection)
+        return stream_response("panelists", panelist_details, ndjson), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelists from the database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelists from database")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
 def get_panelist_by_slug(panelist_slug: str,
                          database_connection: mysql.connector.connect):
     """Retrieve a panelist based on their slug"""
     try:
-        database_connection.reconnect()
-        panelist_info = info.retrieve_by_slug(panelist_slug,
-                                              database_connection)
+        panelist_info = from_slug("panelist",
+                                  snapshot_retriever("panelist_info", "id",
+                                                     info.retrieve_by_id),
+                                  panelist_slug,
+                                  database_connection)
         if not panelist_info:
             message = "Panelist slug '{}' not found".format(panelist_slug)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelist", panelist_info)), 200
+        return json_response(success_dict("panelist", panelist_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist information from "
                               "the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_details_by_slug(panelist_slug: str,
                                  database_connection: mysql.connector.connect):
     """Retrieve a panelist with their statistics and appearances based
     on their slug"""
     try:
-        database_connection.reconnect()
-        panelist_details = details.retrieve_by_slug(panelist_slug,
-                                                    database_connection)
+        panelist_details = from_slug("panelist",
+                                     snapshot_retriever("panelist_details", "id",
+                                                        details.retrieve_by_id),
+                                     panelist_slug,
+                                     database_connection)
         if not panelist_details:
             message = "Panelist slug '{}' not found".format(panelist_slug)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("panelist", panelist_details)), 200
+        return json_response(success_dict("panelist", panelist_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist information from "
                               "the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist details")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_scores_by_slug(panelist_slug: str,
                                 database_connection: mysql.connector.connect):
     """Retrieve a list of scores for the requested panelist slug"""
     try:
-        database_connection.reconnect()
-        scores = info.retrieve_scores_list_by_slug(panelist_slug,
-                                                   database_connection)
+        scores = from_slug("panelist",
+                           retrieve_scores_list_by_id,
+                           panelist_slug,
+                           database_connection)
         if not scores:
             message = "Panelist slug '{}' not found".format(panelist_slug)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scores", scores)), 200
+        return json_response(success_dict("scores", scores)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist scores from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist scores")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_panelist_scores_ordered_pair_by_slug(panelist_slug: str,
                                              database_connection: mysql.connector.connect):
     """Retrieve a list of scores, as an ordered pair, for the requested
     panelist slug"""
     try:
-        database_connection.reconnect()
-        scores = info.retrieve_scores_ordered_pair_by_slug(panelist_slug,
-                                                           database_connection)
+        scores = from_slug("panelist",
+                           retrieve_ordered_pairs_by_id,
+                           panelist_slug,
+                           database_connection)
         if not scores:
             message = "Panelist slug '{}' not found".format(panelist_slug)
             response = fail_dict("panelist", message)
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("scores", scores)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelist scores from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelist scores")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
+def get_panelist_scores_series_by_slug(panelist_slug: str,
+                                       mimetype: str,
+                                       database_connection: mysql.connector.connect):
+    """Retrieve the scores, as an ordered pair series encoded in the
+    requested binary format, for the requested panelist slug"""
+    try:
+        series = from_slug("panelist",
+                           retrieve_series_by_id,
+                           panelist_slug,
+                           database_connection)
+        if not series:
+            message = "Panelist slug '{}' not found".format(panelist_slug)
+            response = fail_dict("panelist", message)
+            return json_response(response), 404
+
+        return series_response(series, mimetype), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve panelist scores from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "panelist scores")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+@cached_response
+def get_panelist_statistics_by_slug(panelist_slug: str,
+                                    database_connection: mysql.connector.connect):
+    """Retrieve score statistics and the rank distribution for the
+    requested panelist slug"""
+    try:
+        statistics = from_slug("panelist",
+                               retrieve_statistics_by_id,
+                               panelist_slug,
+                               database_connection)
+        if not statistics:
+            message = "Panelist slug '{}' not found".format(panelist_slug)
+            response = fail_dict("panelist", message)
+            return json_response(response), 404
 
-        return jsonify(success_dict("scores", scores)), 200
+        return json_response(success_dict("statistics", statistics)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve panelist scores from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "panelist scores")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
@@ -6,148 +6,215 @@ for /scorekeepers"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .indexes import from_slug
+from .pagination import Page, paginate_items, retrieve_page
+from .snapshot import from_snapshot, snapshot_retriever
+from .streaming import retrieve_each, stream_response
 from wwdtm.scorekeeper import details, info
 
-def get_scorekeepers(database_connection: mysql.connector.connect):
+@cached_response
+def get_scorekeepers(page: Page,
+                     database_connection: mysql.connector.connect):
     """Retrieve a list of scoreekeepers and their corresponding
     information"""
     try:
-        database_connection.reconnect()
-        scorekeepers = info.retrieve_all(database_connection)
+        scorekeepers = from_snapshot("scorekeeper_info", "all",
+                                     info.retrieve_all,
+                                     database_connection)
         if not scorekeepers:
             response = fail_dict("scorekeepers", "No scorekeepers found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeepers", scorekeepers)), 200
+        paging = None
+        if page:
+            scorekeepers, paging = paginate_items(scorekeepers, page)
+
+        return json_response(success_dict("scorekeepers", scorekeepers, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeepers from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeepers from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_scorekeeper_by_id(scorekeeper_id: int,
                           database_connection: mysql.connector.connect):
     """Retrieve a scorekeeper based on their ID"""
     try:
-        database_connection.reconnect()
-        scorekeeper_info = info.retrieve_by_id(scorekeeper_id, database_connection)
+        scorekeeper_info = from_snapshot("scorekeeper_info", "id",
+                                         info.retrieve_by_id,
+                                         scorekeeper_id,
+                                         database_connection)
         if not scorekeeper_info:
             message = "Scorekeeper ID {} not found".format(scorekeeper_id)
             response = fail_dict("scorekeeper", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeeper", scorekeeper_info)), 200
+        return json_response(success_dict("scorekeeper", scorekeeper_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeeper information "
                               "from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeeper information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_scorekeeper_details_by_id(scorekeeper_id: int,
                                   database_connection: mysql.connector.connect):
     """Retrieve a scorekeeper and their appearance data based on their
     ID"""
     try:
-        database_connection.reconnect()
-        scorekeeper_details = details.retrieve_by_id(scorekeeper_id,
-                                                     database_connection)
+        scorekeeper_details = from_snapshot("scorekeeper_details", "id",
+                                            details.retrieve_by_id,
+                                            scorekeeper_id,
+                                            database_connection)
         if not scorekeeper_details:
             message = "Scorekeeper ID {} not found".format(scorekeeper_id)
             response = fail_dict("scorekeeper", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeeper", scorekeeper_details)), 200
+        return json_response(success_dict("scorekeeper", scorekeeper_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeeper information "
                               "from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeeper information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_scorekeeper_details(database_connection: mysql.connector.connect):
+@cached_response
+def get_scorekeeper_details(page: Page,
+                            database_connection: mysql.connector.connect):
     """Retrieve a list of scorekeeper and their corresponding
     appearances"""
     try:
-        database_connection.reconnect()
-        scorekeeper_details = details.retrieve_all(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("scorekeeper_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("scorekeeper_details", "id",
+                                                details.retrieve_by_id)
+            scorekeeper_details, paging = retrieve_page(retrieve_all,
+                                                        retrieve_by_id,
+                                                        page,
+                                                        database_connection)
+            return json_response(success_dict("scorekeepers", scorekeeper_details, paging)), 200
+
+        scorekeeper_details = from_snapshot("scorekeeper_details", "all",
+                                            details.retrieve_all,
+                                            database_connection)
         if not details:
             response = fail_dict("scorekeepers", "No scorekeepers found")
-            return jsonify(response), 404
+            return json_response(response), 404
+
+        return json_response(success_dict("scorekeepers", scorekeeper_details)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve scorekeepers from the "
+                              "database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving "
+                              "scorekeepers from database")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def stream_scorekeeper_details(ndjson: bool,
+                               database_connection: mysql.connector.connect):
+    """Stream all scorekeepers and their corresponding appearances,
+    retrieving and encoding one scorekeeper at a time"""
+    try:
+        scorekeepers = from_snapshot("scorekeeper_info", "all",
+                                     info.retrieve_all,
+                                     database_connection)
+        if not scorekeepers:
+            response = fail_dict("scorekeepers", "No scorekeepers found")
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeepers", scorekeeper_details)), 200
+        scorekeeper_ids = [scorekeeper["id"] for scorekeeper in scorekeepers]
+        retrieve_by_id = snapshot_retriever("scorekeeper_details", "id",
+                                            details.retrieve_by_id)
+        scorekeeper_details = retrieve_each(retrieve_by_id,
+                                            scorekeeper_ids,
+                                            database_connection)
+        return stream_response("scorekeepers", scorekeeper_details, ndjson), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeepers from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeepers from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_scorekeeper_by_slug(scorekeeper_slug: str,
                             database_connection: mysql.connector.connect):
     """Retrieve a scorekeeper based on their slug"""
     try:
-        database_connection.reconnect()
-        scorekeeper_info = info.retrieve_by_slug(scorekeeper_slug,
-                                                 database_connection)
+        scorekeeper_info = from_slug("scorekeeper",
+                                     snapshot_retriever("scorekeeper_info", "id",
+                                                        info.retrieve_by_id),
+                                     scorekeeper_slug,
+                                     database_connection)
         if not scorekeeper_info:
             message = "Scorekeeper slug '{}' not found".format(scorekeeper_slug)
             response = fail_dict("scorekeeper", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeeper", scorekeeper_info)), 200
+        return json_response(success_dict("scorekeeper", scorekeeper_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeeper information "
                               "from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeeper information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_scorekeeper_details_by_slug(scorekeeper_slug: str,
                                     database_connection: mysql.connector.connect):
     """Retrieve a scorekeeper and their appearance data based on their
     slug"""
     try:
-        database_connection.reconnect()
-        scorekeeper_details = details.retrieve_by_slug(scorekeeper_slug,
-                                                       database_connection)
+        scorekeeper_details = from_slug("scorekeeper",
+                                        snapshot_retriever("scorekeeper_details", "id",
+                                                           details.retrieve_by_id),
+                                        scorekeeper_slug,
+                                        database_connection)
         if not scorekeeper_details:
             message = "Scorekeeper slug '{}' not found".format(scorekeeper_slug)
             response = fail_dict("scorekeeper", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("scorekeeper", scorekeeper_details)), 200
+        return json_response(success_dict("scorekeeper", scorekeeper_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve scorekeeper information "
                               "from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "scorekeeper information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides compact binary encodings of panelist score
+series, selected based on the Accept request header. MessagePack is
+available when msgpack is installed. The packed array format is always
+available and consists of a little-endian unsigned 32-bit count followed
+by the show dates, as signed 32-bit days since 1970-01-01, and the
+scores, as 32-bit floats."""
+
+import struct
+
+import numpy
+from flask import current_app, request
+
+from .statistics import ordered_pairs
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+PACKED_MIMETYPE = "application/x-wwdtm-series"
+
+def series_mimetypes() -> tuple:
+    """Return the binary series formats that can be returned"""
+    if msgpack:
+        return (MSGPACK_MIMETYPE, PACKED_MIMETYPE)
+
+    return (PACKED_MIMETYPE,)
+
+def negotiate_series() -> str:
+    """Return the binary series format preferred by the client for the
+    current request, or None if JSON is preferred"""
+    best_match = request.accept_mimetypes.best_match(("application/json",)
+                                                     + series_mimetypes())
+    if best_match == "application/json":
+        return None
+
+    return best_match
+
+def encode_series(show_dates: numpy.ndarray,
+                  scores: numpy.ndarray,
+                  mimetype: str) -> bytes:
+    """Return a score series encoded in the requested binary format"""
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(ordered_pairs((show_dates, scores)))
+
+    return (struct.pack("<I", show_dates.size)
+            + show_dates.astype("<i4").tobytes()
+            + scores.astype("<f4").tobytes())
+
+def series_response(series: tuple, mimetype: str):
+    """Return a response containing a score series encoded in the
+    requested binary format"""
+    show_dates, scores = series
+    return current_app.response_class(encode_series(show_dates,
+                                                    scores,
+                                                    mimetype),
+                                      mimetype=mimetype)
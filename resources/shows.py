@@ -6,195 +6,225 @@ for /shows"""
 
 import mysql.connector
 from mysql.connector.errors import DatabaseError, ProgrammingError
-from flask import Flask, jsonify, abort, make_response, request
+from flask import Flask, abort, make_response, request
 
-from .dicts import error_dict, fail_dict, success_dict
+from .cache import cached_response
+from .database import with_reconnect
+from .dicts import error_dict, fail_dict, json_response, success_dict
+from .indexes import from_show_date
+from .pagination import Page, paginate_items, retrieve_page
+from .snapshot import from_snapshot, snapshot_retriever
+from .streaming import retrieve_each, stream_response
 from wwdtm.show import details, info
 
-def get_shows(database_connection: mysql.connector.connect):
+@cached_response
+def get_shows(page: Page,
+              database_connection: mysql.connector.connect):
     """Return a list of shows and the corresponding information"""
     try:
-        database_connection.reconnect()
-        shows = info.retrieve_all(database_connection)
+        shows = from_snapshot("show_info", "all",
+                              info.retrieve_all,
+                              database_connection)
         if not shows:
             response = fail_dict("shows", "No shows found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", shows)), 200
+        paging = None
+        if page:
+            shows, paging = paginate_items(shows, page)
+
+        return json_response(success_dict("shows", shows, paging)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve shows from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving shows "
                               "from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_by_id(show_id: int, database_connection: mysql.connector.connect):
     """Retrieve a show and corresponding information based on the
     show ID"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_by_id(show_id, database_connection)
+        show_info = from_snapshot("show_info", "id",
+                                  info.retrieve_by_id,
+                                  show_id,
+                                  database_connection)
         if not show_info:
             message = "Show ID {} not found".format(show_id)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_info)), 200
+        return json_response(success_dict("show", show_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_details_by_id(show_id: int,
                            database_connection: mysql.connector.connect):
     """Retrieve a show and detailed information based on the show ID"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_by_id(show_id, database_connection)
+        show_details = from_snapshot("show_details", "id",
+                                     details.retrieve_by_id,
+                                     show_id,
+                                     database_connection)
         if not show_details:
             message = "Show ID {} not found".format(show_id)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_details)), 200
+        return json_response(success_dict("show", show_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_by_year(show_year: int,
                      database_connection: mysql.connector.connect):
     """Retrieve a list of shows and corresponding information for a
     requested year"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_by_year(show_year, database_connection)
+        show_info = from_show_date(snapshot_retriever("show_info", "year",
+                                                      info.retrieve_by_year),
+                                   show_year,
+                                   database_connection)
         if not show_info:
             message = "Shows for year {:04d} not found".format(show_year)
             response = fail_dict("shows", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_info)), 200
+        return json_response(success_dict("shows", show_info)), 200
     except (OverflowError, ValueError):
         message = "Invalid year {:04d}".format(show_year)
         response = fail_dict("shows", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_details_by_year(show_year: int,
                              database_connection: mysql.connector.connect):
     """Retrieve a list of shows and detailed information for the
     requested year"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_by_year(show_year, database_connection)
+        show_details = from_show_date(snapshot_retriever("show_details", "year",
+                                                         details.retrieve_by_year),
+                                      show_year,
+                                      database_connection)
         if not show_details:
             message = "Shows for year {:04d} not found".format(show_year)
             response = fail_dict("shows", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_details)), 200
+        return json_response(success_dict("shows", show_details)), 200
     except (OverflowError, ValueError):
         message = "Invalid year {:04d}".format(show_year)
         response = fail_dict("shows", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_by_year_month(show_year: int,
                            show_month: int,
                            database_connection: mysql.connector.connect):
     """Retrieve a list of shows and corresponding information for the
     requested year and month"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_by_year_month(show_year,
-                                                show_month,
-                                                database_connection)
+        show_info = from_show_date(snapshot_retriever("show_info", "year_month",
+                                                      info.retrieve_by_year_month),
+                                   show_year,
+                                   show_month,
+                                   database_connection)
         if not show_info:
             message = "Shows for {:04d}-{:02d} not found".format(show_year, show_month)
             response = fail_dict("shows", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_info)), 200
+        return json_response(success_dict("shows", show_info)), 200
     except (OverflowError, ValueError):
         message = "Invalid year-month {:04d}-{:02d}".format(show_year, show_month)
         response = fail_dict("shows", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_details_by_year_month(show_year: int,
                                    show_month: int,
                                    database_connection: mysql.connector.connect):
     """Retrieve a list of shows and detailed information for the
     requested year and month"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_by_year_month(show_year,
-                                                      show_month,
-                                                      database_connection)
+        show_details = from_show_date(snapshot_retriever("show_details", "year_month",
+                                                         details.retrieve_by_year_month),
+                                      show_year,
+                                      show_month,
+                                      database_connection)
         if not show_details:
             message = "Shows for {:04d}-{:02d} not found".format(show_year, show_month)
             response = fail_dict("shows", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_details)), 200
+        return json_response(success_dict("shows", show_details)), 200
     except (OverflowError, ValueError):
         message = "Invalid year-month {:04d}-{:02d}".format(show_year, show_month)
         response = fail_dict("shows", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_by_date(show_year: int,
                      show_month: int,
                      show_day: int,
@@ -202,65 +232,69 @@ def get_show_by_date(show_year: int,
     """Retrieve a show and corresponding information based on the
     show's year, month and day"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_by_date(show_year,
-                                          show_month,
-                                          show_day,
-                                          database_connection)
+        show_info = from_show_date(snapshot_retriever("show_info", "date",
+                                                      info.retrieve_by_date),
+                                   show_year,
+                                   show_month,
+                                   show_day,
+                                   database_connection)
         if not show_info:
             message = "Show date {:04d}-{:02d}-{:02d} not found".format(show_year,
                                                                      show_month,
                                                                      show_day)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_info)), 200
+        return json_response(success_dict("show", show_info)), 200
     except (OverflowError, ValueError):
         message = "Invalid date {:04d}-{:02d}-{:02d}".format(show_year,
                                                           show_month,
                                                           show_day)
         response = fail_dict("show", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_by_date_string(show_date: str,
                             database_connection: mysql.connector.connect):
     """Retrieve a show and corresponding information based on the
     show's year, month and day in ISO format (YYYY-MM-DD)"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_by_date_string(show_date,
-                                                 database_connection)
+        show_info = from_show_date(snapshot_retriever("show_info", "date_string",
+                                                      info.retrieve_by_date_string),
+                                   show_date,
+                                   database_connection)
         if not show_info:
             message = "Show date {} not found".format(show_date)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_info)), 200
+        return json_response(success_dict("show", show_info)), 200
     except (OverflowError, ValueError):
         message = "Invalid date {}".format(show_date)
         response = fail_dict("show", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_details_by_date(show_year: int,
                              show_month: int,
                              show_day: int,
@@ -268,123 +302,170 @@ def get_show_details_by_date(show_year: int,
     """Retrieve a list of shows and detailed information for the
     requested year, month and day"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_by_date(show_year,
-                                                show_month,
-                                                show_day,
-                                                database_connection)
+        show_details = from_show_date(snapshot_retriever("show_details", "date",
+                                                         details.retrieve_by_date),
+                                      show_year,
+                                      show_month,
+                                      show_day,
+                                      database_connection)
         if not show_details:
             message = "Show date {:04d}-{:02d}-{:02d} not found".format(show_year,
                                                                      show_month,
                                                                      show_day)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_details)), 200
+        return json_response(success_dict("show", show_details)), 200
     except (OverflowError, ValueError):
         message = "Invalid date {:04d}-{:02d}-{:02d}".format(show_year,
                                                           show_month,
                                                           show_day)
         response = fail_dict("show", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_show_details_by_date_string(show_date: str,
                                     database_connection: mysql.connector.connect):
     """Retrieve a show and detailed information based on the
     show's year, month and day in ISO format (YYYY-MM-DD)"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_by_date_string(show_date,
-                                                       database_connection)
+        show_details = from_show_date(snapshot_retriever("show_details", "date_string",
+                                                         details.retrieve_by_date_string),
+                                      show_date,
+                                      database_connection)
         if not show_details:
             message = "Show date {} not found".format(show_date)
             response = fail_dict("show", message)
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", show_details)), 200
+        return json_response(success_dict("show", show_details)), 200
     except (OverflowError, ValueError):
         message = "Invalid date {}".format(show_date)
         response = fail_dict("show", message)
-        return jsonify(response), 400
+        return json_response(response), 400
     except ProgrammingError:
         response = error_dict("Unable to retrieve show information from the "
                               "database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving "
                               "show information")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
-def get_show_details(database_connection: mysql.connector.connect):
+@cached_response
+def get_show_details(page: Page,
+                     database_connection: mysql.connector.connect):
     """Retrieve a list of all shows and corresponding detailed
     information"""
     try:
-        database_connection.reconnect()
-        shows = details.retrieve_all(database_connection)
+        if page:
+            retrieve_all = snapshot_retriever("show_info", "all",
+                                              info.retrieve_all)
+            retrieve_by_id = snapshot_retriever("show_details", "id",
+                                                details.retrieve_by_id)
+            shows, paging = retrieve_page(retrieve_all,
+                                          retrieve_by_id,
+                                          page,
+                                          database_connection)
+            return json_response(success_dict("show", shows, paging)), 200
+
+        shows = from_snapshot("show_details", "all",
+                              details.retrieve_all,
+                              database_connection)
+        if not shows:
+            response = fail_dict("show", "No shows found")
+            return json_response(response), 404
+
+        return json_response(success_dict("show", shows)), 200
+    except ProgrammingError:
+        response = error_dict("Unable to retrieve shows from the database")
+        return json_response(response), 500
+    except DatabaseError:
+        response = error_dict("Database error occurred while retrieving shows "
+                              "from database")
+        return json_response(response), 500
+    except:
+        abort(500)
+
+def stream_show_details(ndjson: bool,
+                        database_connection: mysql.connector.connect):
+    """Stream all shows and corresponding detailed information,
+    retrieving and encoding one show at a time"""
+    try:
+        shows = from_snapshot("show_info", "all",
+                              info.retrieve_all,
+                              database_connection)
         if not shows:
             response = fail_dict("show", "No shows found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("show", shows)), 200
+        show_ids = [show["id"] for show in shows]
+        retrieve_by_id = snapshot_retriever("show_details", "id",
+                                            details.retrieve_by_id)
+        show_details = retrieve_each(retrieve_by_id,
+                                     show_ids,
+                                     database_connection)
+        return stream_response("show", show_details, ndjson), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve shows from the database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving shows "
                               "from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_recent_shows(database_connection: mysql.connector.connect):
     """Retrieve a list of recent shows and corresponding information"""
     try:
-        database_connection.reconnect()
-        show_info = info.retrieve_recent(database_connection)
+        show_info = with_reconnect(info.retrieve_recent, database_connection)
         if not show_info:
             response = fail_dict("shows", "No recent shows found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_info)), 200
+        return json_response(success_dict("shows", show_info)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve shows from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving shows "
                               "from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
 
+@cached_response
 def get_recent_shows_details(database_connection: mysql.connector.connect):
     """Retrieve a list of recent shows and corresponding detailed
     information"""
     try:
-        database_connection.reconnect()
-        show_details = details.retrieve_recent(database_connection)
+        show_details = with_reconnect(details.retrieve_recent,
+                                      database_connection)
         if not show_details:
             response = fail_dict("shows", "No recent shows found")
-            return jsonify(response), 404
+            return json_response(response), 404
 
-        return jsonify(success_dict("shows", show_details)), 200
+        return json_response(success_dict("shows", show_details)), 200
     except ProgrammingError:
         response = error_dict("Unable to retrieve shows from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except DatabaseError:
         response = error_dict("Database error occurred while retrieving shows "
                               "from database")
-        return jsonify(response), 500
+        return json_response(response), 500
     except:
         abort(500)
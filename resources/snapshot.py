@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides an in-memory snapshot of the full Wait Wait...
+Don't Tell Me! Stats dataset, indexed by ID and show date, that is used
+to answer requests without querying the database, and to resolve slugs
+to IDs."""
+
+import datetime
+import functools
+import gc
+import threading
+import time
+
+import mysql.connector
+from mysql.connector.errors import Error
+from flask import has_request_context, request
+
+import wwdtm.guest.details
+import wwdtm.guest.info
+import wwdtm.host.details
+import wwdtm.host.info
+import wwdtm.location.details
+import wwdtm.location.info
+import wwdtm.panelist.details
+import wwdtm.panelist.info
+import wwdtm.scorekeeper.details
+import wwdtm.scorekeeper.info
+import wwdtm.show.details
+import wwdtm.show.info
+
+from .bulk import bulk_queries
+from .database import with_reconnect
+from .fields import fields_covered, note_fields, requested_fields
+from .tracing import current_trace
+from .version import data_version
+
+DEFAULT_SNAPSHOT_CONFIG = {
+    "enabled": True,
+    "preload": True,
+    "retry_interval": 300
+}
+
+COLLECTION_LOADERS = {
+    "guest_info": wwdtm.guest.info.retrieve_all,
+    "guest_details": wwdtm.guest.details.retrieve_all,
+    "host_info": wwdtm.host.info.retrieve_all,
+    "host_details": wwdtm.host.details.retrieve_all,
+    "location_info": wwdtm.location.info.retrieve_all,
+    "location_recordings": wwdtm.location.details.retrieve_all_recordings,
+    "panelist_info": wwdtm.panelist.info.retrieve_all,
+    "panelist_details": wwdtm.panelist.details.retrieve_all,
+    "scorekeeper_info": wwdtm.scorekeeper.info.retrieve_all,
+    "scorekeeper_details": wwdtm.scorekeeper.details.retrieve_all,
+    "show_info": wwdtm.show.info.retrieve_all,
+    "show_details": wwdtm.show.details.retrieve_all
+}
+
+DATED_COLLECTIONS = ("show_info", "show_details")
+
+# Requests answered from a snapshot older than the current data version
+# are marked in the WSGI environment so that their responses are not
+# cached
+_STALE_KEY = "wwdtm.stale_snapshot"
+
+# Info collections and wwdtm functions that return a subset of the
+# fields of the corresponding details collections and functions, without
+# the sub-queries for appearances, scores and other details
+INFO_COLLECTIONS = {
+    "guest_details": "guest_info",
+    "host_details": "host_info",
+    "panelist_details": "panelist_info",
+    "scorekeeper_details": "scorekeeper_info",
+    "show_details": "show_info"
+}
+
+INFO_FUNCTIONS = {
+    wwdtm.guest.details.retrieve_all: wwdtm.guest.info.retrieve_all,
+    wwdtm.guest.details.retrieve_by_id: wwdtm.guest.info.retrieve_by_id,
+    wwdtm.host.details.retrieve_all: wwdtm.host.info.retrieve_all,
+    wwdtm.host.details.retrieve_by_id: wwdtm.host.info.retrieve_by_id,
+    wwdtm.panelist.details.retrieve_all: wwdtm.panelist.info.retrieve_all,
+    wwdtm.panelist.details.retrieve_by_id: wwdtm.panelist.info.retrieve_by_id,
+    wwdtm.scorekeeper.details.retrieve_all: wwdtm.scorekeeper.info.retrieve_all,
+    wwdtm.scorekeeper.details.retrieve_by_id: wwdtm.scorekeeper.info.retrieve_by_id,
+    wwdtm.show.details.retrieve_all: wwdtm.show.info.retrieve_all,
+    wwdtm.show.details.retrieve_by_id: wwdtm.show.info.retrieve_by_id,
+    wwdtm.show.details.retrieve_by_year: wwdtm.show.info.retrieve_by_year,
+    wwdtm.show.details.retrieve_by_year_month: wwdtm.show.info.retrieve_by_year_month,
+    wwdtm.show.details.retrieve_by_date: wwdtm.show.info.retrieve_by_date,
+    wwdtm.show.details.retrieve_by_date_string: wwdtm.show.info.retrieve_by_date_string
+}
+
+def _parse_show_date(value) -> datetime.date:
+    """Return the date of a show record, which may be a date object or
+    an ISO formatted (YYYY-MM-DD) string"""
+    if isinstance(value, datetime.date):
+        return value
+
+    return datetime.datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+class Collection:
+    """Records of one collection, in the order returned by wwdtm, with
+    indexes that map IDs, slugs and show dates to record positions.
+    Slugs are indexed in lower case, as they are matched
+    case-insensitively by the database."""
+
+    def __init__(self, records: list, dated: bool = False):
+        self.records = tuple(records)
+        self.by_id = {}
+        self.by_slug = {}
+        self.by_date = {}
+        self.by_year = {}
+        self.by_year_month = {}
+        for position, record in enumerate(self.records):
+            self.by_id[record["id"]] = position
+            if record.get("slug"):
+                self.by_slug[record["slug"].lower()] = position
+            if dated:
+                show_date = _parse_show_date(record["date"])
+                self.by_date[show_date] = position
+                self.by_year.setdefault(show_date.year, []).append(position)
+                self.by_year_month.setdefault((show_date.year, show_date.month),
+                                              []).append(position)
+
+        self.by_year = {key: tuple(value) for key, value in self.by_year.items()}
+        self.by_year_month = {key: tuple(value)
+                              for key, value in self.by_year_month.items()}
+
+    def record(self, position: int):
+        """Return the record at a position, or None if the position is
+        None"""
+        return self.records[position] if position is not None else None
+
+    def records_at(self, positions: tuple) -> list:
+        """Return the records at the given positions"""
+        return [self.records[position] for position in positions]
+
+class Snapshot:
+    """Indexed collections for the full dataset as of a data version"""
+
+    def __init__(self, version: str, collections: dict):
+        self.version = version
+        self.collections = collections
+
+    def lookup(self, collection: str, index: str, key=None):
+        """Return the record or records in a collection matching the key
+        using the named index. Lookups return None or an empty list when
+        nothing matches, in the same way as the wwdtm functions.
+
+        Raises ValueError for invalid dates."""
+        records = self.collections[collection]
+        if index == "all":
+            return list(records.records)
+        if index == "id":
+            return records.record(records.by_id.get(key))
+        if index == "slug":
+            return records.record(records.by_slug.get(key.lower()))
+        if index == "year":
+            datetime.date(key, 1, 1)
+            return records.records_at(records.by_year.get(key, ()))
+        if index == "year_month":
+            datetime.date(key[0], key[1], 1)
+            return records.records_at(records.by_year_month.get(key, ()))
+        if index == "date":
+            show_date = datetime.date(*key)
+            return records.record(records.by_date.get(show_date))
+        if index == "date_string":
+            show_date = datetime.datetime.strptime(key, "%Y-%m-%d").date()
+            return records.record(records.by_date.get(show_date))
+
+        raise KeyError("Unknown snapshot index '{}'".format(index))
+
+def load_snapshot(version: str,
+                  database_connection: mysql.connector.connect) -> Snapshot:
+    """Load all collections from the database and build a snapshot"""
+    collections = {}
+    for name, loader in COLLECTION_LOADERS.items():
+        records = with_reconnect(bulk_queries.retriever(loader),
+                                 database_connection) or []
+        collections[name] = Collection(records, name in DATED_COLLECTIONS)
+        note_fields(name, records)
+
+    return Snapshot(version, collections)
+
+class Dataset:
+    """Holds the current dataset snapshot for the worker and replaces it
+    when the data version changes. Snapshots are loaded in a background
+    thread with a connection from the connection pool, and swapped in as
+    a whole, so requests always see a consistent dataset and never wait
+    for a load. Until the new snapshot is loaded, requests are answered
+    from the previous snapshot, or by wwdtm if there is none."""
+
+    def __init__(self,
+                 enabled: bool = False,
+                 preload: bool = False,
+                 retry_interval: float = 300):
+        self.enabled = enabled
+        self.preload = preload
+        self.retry_interval = retry_interval
+        self.snapshot = None
+        self.connection_pool = None
+        self._failed_at = None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def configure(self,
+                  enabled: bool = True,
+                  preload: bool = True,
+                  retry_interval: float = 300):
+        """Enable or disable the snapshot, whether it is loaded when the
+        application is imported and how long to wait before retrying
+        after a failed load"""
+        self.enabled = enabled
+        self.preload = preload
+        self.retry_interval = retry_interval
+        self.snapshot = None
+        self._failed_at = None
+
+    def current(self, database_connection: mysql.connector.connect) -> Snapshot:
+        """Return the snapshot for the current data version, starting a
+        background load if the data version changed. The previous
+        snapshot is returned until the load completes, and the request
+        is marked so that its response is not cached for the new data
+        version. Returns None if the snapshot is disabled or has not
+        been loaded, in which case requests are answered by wwdtm.
+        Traced requests are also answered by wwdtm so that its queries
+        are traced."""
+        if not self.enabled or current_trace():
+            return None
+
+        snapshot = self.snapshot
+        version = data_version.current(database_connection)
+        if snapshot and (not version or snapshot.version == version):
+            return snapshot
+        if not version:
+            return None
+
+        self._start_load(version)
+        if snapshot and has_request_context():
+            request.environ[_STALE_KEY] = True
+        return snapshot
+
+    def _start_load(self, version: str):
+        """Start loading the snapshot for a data version in a background
+        thread, unless a load is already running or the last load failed
+        within the retry interval"""
+        if self.connection_pool is None:
+            return
+        if (self._failed_at
+                and time.monotonic() - self._failed_at < self.retry_interval):
+            return
+
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+
+        thread = threading.Thread(target=self._load,
+                                  args=(version,),
+                                  name="wwdtm-snapshot",
+                                  daemon=True)
+        thread.start()
+
+    def _load(self, version: str):
+        """Load the snapshot for a data version and swap it in. If the
+        load fails, the previous snapshot is dropped so that requests
+        are answered by wwdtm until the retry interval has passed."""
+        try:
+            database_connection = self.connection_pool.get_connection()
+            try:
+                snapshot = load_snapshot(version, database_connection)
+            finally:
+                database_connection.close()
+            self.snapshot = snapshot
+            self._failed_at = None
+        except (Error, KeyError, TypeError, ValueError):
+            self.snapshot = None
+            self._failed_at = time.monotonic()
+        finally:
+            self._loading = False
+
+    def load_before_fork(self, connection_pool):
+        """Keep the connection pool used for background loads and load
+        the snapshot while the application is being imported. Under
+        uWSGI, without lazy-apps, this runs once in the master process,
+        so the workers start with the snapshot instead of each querying
+        the database for their own copy. The load runs in the importing
+        thread, since threads do not survive the fork.
+
+        The connection used for loading is closed so that no sockets
+        are inherited by the workers. All objects that exist at this
+        point are then moved out of the garbage collector's tracked
+        generations, so that collections in the workers do not write
+        to the pages holding the snapshot. The records are wwdtm
+        dictionaries, and reading them updates their reference counts,
+        so pages holding records that a worker reads are still copied
+        into that worker."""
+        self.connection_pool = connection_pool
+        if not self.enabled or not self.preload:
+            return
+
+        try:
+            database_connection = connection_pool.get_connection()
+            try:
+                version = data_version.current(database_connection)
+                if version:
+                    self.snapshot = load_snapshot(version, database_connection)
+            finally:
+                database_connection.close()
+        except (Error, KeyError, TypeError, ValueError):
+            # Workers load the snapshot in the background instead
+            pass
+        finally:
+            connection_pool.close_idle()
+
+        if hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+
+dataset = Dataset()
+
+def served_stale_snapshot() -> bool:
+    """Return whether the current request was answered from a snapshot
+    older than the current data version"""
+    return has_request_context() and request.environ.get(_STALE_KEY, False)
+
+def _lookup(collection: str, index: str, fallback, *args):
+    """Look up records in the dataset snapshot, or call the wwdtm
+    fallback function, or its set-based replacement, if no snapshot is
+    available. Details lookups use the corresponding info collection and
+    function instead if the info records contain all of the requested
+    fields."""
+    selection = requested_fields()
+    if (selection
+            and collection in INFO_COLLECTIONS
+            and fallback in INFO_FUNCTIONS
+            and fields_covered(INFO_COLLECTIONS[collection], selection)):
+        collection = INFO_COLLECTIONS[collection]
+        fallback = INFO_FUNCTIONS[fallback]
+
+    snapshot = dataset.current(args[-1])
+    if snapshot is None:
+        records = bulk_queries.retriever(fallback)(*args)
+    else:
+        key = args[:-1]
+        if len(key) < 2:
+            key = key[0] if key else None
+        records = snapshot.lookup(collection, index, key)
+
+    note_fields(collection, records)
+    return records
+
+def snapshot_retriever(collection: str, index: str, fallback):
+    """Return a function with the same signature as the wwdtm fallback
+    function that looks up records in the named collection and index of
+    the dataset snapshot. The arguments, other than the trailing
+    database connection, form the lookup key."""
+    return functools.partial(_lookup, collection, index, fallback)
+
+def from_snapshot(collection: str, index: str, fallback, *args):
+    """Look up records in the dataset snapshot, calling the wwdtm
+    fallback function with the same arguments if no snapshot is
+    available. Used in place of with_reconnect by request handlers."""
+    return with_reconnect(snapshot_retriever(collection, index, fallback),
+                          *args)
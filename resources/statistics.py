@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides panelist score statistics, score series and
+score lists computed with NumPy from all panelist scores, which are
+loaded into arrays once per data version. The score lists and ordered
+pairs can be compared with those returned by wwdtm with the
+verify-scores command, which exits with an error if any of them differ:
+
+    FLASK_APP=api flask verify-scores"""
+
+import threading
+
+import mysql.connector
+import numpy
+
+from wwdtm.panelist import info
+
+from .encoding import json_provider
+from .version import data_version
+
+RANKS = ("1", "1t", "2", "2t", "3")
+
+def _retrieve_scores(database_connection: mysql.connector.connect) -> list:
+    """Retrieve the panelist ID, show date, score and rank of every
+    panelist appearance, excluding Best Of and repeat shows, ordered by
+    panelist and show date"""
+    cursor = database_connection.cursor()
+    query = ("SELECT pm.panelistid, s.showdate, pm.panelistscore, "
+             "pm.showpnlrank "
+             "FROM ww_showpnlmap pm "
+             "JOIN ww_shows s ON s.showid = pm.showid "
+             "WHERE s.bestof = 0 AND s.repeatshowid IS NULL "
+             "ORDER BY pm.panelistid ASC, s.showdate ASC;")
+    cursor.execute(query)
+    result = cursor.fetchall()
+    cursor.close()
+    return result
+
+def _number(value: float):
+    """Return a float as an int if it has no fractional part"""
+    return int(value) if value.is_integer() else value
+
+def _segments(panelist_ids: numpy.ndarray) -> dict:
+    """Return the start and end positions of each panelist's rows in an
+    array of panelist IDs ordered by panelist"""
+    ids, starts, counts = numpy.unique(panelist_ids,
+                                       return_index=True,
+                                       return_counts=True)
+    return {panelist_id: (start, start + count)
+            for panelist_id, start, count
+            in zip(ids.tolist(), starts.tolist(), counts.tolist())}
+
+class ScoreStatistics:
+    """Panelist scores held in NumPy arrays, ordered by panelist and
+    show date, with score statistics and rank distributions computed for
+    every panelist in one vectorized pass. Appearances without a score
+    are only included in the score lists."""
+
+    def __init__(self, rows: list):
+        panelist_ids = numpy.array([row[0] for row in rows],
+                                   dtype=numpy.int64)
+        show_dates = numpy.array([row[1] for row in rows],
+                                 dtype="datetime64[D]")
+        scores = numpy.array([numpy.nan if row[2] is None else float(row[2])
+                              for row in rows],
+                             dtype=numpy.float64)
+        rank_codes = {rank: code for code, rank in enumerate(RANKS)}
+        ranks = numpy.array([rank_codes.get(row[3], -1) for row in rows],
+                            dtype=numpy.int8)
+
+        order = numpy.lexsort((show_dates, panelist_ids))
+        if not numpy.array_equal(order, numpy.arange(order.size)):
+            panelist_ids = panelist_ids[order]
+            show_dates = show_dates[order]
+            scores = scores[order]
+            ranks = ranks[order]
+
+        self.appearance_dates = show_dates
+        self.appearance_scores = scores
+        self.appearance_segments = _segments(panelist_ids)
+
+        scored = ~numpy.isnan(scores)
+        if scored.all():
+            self.panelist_ids = panelist_ids
+            self.show_dates = show_dates
+            self.scores = scores
+            self.ranks = ranks
+        else:
+            self.panelist_ids = panelist_ids[scored]
+            self.show_dates = show_dates[scored]
+            self.scores = scores[scored]
+            self.ranks = ranks[scored]
+
+        self.segments = {}
+        self.statistics = self._compute()
+
+    def _compute(self) -> dict:
+        """Compute the score statistics and rank distribution for each
+        panelist"""
+        if not self.scores.size:
+            return {}
+
+        # Each panelist's scores form a contiguous segment of the arrays
+        ids, starts, counts = numpy.unique(self.panelist_ids,
+                                           return_index=True,
+                                           return_counts=True)
+        minimums = numpy.minimum.reduceat(self.scores, starts)
+        maximums = numpy.maximum.reduceat(self.scores, starts)
+        totals = numpy.add.reduceat(self.scores, starts)
+        means = totals / counts
+        squares = numpy.add.reduceat(self.scores ** 2, starts)
+        deviations = numpy.sqrt(numpy.maximum(squares / counts - means ** 2, 0))
+
+        # Sorting by panelist, then score, orders the scores within each
+        # segment so that the medians can be read at the middle positions
+        sorted_scores = self.scores[numpy.lexsort((self.scores,
+                                                   self.panelist_ids))]
+        medians = (sorted_scores[starts + (counts - 1) // 2]
+                   + sorted_scores[starts + counts // 2]) / 2
+
+        segments = numpy.repeat(numpy.arange(ids.size), counts)
+        ranked = self.ranks >= 0
+        rank_counts = numpy.zeros((ids.size, len(RANKS)), dtype=numpy.int64)
+        numpy.add.at(rank_counts, (segments[ranked], self.ranks[ranked]), 1)
+
+        statistics = {}
+        for index, panelist_id in enumerate(ids.tolist()):
+            self.segments[panelist_id] = (int(starts[index]),
+                                          int(starts[index] + counts[index]))
+            statistics[panelist_id] = {
+                "id": panelist_id,
+                "scores": {
+                    "count": int(counts[index]),
+                    "minimum": _number(float(minimums[index])),
+                    "maximum": _number(float(maximums[index])),
+                    "total": _number(float(totals[index])),
+                    "mean": round(float(means[index]), 4),
+                    "median": round(float(medians[index]), 4),
+                    "standard_deviation": round(float(deviations[index]), 4)
+                },
+                "ranks": dict(zip(RANKS, rank_counts[index].tolist()))
+            }
+
+        return statistics
+
+    def for_panelist(self, panelist_id: int) -> dict:
+        """Return the statistics for a panelist, or None if the panelist
+        has no scores"""
+        return self.statistics.get(panelist_id)
+
+    def series(self, panelist_id: int) -> tuple:
+        """Return the show dates and scores of a panelist, in date
+        order, as views of the score arrays, or None if the panelist has
+        no scores"""
+        segment = self.segments.get(panelist_id)
+        if not segment:
+            return None
+
+        start, end = segment
+        return self.show_dates[start:end], self.scores[start:end]
+
+    def scores_list(self, panelist_id: int) -> dict:
+        """Return the show dates and scores of every appearance of a
+        panelist, in date order, in the structure returned by wwdtm, or
+        None if the panelist has no appearances"""
+        segment = self.appearance_segments.get(panelist_id)
+        if not segment:
+            return None
+
+        start, end = segment
+        show_dates = self.appearance_dates[start:end]
+        scores = self.appearance_scores[start:end].tolist()
+        return {
+            "shows": numpy.datetime_as_string(show_dates, unit="D").tolist(),
+            "scores": [None if numpy.isnan(score) else _number(score)
+                       for score in scores]
+        }
+
+    def scores_ordered_pairs(self, panelist_id: int) -> list:
+        """Return the show date and score of every appearance of a
+        panelist, in date order, as ordered pairs in the structure
+        returned by wwdtm, or None if the panelist has no appearances"""
+        scores = self.scores_list(panelist_id)
+        if not scores:
+            return None
+
+        return [list(pair) for pair in zip(scores["shows"], scores["scores"])]
+
+    def all_panelists(self) -> list:
+        """Return the statistics for all panelists with scores, ordered
+        by panelist ID"""
+        return list(self.statistics.values())
+
+class ScoreStatisticsCache:
+    """Holds the score statistics for the worker and recomputes them
+    when the data version changes"""
+
+    def __init__(self):
+        self.version = None
+        self.statistics = None
+        self._lock = threading.Lock()
+
+    def current(self,
+                database_connection: mysql.connector.connect) -> ScoreStatistics:
+        """Return the score statistics for the current data version,
+        recomputing them if the data version has changed
+
+        Raises DatabaseError if the statistics have to be computed and
+        the database cannot be queried."""
+        version = data_version.current(database_connection)
+        statistics = self.statistics
+        if statistics and (not version or version == self.version):
+            return statistics
+
+        with self._lock:
+            if not self.statistics or (version and version != self.version):
+                rows = _retrieve_scores(database_connection)
+                self.statistics = ScoreStatistics(rows)
+                self.version = version
+
+        return self.statistics
+
+score_statistics = ScoreStatisticsCache()
+
+def verify_scores_lists(connection_pool) -> list:
+    """Compare the score list and ordered pairs of each panelist with
+    appearances with those returned by wwdtm, and return the IDs of the
+    panelists whose lists or pairs differ. They are compared as encoded
+    in responses."""
+    try:
+        database_connection = connection_pool.get_connection()
+        try:
+            statistics = score_statistics.current(database_connection)
+            return [panelist_id
+                    for panelist_id in statistics.appearance_segments
+                    if json_provider.dumps(statistics.scores_list(panelist_id))
+                    != json_provider.dumps(info.retrieve_scores_list_by_id(
+                        panelist_id, database_connection))
+                    or json_provider.dumps(
+                        statistics.scores_ordered_pairs(panelist_id))
+                    != json_provider.dumps(
+                        info.retrieve_scores_ordered_pair_by_id(
+                            panelist_id, database_connection))]
+        finally:
+            database_connection.close()
+    finally:
+        connection_pool.close_idle()
+
+def retrieve_statistics_by_id(panelist_id: int,
+                              database_connection: mysql.connector.connect) -> dict:
+    """Retrieve the score statistics for a panelist, or None if the
+    panelist has no scores"""
+    statistics = score_statistics.current(database_connection)
+    return statistics.for_panelist(panelist_id)
+
+def retrieve_scores_list_by_id(panelist_id: int,
+                               database_connection: mysql.connector.connect) -> dict:
+    """Retrieve the show dates and scores of a panelist's appearances
+    from the score arrays, or with wwdtm for panelists without
+    appearances"""
+    statistics = score_statistics.current(database_connection)
+    scores = statistics.scores_list(panelist_id)
+    if scores:
+        return scores
+
+    return info.retrieve_scores_list_by_id(panelist_id, database_connection)
+
+def retrieve_all_statistics(database_connection: mysql.connector.connect) -> list:
+    """Retrieve the score statistics for all panelists with scores"""
+    statistics = score_statistics.current(database_connection)
+    return statistics.all_panelists()
+
+def ordered_pairs(series: tuple) -> list:
+    """Return a score series as a list of show date and score pairs"""
+    show_dates, scores = series
+    date_strings = numpy.datetime_as_string(show_dates, unit="D").tolist()
+    return [[show_date, _number(score)]
+            for show_date, score in zip(date_strings, scores.tolist())]
+
+def retrieve_series_by_id(panelist_id: int,
+                          database_connection: mysql.connector.connect) -> tuple:
+    """Retrieve the show dates and scores of a panelist, or None if the
+    panelist has no scores"""
+    statistics = score_statistics.current(database_connection)
+    return statistics.series(panelist_id)
+
+def retrieve_ordered_pairs_by_id(panelist_id: int,
+                                 database_connection: mysql.connector.connect) -> list:
+    """Retrieve the show date and score of each of a panelist's
+    appearances as ordered pairs from the score arrays, or with wwdtm
+    for panelists without appearances. Unlike the series used for the
+    binary representations, appearances without a score are included,
+    with a score of None, as wwdtm returns them."""
+    statistics = score_statistics.current(database_connection)
+    scores = statistics.scores_ordered_pairs(panelist_id)
+    if scores:
+        return scores
+
+    return info.retrieve_scores_ordered_pair_by_id(panelist_id,
+                                                   database_connection)
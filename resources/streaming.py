@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides functions that stream collection responses,
+either as JSON or as newline-delimited JSON, one item at a time so that
+neither the full collection nor its full encoded body are held in
+memory"""
+
+import mysql.connector
+from flask import current_app, stream_with_context
+
+from .database import with_reconnect
+from .encoding import json_provider
+from .fields import requested_fields
+
+def retrieve_each(retrieve_by_id,
+                  item_ids: list,
+                  database_connection: mysql.connector.connect):
+    """Yield each item of a collection, retrieving one item at a time
+    using the wwdtm retrieve_by_id function"""
+    for item_id in item_ids:
+        yield with_reconnect(retrieve_by_id, item_id, database_connection)
+
+def stream_response(key_name: str, items, ndjson: bool = False):
+    """Return a streamed success response containing the items in the
+    same format as success_dict, encoding one item at a time as it is
+    produced. If ndjson is set, the items are instead returned as
+    newline-delimited JSON with one item per line. Only the fields
+    requested for the request are included in each item."""
+    selection = requested_fields()
+    if selection:
+        items = (selection.select(item) for item in items)
+
+    def generate_json():
+        prefix = (b'{"status":"success","data":{'
+                  + json_provider.dumps(key_name)
+                  + b":[")
+        for item in items:
+            yield prefix + json_provider.dumps(item)
+            prefix = b","
+
+        if prefix != b",":
+            yield prefix
+        yield b"]}}\n"
+
+    def generate_ndjson():
+        for item in items:
+            yield json_provider.dumps(item) + b"\n"
+
+    if ndjson:
+        return current_app.response_class(stream_with_context(generate_ndjson()),
+                                          mimetype="application/x-ndjson")
+
+    return current_app.response_class(stream_with_context(generate_json()),
+                                      mimetype="application/json")
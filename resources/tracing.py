@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides opt-in query tracing, which records every SQL
+statement sent while handling a request along with its duration and
+row count. Traces are logged once the response has been sent, and
+statement shapes repeated more often than the repeat threshold, as is
+typical of N+1 query patterns, are flagged. The database time of a
+traced request is returned in a Server-Timing response header."""
+
+import collections
+import functools
+import logging
+import re
+import time
+
+from flask import has_request_context, request
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": False,
+    "trace_all": False,
+    "header": "X-Query-Trace",
+    "repeat_threshold": 5
+}
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'"
+                       r"|\"(?:[^\"\\]|\\.|\"\")*\""
+                       r"|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# The trace is kept in the WSGI environment so that queries sent while
+# a streamed response is generated are also recorded
+_ENVIRON_KEY = "wwdtm.query_trace"
+
+logger = logging.getLogger("wwdtm_api.tracing")
+
+def statement_shape(statement: str) -> str:
+    """Return a SQL statement with its literal values and lists of
+    values replaced by placeholders, so that statements that only differ
+    in their values have the same shape"""
+    shape = _LITERALS.sub("?", statement)
+    shape = _VALUE_LISTS.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+class QueryTrace:
+    """SQL statements sent while handling a request, each with its
+    duration, including reading its results, and row count"""
+    __slots__ = ("started", "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+
+    def add_query(self, statement, seconds: float):
+        """Record a statement sent to the database server"""
+        if isinstance(statement, (bytes, bytearray)):
+            statement = statement.decode("utf-8", errors="replace")
+        self.queries.append([statement, seconds, 0])
+
+    def add_rows(self, count: int, seconds: float):
+        """Record rows read from the results of the last statement"""
+        if self.queries:
+            self.queries[-1][1] += seconds
+            self.queries[-1][2] += count
+
+    @property
+    def database_seconds(self) -> float:
+        """Return the total time spent on the traced statements"""
+        return sum(query[1] for query in self.queries)
+
+    def repeated(self, threshold: int) -> list:
+        """Return the statement shapes that were sent more than the
+        threshold number of times, with their counts, most repeated
+        first"""
+        shapes = collections.Counter(statement_shape(query[0])
+                                     for query in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common()
+                if count > threshold]
+
+    def server_timing(self, threshold: int) -> str:
+        """Return the Server-Timing header value for the statements
+        traced so far"""
+        timings = ['db;dur={:.3f};desc="{} queries"'.format(
+            self.database_seconds * 1000, len(self.queries))]
+        repeated = self.repeated(threshold)
+        if repeated:
+            timings.append('repeated;desc="{} statements repeated more '
+                           'than {} times"'.format(len(repeated), threshold))
+
+        timings.append("total;dur={:.3f}".format(
+            (time.perf_counter() - self.started) * 1000))
+        return ", ".join(timings)
+
+    def log(self, method: str, path: str, threshold: int):
+        """Log the traced statements and any repeated statement
+        shapes"""
+        logger.info("%s %s: %d queries in %.3f ms",
+                    method,
+                    path,
+                    len(self.queries),
+                    self.database_seconds * 1000)
+        for statement, seconds, rows in self.queries:
+            logger.info("  %.3f ms, %d rows: %s",
+                        seconds * 1000,
+                        rows,
+                        _WHITESPACE.sub(" ", statement).strip())
+        for shape, count in self.repeated(threshold):
+            logger.warning("%s %s: possible N+1 query pattern, statement "
+                           "sent %d times: %s",
+                           method,
+                           path,
+                           count,
+                           shape)
+
+class QueryTracer:
+    """Decides which requests are traced. When enabled, requests are
+    traced if they set the trace header, or always if trace_all is
+    set."""
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_all = False
+        self.header = "X-Query-Trace"
+        self.repeat_threshold = 5
+
+    def configure(self,
+                  enabled: bool = False,
+                  trace_all: bool = False,
+                  header: str = "X-Query-Trace",
+                  repeat_threshold: int = 5):
+        """Enable or disable query tracing and set the trace header and
+        repeat threshold"""
+        self.enabled = enabled
+        self.trace_all = trace_all
+        self.header = header
+        self.repeat_threshold = repeat_threshold
+        if enabled and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s "
+                                                   "%(name)s: %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+    def requested(self) -> bool:
+        """Return whether the current request should be traced"""
+        if not self.enabled:
+            return False
+
+        return (self.trace_all
+                or request.headers.get(self.header, "").lower() in ("1",
+                                                                    "true",
+                                                                    "yes"))
+
+tracer = QueryTracer()
+
+def current_trace() -> QueryTrace:
+    """Return the query trace for the current request, or None if the
+    request is not traced or there is no request"""
+    if not has_request_context():
+        return None
+
+    return request.environ.get(_ENVIRON_KEY)
+
+def trace_query(statement, seconds: float):
+    """Add a statement to the current request's trace"""
+    trace = current_trace()
+    if trace:
+        trace.add_query(statement, seconds)
+
+def trace_rows(count: int, seconds: float):
+    """Add rows read to the current request's trace"""
+    trace = current_trace()
+    if trace:
+        trace.add_rows(count, seconds)
+
+def start_trace():
+    """Start tracing the current request if requested"""
+    if tracer.requested():
+        request.environ[_ENVIRON_KEY] = QueryTrace()
+
+def finish_trace(response):
+    """Add the Server-Timing header for the current request and log its
+    trace once the response has been sent. The header of a streamed
+    response only includes the statements sent before streaming
+    began."""
+    trace = current_trace()
+    if not trace:
+        return response
+
+    threshold = tracer.repeat_threshold
+    response.headers["Server-Timing"] = trace.server_timing(threshold)
+    response.call_on_close(functools.partial(trace.log,
+                                             request.method,
+                                             request.full_path.rstrip("?"),
+                                             threshold))
+    return response
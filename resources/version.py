@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""This module provides a data version watermark that identifies the
+current state of the Wait Wait... Don't Tell Me! Stats database and is
+used to invalidate cached responses and response validators"""
+
+import datetime
+import hashlib
+import threading
+import time
+
+import mysql.connector
+from mysql.connector.errors import DatabaseError
+from werkzeug.http import http_date
+
+from .database import with_reconnect
+
+DEFAULT_VERSION_CONFIG = {
+    "check_interval": 60
+}
+
+def _retrieve_watermark(database_connection: mysql.connector.connect):
+    """Retrieve aggregate values that change whenever shows, panelist
+    scores, guests, hosts, scorekeepers or locations are added or
+    updated"""
+    cursor = database_connection.cursor()
+    query = ("SELECT "
+             "(SELECT MAX(showid) FROM ww_shows), "
+             "(SELECT MAX(showdate) FROM ww_shows), "
+             "(SELECT COUNT(*) FROM ww_shows), "
+             "(SELECT COUNT(*) FROM ww_showpnlmap), "
+             "(SELECT SUM(panelistscore) FROM ww_showpnlmap), "
+             "(SELECT COUNT(*) FROM ww_showguestmap), "
+             "(SELECT MAX(guestid) FROM ww_guests), "
+             "(SELECT MAX(hostid) FROM ww_hosts), "
+             "(SELECT MAX(panelistid) FROM ww_panelists), "
+             "(SELECT MAX(scorekeeperid) FROM ww_scorekeepers), "
+             "(SELECT MAX(locationid) FROM ww_locations);")
+    cursor.execute(query)
+    result = cursor.fetchone()
+    cursor.close()
+    return result
+
+class DataVersion:
+    """Version token for the data in the database, re-checked with a
+    single aggregate query at most once every check interval per
+    worker.
+
+    The last modified time is the time the token was first seen or last
+    changed, since the database does not record when it was last
+    updated. It is never earlier than the change that it stands for and
+    never in the future, at the cost of differing slightly between
+    workers."""
+
+    def __init__(self, check_interval: float = 60):
+        self.check_interval = check_interval
+        self.token = None
+        self.last_modified = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def configure(self, check_interval: float = 60):
+        """Update the check interval and force a check on the next
+        request"""
+        self.check_interval = check_interval
+        self._checked_at = 0
+
+    def current(self, database_connection: mysql.connector.connect) -> str:
+        """Return the current version token, querying the database if
+        the token has not been checked within the check interval. If the
+        query fails, the last known token is returned, which is None if
+        the version has never been retrieved."""
+        if (self.token
+                and time.monotonic() - self._checked_at < self.check_interval):
+            return self.token
+
+        with self._lock:
+            if (self.token
+                    and time.monotonic() - self._checked_at < self.check_interval):
+                return self.token
+
+            try:
+                watermark = with_reconnect(_retrieve_watermark,
+                                           database_connection)
+            except DatabaseError:
+                return self.token
+
+            digest = hashlib.blake2b(repr(watermark).encode("utf-8"),
+                                     digest_size=8)
+            token = digest.hexdigest()
+            if token != self.token:
+                self.token = token
+                self.last_modified = http_date(
+                    datetime.datetime.now(datetime.timezone.utc))
+            self._checked_at = time.monotonic()
+
+        return self.token
+
+data_version = DataVersion()
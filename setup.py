@@ -30,6 +30,7 @@ setup(name="api_wwdtm",
           "Flask",
           "mysql-connector-python",
           "numpy",
+          "orjson",
           "python-dateutil",
           "python-slugify",
           "uWSGI",
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Fake database connections and connection pools shared by the
+tests"""
+
+import pytest
+
+class FakeCursor:
+    """Cursor that returns the canned rows for the table queried"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._rows = []
+
+    def execute(self, query, params=()):
+        self._connection.queries.append((query, params))
+        for table, rows in self._connection.rows.items():
+            if table in query:
+                self._rows = rows
+                return
+        raise AssertionError("Unexpected query: {}".format(query))
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """Connection that records the queries sent and answers them with
+    canned rows, keyed by a part of the query such as the table name"""
+
+    def __init__(self, rows: dict = None):
+        self.rows = rows or {}
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+class FakePool:
+    """Connection pool that hands out the same fake connection"""
+
+    def __init__(self, connection: FakeConnection):
+        self._connection = connection
+
+    def get_connection(self):
+        return self._connection
+
+    def close_idle(self):
+        pass
+
+@pytest.fixture(name="connection")
+def fixture_connection():
+    """Fake connection without canned rows"""
+    return FakeConnection()
+
+@pytest.fixture(name="pool")
+def fixture_pool(connection):
+    """Fake connection pool handing out the connection fixture"""
+    return FakePool(connection)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for retrieving batches of items by ID"""
+
+import pytest
+
+from resources import batch
+
+def test_set_based_queries_are_used_for_batches(monkeypatch):
+    """Without a snapshot, the items of a collection are retrieved with
+    set-based queries instead of one lookup per ID"""
+    requested = []
+
+    def retrieve_by_ids(collection, ids, database_connection):
+        requested.append((collection, ids))
+        return [{"id": item_id} for item_id in ids if item_id != 2]
+
+    def retrieve_by_id(item_id, database_connection):
+        raise AssertionError("An item was retrieved by ID")
+
+    monkeypatch.setattr(batch.dataset, "current", lambda connection: None)
+    monkeypatch.setattr(batch.bulk_queries, "supports", lambda collection: True)
+    monkeypatch.setattr(batch.bulk_queries, "retrieve_by_ids", retrieve_by_ids)
+    monkeypatch.setitem(batch.BATCH_COLLECTIONS, "guests",
+                        ("guest_details", retrieve_by_id))
+
+    items = batch.retrieve_by_ids("guests", (3, 2, 1), None)
+    assert items == [{"id": 3}, {"id": 1}]
+    assert requested == [("guest_details", (3, 2, 1))]
+
+def test_items_by_id_skip_missing_ids(monkeypatch):
+    """Without a snapshot or set-based queries, items are retrieved by
+    ID and IDs that do not exist are skipped"""
+    monkeypatch.setattr(batch.dataset, "current", lambda connection: None)
+    monkeypatch.setattr(batch.bulk_queries, "supports", lambda collection: False)
+    monkeypatch.setitem(batch.BATCH_COLLECTIONS, "guests",
+                        ("guest_details",
+                         lambda item_id, connection: ({"id": item_id}
+                                                      if item_id != 2
+                                                      else None)))
+
+    assert batch.retrieve_by_ids("guests", (3, 2, 1), None) == [{"id": 3},
+                                                                {"id": 1}]
+
+def test_ids_are_validated():
+    """ID lists keep the order requested without duplicates, and
+    invalid ID lists are rejected"""
+    assert batch.parse_ids("3,1,3") == (3, 1)
+    assert batch.parse_batch({"guests": [2, 1]}) == {"guests": (2, 1)}
+    too_many = ",".join(str(item_id) for item_id in range(1, 102))
+    for value in ("", "1,a", "0", too_many):
+        with pytest.raises(ValueError):
+            batch.parse_ids(value)
+    for request_dict in ({}, [], {"unknown": [1]}, {"guests": 1},
+                         {"guests": [True]}):
+        with pytest.raises(ValueError):
+            batch.parse_batch(request_dict)
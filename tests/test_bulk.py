@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the set-based details queries, run against a fake
+database connection that returns canned rows for each table"""
+
+import datetime
+
+import pytest
+
+from resources import bulk
+
+SHOW_DATE = datetime.date(2018, 10, 27)
+
+# Rows returned for queries on each table, in the order that the
+# queries request them
+ROWS = {
+    "FROM ww_shows s LEFT JOIN ww_shows o": [(1, SHOW_DATE, 0, None, None)],
+    "FROM ww_shows s LEFT JOIN ww_showlocationmap": [
+        (1, 1, "Chicago", "IL", "Studebaker Theater", "studebaker",
+         "Description", None)
+    ],
+    "FROM ww_showhostmap": [(1, 1, "Peter Sagal", "peter-sagal", 0),
+                            (1, 2, "Guest Host", "guest-host", 1)],
+    "FROM ww_showskmap": [(1, 1, "Bill Kurtis", "bill-kurtis", 0, None),
+                          (1, 2, "Guest Scorekeeper", None, 1, None)],
+    "FROM ww_showpnlmap": [(1, 30, "Paula Poundstone", "paula-poundstone",
+                            2, 4, 10, "1")],
+    "FROM ww_showbluffmap": [],
+    "FROM ww_showguestmap": [(1, 5, "Guest", "guest", 3, 0)],
+    "FROM ww_guests": [(5, "Guest", None)]
+}
+
+@pytest.fixture(name="connection")
+def fixture_connection(connection):
+    """Fake connection answering queries with the canned rows"""
+    connection.rows = ROWS
+    return connection
+
+def test_show_details_use_first_host_and_scorekeeper(connection):
+    """A show with several hosts and scorekeepers is returned once,
+    with the first of each"""
+    shows = bulk.retrieve_show_details((1,), connection)
+    assert len(shows) == 1
+    assert shows[0]["host"] == {"id": 1, "name": "Peter Sagal",
+                                "slug": "peter-sagal", "guest": False}
+    assert shows[0]["scorekeeper"]["id"] == 1
+    assert shows[0]["location"]["city"] == "Chicago"
+    assert shows[0]["bluff"] == {}
+    assert [guest["id"] for guest in shows[0]["guests"]] == [5]
+
+def test_info_records_are_filtered_by_id(connection):
+    """Info records for requested IDs are queried by ID rather than
+    retrieved for the whole collection"""
+    def retrieve_all(database_connection):
+        raise AssertionError("The whole collection was retrieved")
+
+    guests = bulk._info_records("guest", retrieve_all, (5, 7), connection)
+    assert guests == [{"id": 5, "name": "Guest", "slug": "guest"}]
+    assert connection.queries == [("SELECT guestid, guest, guestslug FROM "
+                                   "ww_guests WHERE guestid IN (%s, %s);",
+                                   (5, 7))]
+
+def _use_collection(monkeypatch, retrieve_all, retrieve_bulk):
+    """Replace the collections with a single guest details collection"""
+    monkeypatch.setattr(bulk, "BULK_COLLECTIONS",
+                        {"guest_details": (retrieve_all, retrieve_bulk)})
+    monkeypatch.setattr(bulk, "BULK_FUNCTIONS",
+                        {retrieve_all: "guest_details"})
+
+def test_differing_collections_fail_verification(monkeypatch, connection, pool):
+    """Collections whose encoded records differ from wwdtm, here only
+    in the order of their keys, are reported, and stop the application
+    from starting if verification is turned on"""
+    def retrieve_all(database_connection):
+        return [{"id": 5, "name": "Guest", "slug": "guest",
+                 "appearances": []}]
+
+    def retrieve_bulk(ids, database_connection):
+        return [{"id": 5, "slug": "guest", "name": "Guest",
+                 "appearances": []}]
+
+    _use_collection(monkeypatch, retrieve_all, retrieve_bulk)
+    assert bulk.verify_collection("guest_details", connection) == [5]
+    assert bulk.verify_collections(pool) == {"guest_details": [5]}
+
+    queries = bulk.BulkQueries()
+    queries.configure(enabled=True, verify=True)
+    with pytest.raises(RuntimeError, match="guest_details: 1 records"):
+        queries.check_collections(pool)
+
+def test_matching_collections_pass_verification(monkeypatch, pool):
+    """Collections whose records match wwdtm are not reported"""
+    records = [{"id": 5, "name": "Guest", "slug": "guest", "appearances": []}]
+
+    def retrieve_all(database_connection):
+        return records
+
+    def retrieve_bulk(ids, database_connection):
+        return records
+
+    _use_collection(monkeypatch, retrieve_all, retrieve_bulk)
+    assert bulk.verify_collections(pool) == {}
+
+    queries = bulk.BulkQueries()
+    queries.configure(enabled=True, verify=True)
+    queries.check_collections(pool)
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_set_based_queries_are_used_without_verification(monkeypatch, pool,
+                                                        enabled):
+    """With the default configuration, nothing is verified at startup
+    and every collection is retrieved with set-based queries unless
+    they are turned off"""
+    def retrieve_all(database_connection):
+        raise AssertionError("A collection was verified at startup")
+
+    _use_collection(monkeypatch, retrieve_all, retrieve_all)
+    queries = bulk.BulkQueries()
+    queries.configure(**{**bulk.DEFAULT_BULK_CONFIG, "enabled": enabled})
+    queries.check_collections(pool)
+    assert queries.supports("guest_details") is enabled
+    assert (queries.retriever(retrieve_all) is retrieve_all) is not enabled
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the response cache backends"""
+
+import pytest
+
+from resources.cache import ResponseCache
+from resources.cache_backends import MemoryBackend, create_backend
+
+fakeredis = pytest.importorskip("fakeredis")
+redis = pytest.importorskip("redis")
+
+class FailingRedis:
+    """Redis client whose commands all fail as if the server were
+    unavailable"""
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise redis.ConnectionError("Connection refused")
+        return command
+
+def test_memory_backend_evicts_least_recently_used():
+    """The memory backend stays within its maximum size"""
+    backend = MemoryBackend(max_size=20)
+    backend.set("a", b"12345678", 60)
+    backend.set("b", b"12345678", 60)
+    assert backend.get("a") == b"12345678"
+    backend.set("c", b"12345678", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"12345678"
+
+def test_redis_client_is_injected():
+    """create_backend uses the Redis client passed to it"""
+    client = fakeredis.FakeRedis()
+    client.set("other:key", b"kept")
+    backend = create_backend("redis", key_prefix="api_wwdtm:",
+                             redis_client=client)
+
+    backend.set("key", b"value", 60)
+    assert client.get("api_wwdtm:key") == b"value"
+    assert 0 < client.pttl("api_wwdtm:key") <= 60000
+    assert backend.get("key") == b"value"
+
+    backend.clear()
+    assert backend.get("key") is None
+    assert client.get("other:key") == b"kept"
+
+def test_response_cache_with_redis_client():
+    """The response cache stores entries in an injected Redis client"""
+    cache = ResponseCache()
+    cache.configure(ttl=60, backend="redis", redis_client=fakeredis.FakeRedis())
+    cache.set("key", b'{"status":"success"}', 200,
+              [("Content-Type", "application/json")])
+    body, status, headers = cache.get("key")
+    assert body == b'{"status":"success"}'
+    assert status == 200
+    assert [tuple(header) for header in headers] == [("Content-Type",
+                                                      "application/json")]
+
+def test_redis_errors_are_cache_misses():
+    """Redis errors in get, set and clear do not fail the request"""
+    backend = create_backend("redis", redis_client=FailingRedis())
+    assert backend.get("key") is None
+    backend.set("key", b"value", 60)
+    backend.clear()
+
+def test_memory_backend_expires_entries():
+    """Expired entries are misses and are removed"""
+    backend = MemoryBackend()
+    backend.set("key", b"value", -1)
+    assert backend.get("key") is None
+    assert backend.stats()["entries"] == 0
+
+def test_unknown_backend_is_rejected():
+    """create_backend raises ValueError for unknown backend names"""
+    assert isinstance(create_backend("memory"), MemoryBackend)
+    with pytest.raises(ValueError):
+        create_backend("memcached")
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for conditional GET requests"""
+
+from flask import Flask
+
+from resources.conditional import compute_etag, not_modified
+
+HEADERS = [("Content-Type", "application/json"),
+           ("Content-Length", "20"),
+           ("ETag", '"v1-abc"'),
+           ("Vary", "Accept-Encoding")]
+
+def test_not_modified_has_no_content_type():
+    """A 304 response carries the validators and Vary header of the
+    cached response, without a Content-Type or Content-Length"""
+    app = Flask(__name__)
+    with app.test_request_context("/", headers={"If-None-Match": '"v1-abc"'}):
+        response = not_modified(HEADERS)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"v1-abc"'
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Type" not in response.headers
+    assert "Content-Length" not in response.headers
+
+def test_modified_returns_none():
+    """Requests whose validators do not match get the full response"""
+    app = Flask(__name__)
+    with app.test_request_context("/", headers={"If-None-Match": '"v0-abc"'}):
+        assert not_modified(HEADERS) is None
+
+def test_etag_is_derived_from_version_and_body():
+    """ETags are quoted and start with the data version, and are equal
+    for equal bodies of the same version"""
+    etag = compute_etag("v1", b'{"status":"success"}')
+    assert etag.startswith('"v1-') and etag.endswith('"')
+    assert etag == compute_etag("v1", b'{"status":"success"}')
+    assert etag != compute_etag("v2", b'{"status":"success"}')
+    assert etag != compute_etag("v1", b'{"status":"fail"}')
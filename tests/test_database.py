@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the connection pool, run with fake MySQL connections"""
+
+import threading
+
+import pytest
+from mysql.connector import errors
+
+from resources import database
+
+class FakeMySQLConnection:
+    """MySQL connection that records how it was cleaned up"""
+
+    def __init__(self):
+        self.unread_result = False
+        self.in_transaction = False
+        self.consume_error = None
+        self.consumed = False
+        self.rolled_back = False
+        self.disconnected = False
+
+    def consume_results(self):
+        if self.consume_error:
+            raise self.consume_error
+        self.consumed = True
+        self.unread_result = False
+
+    def rollback(self):
+        self.rolled_back = True
+        self.in_transaction = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+@pytest.fixture(name="opened")
+def fixture_opened(monkeypatch):
+    """List of the fake connections opened by pools"""
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(FakeMySQLConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(database.mysql.connector, "connect", connect)
+    return opened
+
+def test_overflow_connections_are_closed_when_returned(opened):
+    """Connections beyond the pool size are opened up to the overflow
+    allowance, and closed rather than kept when returned"""
+    pool = database.ConnectionPool(pool_size=1, max_overflow=1, timeout=0.01)
+    first = pool.get_connection()
+    second = pool.get_connection()
+    with pytest.raises(errors.PoolError):
+        pool.get_connection()
+
+    first.close()
+    second.close()
+    assert len(opened) == 2
+    assert [connection.disconnected for connection in opened] == [False, True]
+
+    pool.get_connection()
+    assert len(opened) == 2
+
+def test_checkout_waits_for_returned_connection(opened):
+    """A checkout waits up to the timeout for a connection to be
+    returned, and fails if none is"""
+    pool = database.ConnectionPool(pool_size=1, timeout=0.01)
+    connection = pool.get_connection()
+    with pytest.raises(errors.PoolError):
+        pool.get_connection()
+
+    pool = database.ConnectionPool(pool_size=1, timeout=5)
+    connection = pool.get_connection()
+    timer = threading.Timer(0.05, connection.close)
+    timer.start()
+    pool.get_connection()
+    timer.join()
+    assert len(opened) == 2
+
+def test_returned_connections_are_cleaned_up(opened):
+    """Unread results are read and open transactions rolled back before
+    a connection is returned to the pool"""
+    pool = database.ConnectionPool(pool_size=1)
+    pool.get_connection().close()
+    opened[0].unread_result = True
+    opened[0].in_transaction = True
+
+    pool.get_connection().close()
+    assert opened[0].consumed and opened[0].rolled_back
+    assert not opened[0].disconnected
+    pool.get_connection()
+    assert len(opened) == 1
+
+def test_broken_connections_are_discarded(opened):
+    """A connection whose unread result cannot be read is disconnected
+    instead of being returned, freeing its place in the pool"""
+    pool = database.ConnectionPool(pool_size=1, timeout=0.01)
+    connection = pool.get_connection()
+    opened[0].unread_result = True
+    opened[0].consume_error = errors.InternalError("Unread result found")
+
+    connection.close()
+    assert opened[0].disconnected
+    pool.get_connection()
+    assert len(opened) == 2
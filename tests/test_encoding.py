@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests that the JSON providers produce the same bytes as
+flask.jsonify for every collection shape served by the API"""
+
+import datetime
+import decimal
+import math
+
+import pytest
+from flask import Flask, jsonify
+
+from resources.dicts import error_dict, fail_dict, success_dict
+from resources.encoding import (JSONEncoder, OrjsonJSONProvider,
+                                StdlibJSONProvider, orjson)
+
+PROVIDERS = [StdlibJSONProvider]
+if orjson:
+    PROVIDERS.append(OrjsonJSONProvider)
+
+LOCATION = {"id": 1, "city": "Chicago", "state": "IL",
+            "venue": "Studebaker Theater",
+            "slug": "studebaker-theater-chicago-il"}
+
+SHOW_DETAILS = {
+    "id": 1083, "date": "2018-10-27", "best_of": False, "repeat_show": False,
+    "original_show_id": None, "original_show_date": None,
+    "location": LOCATION,
+    "description": "Guest Björn Ulvaeus, with panelists “Paula Poundstone”",
+    "notes": None,
+    "host": {"id": 1, "name": "Peter Sagal", "slug": "peter-sagal",
+             "guest": False},
+    "scorekeeper": {"id": 1, "name": "Bill Kurtis", "slug": "bill-kurtis",
+                    "guest": False, "description": None},
+    "panelists": [{"id": 30, "name": "Paula Poundstone",
+                   "slug": "paula-poundstone", "lightning_round_start": 2,
+                   "lightning_round_correct": 4, "score": 10, "rank": "1t"}],
+    "bluff": {"chosen_panelist": {"id": 30, "name": "Paula Poundstone"},
+              "correct_panelist": None},
+    "guests": [{"id": 1, "name": "Guest \U0001f3a4", "slug": "guest",
+                "score": 3, "score_exception": False}]
+}
+
+PANELIST_DETAILS = {
+    "id": 30, "name": "Paula Poundstone", "slug": "paula-poundstone",
+    "gender": "F",
+    "statistics": {
+        "scoring": {"minimum": 0, "maximum": 20, "mean": 9.4321,
+                    "median": 9.5, "standard_deviation": 4.123456789012345,
+                    "total": 8012},
+        "ranking": {"first": 120, "first_tied": 20, "second": 80,
+                    "second_tied": 30, "third": 100}
+    },
+    "appearances": [{"show_id": 1083, "date": "2018-10-27", "best_of": False,
+                     "repeat_show": False, "lightning_round_start": 2,
+                     "lightning_round_correct": 4, "score": 10, "rank": "1t"}]
+}
+
+SHAPES = {
+    "guests": [{"id": 1, "name": "Björn", "slug": "bjorn"}],
+    "guest_details": {"id": 1, "name": "Björn", "slug": "bjorn",
+                      "appearances": [{"show_id": 1, "date": "1998-01-03",
+                                       "best_of": False, "repeat_show": False,
+                                       "score": 2, "score_exception": True}]},
+    "hosts": [{"id": 1, "name": "Peter Sagal", "slug": "peter-sagal",
+               "gender": "M"}],
+    "host_details": {"id": 1, "name": "Peter Sagal", "appearances": []},
+    "locations": [LOCATION],
+    "location_recordings": {"id": 1, "recordings": [{"show_id": 1,
+                                                     "date": "1998-01-03",
+                                                     "best_of": False,
+                                                     "repeat_show": True}]},
+    "panelists": [{"id": 30, "name": "Paula Poundstone",
+                   "slug": "paula-poundstone", "gender": "F"}],
+    "panelist_details": PANELIST_DETAILS,
+    "panelist_scores": {"shows": ["2018-10-27", "2018-11-03"],
+                        "scores": [10, 4.5]},
+    "panelist_ordered_pairs": [["2018-10-27", 10], ["2018-11-03", 4.5]],
+    "scorekeepers": [{"id": 1, "name": "Bill Kurtis", "slug": "bill-kurtis",
+                      "gender": "M"}],
+    "shows": [{"id": 1083, "date": "2018-10-27", "best_of": False,
+               "repeat_show": False}],
+    "show_details": [SHOW_DETAILS],
+    "shows_by_year": {"2018": [1083], "2019": []},
+    "version": {"api": "1.5.0", "wwdtm": "1.0"},
+    "native_types": {"date": datetime.date(2018, 10, 27),
+                     "datetime": datetime.datetime(2018, 10, 27, 10, 0, 0),
+                     "decimal": decimal.Decimal("10.50"),
+                     "tuple": (1, "2", 3.0), "big_int": 2 ** 70,
+                     "int_keys": {1: "one", 2: "two"},
+                     "floats": [0.1, 0.0001, 1e15, -2.5, 1e300]},
+    "exponent_floats": {"large": 1e16, "larger": 1.2345678901234568e17,
+                        "small": 1e-7, "smaller": 1e-5, "tiny": 5e-324,
+                        "negative": -2.5e-10, "string": "2e3"},
+    "escapes": {"quote": "\"", "slash": "\\", "control": "\x00\x1f\x7f",
+                "html": "<script>&</script>", "line": "\u2028",
+                "runs": "\u00c5a\u00c5\U0001f3a4b\u00e9\u00e9"}
+}
+
+@pytest.fixture(name="app")
+def fixture_app():
+    """Return a Flask application configured as in api.py"""
+    app = Flask(__name__)
+    app.config["JSON_SORT_KEYS"] = False
+    app.config["JSONIFY_PRETTYPRINT_REGULAR"] = False
+    app.json_encoder = JSONEncoder
+    return app
+
+def _envelopes(app: Flask) -> list:
+    """Return each collection shape in each response envelope"""
+    with app.test_request_context("/"):
+        envelopes = [success_dict(name, shape) for name, shape in SHAPES.items()]
+        envelopes.append(fail_dict("show", "Show ID 1 not found"))
+        envelopes.append(error_dict("Database error occurred"))
+    return envelopes
+
+def _jsonify(app: Flask, obj) -> bytes:
+    """Return the body flask.jsonify produces for an object"""
+    with app.app_context():
+        return jsonify(obj).get_data()
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_collection_shapes_match_jsonify(app, provider):
+    """Every collection shape is encoded byte for byte as jsonify does"""
+    for envelope in _envelopes(app):
+        assert provider().dumps(envelope) + b"\n" == _jsonify(app, envelope)
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_exponent_floats_match_jsonify(app, provider):
+    """Floats that orjson would write without repr's exponent format
+    are encoded as jsonify does"""
+    for value in SHAPES["exponent_floats"].values():
+        assert provider().dumps([value]) + b"\n" == _jsonify(app, [value])
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_non_finite_floats_are_null(provider):
+    """NaN and infinite floats are encoded as null, not as the invalid
+    JSON that jsonify produces"""
+    obj = {"mean": math.nan, "values": (math.inf, -math.inf, 1.5),
+           "nested": [{"median": math.nan}]}
+    assert (provider().dumps(obj)
+            == b'{"mean":null,"values":[null,null,1.5],'
+               b'"nested":[{"median":null}]}')
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the synthetic benchmark dataset generator, and that the
+dataset has the tables and columns that the API's own queries use, by
+loading it into SQLite and running the queries against it"""
+
+import collections
+import datetime
+import importlib.util
+import os
+import re
+import sqlite3
+
+import pytest
+
+from resources import bulk, indexes, statistics, version
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                           "benchmarks", "generate_dataset.py")
+
+def _load_generator():
+    """Import the dataset generator script"""
+    spec = importlib.util.spec_from_file_location("generate_dataset",
+                                                  SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class SQLiteCursor:
+    """Cursor that runs queries written for mysql.connector"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?"), params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    """Connection to an in-memory SQLite database holding the dataset"""
+
+    def __init__(self, script: str):
+        # MySQL index definitions and multi-table DROP statements are not
+        # supported by SQLite, and are not needed by the queries
+        script = re.sub(r"DROP TABLE IF EXISTS [^;]*;", "", script)
+        script = re.sub(r",\s*KEY \(\w+\)", "", script)
+        self._connection = sqlite3.connect(":memory:",
+                                           detect_types=sqlite3.PARSE_DECLTYPES)
+        self._connection.executescript(script)
+
+    def cursor(self):
+        return SQLiteCursor(self._connection.cursor())
+
+@pytest.fixture(name="connection")
+def fixture_connection(monkeypatch):
+    """Connection to a small synthetic dataset"""
+    generator = _load_generator()
+    tables = generator.generate(shows=120, panelists=12, guests=60,
+                                locations=10, seed=1998,
+                                end_date=datetime.date(2021, 6, 30))
+    monkeypatch.setattr(bulk, "score_statistics",
+                        statistics.ScoreStatisticsCache())
+    monkeypatch.setattr(statistics.data_version, "current",
+                        lambda database_connection: "v1")
+    return SQLiteConnection(generator.sql_script(tables))
+
+def test_last_show_is_on_saturday_before_end_date(connection):
+    """Shows are weekly, ending on the last Saturday on or before the
+    end date"""
+    show_dates = [row[0] for row in indexes._retrieve_show_dates(connection)]
+    assert max(show_dates) == datetime.date(2021, 6, 26)
+    assert len(show_dates) == 120
+
+def test_api_queries_run_against_dataset(connection):
+    """The set-based details queries, statistics, lookup indexes and
+    data version queries find every table and column they use"""
+    ids = (1, 2, 3)
+    for retrieve in (bulk.retrieve_guest_details,
+                     bulk.retrieve_host_details,
+                     bulk.retrieve_location_recordings,
+                     bulk.retrieve_panelist_details,
+                     bulk.retrieve_scorekeeper_details,
+                     bulk.retrieve_show_details):
+        records = retrieve(ids, connection)
+        assert [record["id"] for record in records] == list(ids)
+
+    shows = bulk.retrieve_show_details(ids, connection)
+    assert all(len(show["panelists"]) == 3 for show in shows)
+    panelists = bulk.retrieve_panelist_details(ids, connection)
+    assert any(panelist["appearances"] for panelist in panelists)
+
+    assert statistics._retrieve_scores(connection)
+    assert indexes._retrieve_slugs(connection)
+    assert all(value is not None
+               for value in version._retrieve_watermark(connection))
+
+def test_same_seed_produces_same_dataset():
+    """The same seed and sizes always produce the same rows"""
+    generator = _load_generator()
+    sizes = {"shows": 60, "panelists": 12, "guests": 30, "locations": 5,
+             "end_date": datetime.date(2021, 6, 30)}
+    tables = generator.generate(seed=1998, **sizes)
+    assert tables == generator.generate(seed=1998, **sizes)
+    assert tables != generator.generate(seed=2021, **sizes)
+
+def test_shows_have_three_ranked_panelists():
+    """Every show has three panelists, ranked by score with ties marked
+    as in the real dataset"""
+    generator = _load_generator()
+    assert generator._ranks([10, 10, 4]) == ["1t", "1t", "3"]
+    assert generator._ranks([4, 9, 4]) == ["2t", "1", "2t"]
+
+    tables = generator.generate(shows=60, panelists=12, guests=30,
+                                locations=5, seed=1998,
+                                end_date=datetime.date(2021, 6, 30))
+    panelists = collections.Counter(row[1] for row in tables["ww_showpnlmap"])
+    assert len(panelists) == 60
+    assert set(panelists.values()) == {3}
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for resolving slugs and looking up shows by date with the
+dataset snapshot and the lookup indexes"""
+
+import datetime
+
+import pytest
+
+from resources import indexes, snapshot
+
+GUESTS = [{"id": 5, "name": "Björn", "slug": "bjorn"},
+          {"id": 7, "name": "Guest", "slug": None}]
+
+def _retrieve_by_id(guest_id, database_connection):
+    return {"id": guest_id}
+
+def test_slugs_are_resolved_with_snapshot(monkeypatch):
+    """With a snapshot loaded, slugs are resolved from its info records,
+    case-insensitively, without building the slug index"""
+    loaded = snapshot.Snapshot("v1", {
+        "guest_info": snapshot.Collection(GUESTS)
+    })
+
+    def current(database_connection):
+        raise AssertionError("The slug index was built")
+
+    monkeypatch.setattr(indexes.dataset, "current",
+                        lambda database_connection: loaded)
+    monkeypatch.setattr(indexes.lookup_indexes, "current", current)
+    assert indexes.from_slug("guest", _retrieve_by_id, "Bjorn", None) == {"id": 5}
+    assert indexes.from_slug("guest", _retrieve_by_id, "missing", None) is None
+
+def test_slugs_are_resolved_with_index_without_snapshot(monkeypatch):
+    """Without a snapshot, slugs are resolved with the slug index"""
+    monkeypatch.setattr(indexes.dataset, "current",
+                        lambda database_connection: None)
+    monkeypatch.setattr(indexes.data_version, "current",
+                        lambda database_connection: "v1")
+    monkeypatch.setattr(indexes, "lookup_indexes", indexes.LookupIndexes())
+    monkeypatch.setattr(indexes, "_retrieve_slugs",
+                        lambda database_connection: [("guest", 5, "bjorn")])
+    monkeypatch.setattr(indexes, "_retrieve_show_dates",
+                        lambda database_connection: [])
+    assert indexes.from_slug("guest", _retrieve_by_id, "BJORN", None) == {"id": 5}
+    assert indexes.from_slug("host", _retrieve_by_id, "bjorn", None) is None
+
+def test_show_dates_are_looked_up_in_snapshot(monkeypatch):
+    """With a snapshot loaded, shows are looked up by date in the
+    snapshot without building the date index, and invalid dates are
+    still rejected"""
+    show = {"id": 1083, "date": "2018-10-27"}
+    loaded = snapshot.Snapshot("v1", {
+        "show_info": snapshot.Collection([show], dated=True)
+    })
+
+    def current(database_connection):
+        raise AssertionError("The date index was built")
+
+    monkeypatch.setattr(snapshot.dataset, "current",
+                        lambda database_connection: loaded)
+    monkeypatch.setattr(indexes.lookup_indexes, "current", current)
+    by_year = snapshot.snapshot_retriever("show_info", "year", None)
+    by_date = snapshot.snapshot_retriever("show_info", "date_string", None)
+    assert indexes.from_show_date(by_year, 2018, None) == [show]
+    assert indexes.from_show_date(by_year, 2019, None) == []
+    assert indexes.from_show_date(by_date, "2018-10-27", None) == show
+    with pytest.raises(ValueError):
+        indexes.from_show_date(by_date, "2018-02-30", None)
+
+def test_show_dates_are_checked_with_index(monkeypatch):
+    """Shows are only retrieved for dates with shows, and invalid dates
+    are rejected"""
+    monkeypatch.setattr(indexes.data_version, "current",
+                        lambda database_connection: "v1")
+    monkeypatch.setattr(indexes, "lookup_indexes", indexes.LookupIndexes())
+    monkeypatch.setattr(indexes, "_retrieve_slugs",
+                        lambda database_connection: [])
+    monkeypatch.setattr(indexes, "_retrieve_show_dates",
+                        lambda database_connection: [(datetime.date(2018, 10, 27),)])
+
+    def retrieve(*args):
+        return "shows"
+
+    assert indexes.from_show_date(retrieve, 2018, None) == "shows"
+    assert indexes.from_show_date(retrieve, 2019, None) is None
+    assert indexes.from_show_date(retrieve, 2018, 10, None) == "shows"
+    assert indexes.from_show_date(retrieve, 2018, 11, None) is None
+    assert indexes.from_show_date(retrieve, "2018-10-27", None) == "shows"
+    assert indexes.from_show_date(retrieve, "2018-10-28", None) is None
+    with pytest.raises(ValueError):
+        indexes.from_show_date(retrieve, "2018-02-30", None)
+    with pytest.raises(ValueError):
+        indexes.from_show_date(retrieve, 2018, 13, None)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for writing and combining the metrics of workers"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from resources.metrics import MetricsRegistry, RequestMetrics
+
+def test_idle_worker_metrics_are_flushed(tmp_path):
+    """Metrics recorded after the last flush are written by the flush
+    thread without waiting for another request"""
+    registry = MetricsRegistry()
+    registry.configure(enabled=True, directory=str(tmp_path),
+                       flush_interval=0.05)
+    registry.record_request("/v1.0/shows", "GET", 200, 10, RequestMetrics())
+    registry.record_request("/v1.0/shows", "GET", 200, 10, RequestMetrics())
+
+    worker_file = tmp_path / "{}.json".format(os.getpid())
+    for _ in range(100):
+        time.sleep(0.05)
+        state = json.loads(worker_file.read_text())
+        if state["counters"] and state["counters"][0][2] == 2:
+            break
+    assert state["counters"][0][2] == 2
+
+def test_files_of_exited_workers_are_removed(tmp_path):
+    """Metrics files written by processes that no longer exist are
+    removed and not combined"""
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    dead_file = tmp_path / "{}.json".format(exited.pid)
+    live_file = tmp_path / "{}.json".format(os.getppid())
+    state = {"counters": [["wwdtm_api_requests_total", "", 3]],
+             "histograms": []}
+    dead_file.write_text(json.dumps(state))
+    live_file.write_text(json.dumps(state))
+
+    registry = MetricsRegistry()
+    registry.directory = str(tmp_path)
+    counters, _ = registry.collect()
+    assert counters[("wwdtm_api_requests_total", "")] == 3
+    assert not dead_file.exists()
+    assert live_file.exists()
+
+def test_metrics_of_workers_are_combined(tmp_path):
+    """Metrics written by other workers are added to the worker's own
+    metrics when collected"""
+    state = {"counters": [["wwdtm_api_requests_total",
+                           'route="/v1.0/shows",method="GET",status="200"',
+                           3]],
+             "histograms": [["wwdtm_api_database_queries",
+                             'route="/v1.0/shows"',
+                             [0, 1] + [0] * 9, 1.0, 1]]}
+    other_file = tmp_path / "{}.json".format(os.getppid())
+    other_file.write_text(json.dumps(state))
+
+    registry = MetricsRegistry()
+    registry.directory = str(tmp_path)
+    registry.record_request("/v1.0/shows", "GET", 200, 10, RequestMetrics())
+    counters, histograms = registry.collect()
+
+    assert counters[("wwdtm_api_requests_total",
+                     'route="/v1.0/shows",method="GET",status="200"')] == 4
+    buckets, total, count = histograms[("wwdtm_api_database_queries",
+                                        'route="/v1.0/shows"')]
+    assert buckets[:2] == [1, 1] and total == 1.0 and count == 2
+
+def test_exposition_has_cumulative_buckets():
+    """Histograms are exposed with cumulative buckets, a sum and a
+    count"""
+    registry = MetricsRegistry()
+    registry.observe("wwdtm_api_database_queries", 'route="/"', 1)
+    registry.observe("wwdtm_api_database_queries", 'route="/"', 7)
+    lines = registry.exposition().splitlines()
+
+    assert "# TYPE wwdtm_api_database_queries histogram" in lines
+    assert 'wwdtm_api_database_queries_bucket{route="/",le="1"} 1' in lines
+    assert 'wwdtm_api_database_queries_bucket{route="/",le="5"} 1' in lines
+    assert 'wwdtm_api_database_queries_bucket{route="/",le="10"} 2' in lines
+    assert 'wwdtm_api_database_queries_bucket{route="/",le="+Inf"} 2' in lines
+    assert 'wwdtm_api_database_queries_sum{route="/"} 8.0' in lines
+    assert 'wwdtm_api_database_queries_count{route="/"} 2' in lines
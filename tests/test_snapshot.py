@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for looking up records in the dataset snapshot and loading
+it in the background"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from resources import snapshot
+
+SHOWS = [{"id": 1082, "date": "2018-10-20"},
+         {"id": 1083, "date": "2018-10-27"},
+         {"id": 1084, "date": "2018-11-03"}]
+
+def test_previous_snapshot_is_served_while_loading(monkeypatch, pool):
+    """A data version change starts a background load, and requests
+    are answered from the previous snapshot, marked as stale, until it
+    completes"""
+    version = ["v1"]
+    loading = threading.Event()
+    loaded = threading.Event()
+
+    def load_snapshot(load_version, database_connection):
+        if load_version != "v1":
+            loading.wait(5)
+        return snapshot.Snapshot(load_version, {})
+
+    monkeypatch.setattr(snapshot, "load_snapshot", load_snapshot)
+    monkeypatch.setattr(snapshot.data_version, "current",
+                        lambda database_connection: version[0])
+
+    dataset = snapshot.Dataset()
+    dataset.configure(enabled=True, preload=True)
+    dataset.load_before_fork(pool)
+    assert dataset.current(None).version == "v1"
+
+    app = Flask(__name__)
+    version[0] = "v2"
+    original_load = dataset._load
+
+    def load(load_version):
+        original_load(load_version)
+        loaded.set()
+
+    monkeypatch.setattr(dataset, "_load", load)
+    with app.test_request_context("/"):
+        assert dataset.current(None).version == "v1"
+        assert snapshot.served_stale_snapshot()
+
+    loading.set()
+    assert loaded.wait(5)
+    with app.test_request_context("/"):
+        assert dataset.current(None).version == "v2"
+        assert not snapshot.served_stale_snapshot()
+
+def test_no_snapshot_until_loaded(monkeypatch, pool):
+    """Without a previous snapshot, requests are answered by wwdtm while
+    the snapshot loads in the background"""
+    loading = threading.Event()
+    monkeypatch.setattr(snapshot, "load_snapshot",
+                        lambda version, connection: loading.wait(5)
+                        and snapshot.Snapshot(version, {}))
+    monkeypatch.setattr(snapshot.data_version, "current",
+                        lambda database_connection: "v1")
+
+    dataset = snapshot.Dataset()
+    dataset.configure(enabled=True, preload=False)
+    dataset.load_before_fork(pool)
+    assert dataset.current(None) is None
+    loading.set()
+
+def test_records_are_looked_up_by_index():
+    """Records are looked up by ID and show date, and lookups that match
+    nothing return None or an empty list"""
+    loaded = snapshot.Snapshot("v1", {
+        "show_info": snapshot.Collection(SHOWS, dated=True)
+    })
+
+    assert loaded.lookup("show_info", "id", 1083) == SHOWS[1]
+    assert loaded.lookup("show_info", "id", 1085) is None
+    assert loaded.lookup("show_info", "all") == SHOWS
+    assert loaded.lookup("show_info", "year", 2018) == SHOWS
+    assert loaded.lookup("show_info", "year", 2019) == []
+    assert loaded.lookup("show_info", "year_month", (2018, 10)) == SHOWS[:2]
+    assert loaded.lookup("show_info", "date", (2018, 11, 3)) == SHOWS[2]
+    assert loaded.lookup("show_info", "date_string", "2018-10-27") == SHOWS[1]
+    with pytest.raises(ValueError):
+        loaded.lookup("show_info", "date_string", "2018-02-30")
+    with pytest.raises(ValueError):
+        loaded.lookup("show_info", "year_month", (2018, 13))
+
+def test_wwdtm_is_used_without_snapshot(monkeypatch):
+    """Without a snapshot, retrievers call the wwdtm function with the
+    same arguments"""
+    monkeypatch.setattr(snapshot.dataset, "current",
+                        lambda database_connection: None)
+
+    def retrieve_by_id(show_id, database_connection):
+        return {"id": show_id, "connection": database_connection}
+
+    retrieve = snapshot.snapshot_retriever("show_info", "id", retrieve_by_id)
+    assert retrieve(1083, "connection") == {"id": 1083,
+                                            "connection": "connection"}
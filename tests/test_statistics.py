@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the panelist score statistics computed with NumPy and the
+score lists and details records served from them"""
+
+import datetime
+
+from resources import bulk, statistics
+
+# Panelist ID, show date, score and rank, in no particular order
+ROWS = [
+    (30, datetime.date(2018, 10, 27), 10, "1"),
+    (30, datetime.date(2018, 10, 20), 4, "3"),
+    (30, datetime.date(2018, 11, 3), None, None),
+    (30, datetime.date(2018, 11, 10), 7, "1t"),
+    (14, datetime.date(2018, 10, 27), 3, "3")
+]
+
+def _use_rows(monkeypatch):
+    """Compute the cached statistics from the canned rows"""
+    cache = statistics.ScoreStatisticsCache()
+    monkeypatch.setattr(statistics, "score_statistics", cache)
+    monkeypatch.setattr(statistics, "_retrieve_scores",
+                        lambda database_connection: ROWS)
+    monkeypatch.setattr(statistics.data_version, "current",
+                        lambda database_connection: "v1")
+    return cache
+
+def test_statistics_exclude_appearances_without_scores():
+    """Scores and ranks are summarized per panelist, ignoring the
+    appearances without a score"""
+    score_statistics = statistics.ScoreStatistics(ROWS)
+    panelist = score_statistics.for_panelist(30)
+    assert panelist["scores"] == {"count": 3, "minimum": 4, "maximum": 10,
+                                  "total": 21, "mean": 7.0, "median": 7,
+                                  "standard_deviation": 2.4495}
+    assert panelist["ranks"] == {"1": 1, "1t": 1, "2": 0, "2t": 0, "3": 1}
+    assert statistics.ordered_pairs(score_statistics.series(30)) == [
+        ["2018-10-20", 4], ["2018-10-27", 10], ["2018-11-10", 7]
+    ]
+
+def test_score_lists_include_every_appearance():
+    """Score lists hold every appearance in date order, with None for
+    appearances without a score"""
+    score_statistics = statistics.ScoreStatistics(ROWS)
+    assert score_statistics.scores_list(30) == {
+        "shows": ["2018-10-20", "2018-10-27", "2018-11-03", "2018-11-10"],
+        "scores": [4, 10, None, 7]
+    }
+    assert score_statistics.scores_list(99) is None
+
+def test_ordered_pairs_include_appearances_without_scores(monkeypatch, connection):
+    """JSON ordered pairs hold every appearance, with None for the
+    appearance without a score, while the binary series only holds
+    scored appearances"""
+    _use_rows(monkeypatch)
+    monkeypatch.setattr(statistics.info, "retrieve_scores_ordered_pair_by_id",
+                        lambda panelist_id, database_connection: [])
+    pairs = statistics.retrieve_ordered_pairs_by_id(30, connection)
+    assert pairs == [["2018-10-20", 4], ["2018-10-27", 10],
+                     ["2018-11-03", None], ["2018-11-10", 7]]
+    assert statistics.retrieve_ordered_pairs_by_id(99, connection) == []
+
+    show_dates, scores = statistics.retrieve_series_by_id(30, connection)
+    assert scores.tolist() == [4.0, 10.0, 7.0]
+
+def test_score_lists_are_served_from_arrays(monkeypatch, connection):
+    """Score lists are retrieved from the score arrays, and with wwdtm
+    only for panelists without appearances"""
+    _use_rows(monkeypatch)
+
+    def retrieve_scores_list_by_id(panelist_id, database_connection):
+        assert panelist_id == 99
+        return {"shows": [], "scores": []}
+
+    monkeypatch.setattr(statistics.info, "retrieve_scores_list_by_id",
+                        retrieve_scores_list_by_id)
+    scores = statistics.retrieve_scores_list_by_id(14, connection)
+    assert scores == {"shows": ["2018-10-27"], "scores": [3]}
+    scores = statistics.retrieve_scores_list_by_id(99, connection)
+    assert scores == {"shows": [], "scores": []}
+
+def test_verify_scores_lists_reports_differences(monkeypatch, pool):
+    """Verification returns the IDs of the panelists whose score lists
+    or ordered pairs differ from wwdtm"""
+    _use_rows(monkeypatch)
+    expected = statistics.ScoreStatistics(ROWS)
+    monkeypatch.setattr(statistics.info, "retrieve_scores_list_by_id",
+                        lambda panelist_id, database_connection:
+                        expected.scores_list(panelist_id))
+    monkeypatch.setattr(statistics.info, "retrieve_scores_ordered_pair_by_id",
+                        lambda panelist_id, database_connection:
+                        [tuple(pair) for pair
+                         in expected.scores_ordered_pairs(panelist_id)])
+    assert statistics.verify_scores_lists(pool) == []
+
+    # wwdtm leaving out the appearance without a score
+    monkeypatch.setattr(statistics.info, "retrieve_scores_ordered_pair_by_id",
+                        lambda panelist_id, database_connection:
+                        [tuple(pair) for pair
+                         in expected.scores_ordered_pairs(panelist_id)
+                         if pair[1] is not None])
+    assert statistics.verify_scores_lists(pool) == [30]
+
+    monkeypatch.setattr(statistics.info, "retrieve_scores_list_by_id",
+                        lambda panelist_id, database_connection:
+                        {"shows": [], "scores": []})
+    assert statistics.verify_scores_lists(pool) == [14, 30]
+
+def test_details_by_id_use_set_based_queries(monkeypatch, connection):
+    """With set-based queries enabled, a details record requested by ID
+    is retrieved with the set-based queries"""
+    retrieve_by_id = bulk.wwdtm.panelist.details.retrieve_by_id
+    requested = []
+
+    def retrieve_bulk(ids, database_connection):
+        requested.append(ids)
+        return [{"id": item_id} for item_id in ids if item_id == 30]
+
+    monkeypatch.setitem(bulk.BULK_COLLECTIONS, "panelist_details",
+                        (bulk.wwdtm.panelist.details.retrieve_all,
+                         retrieve_bulk))
+    queries = bulk.BulkQueries()
+    queries.configure(enabled=True)
+    retriever = queries.retriever(retrieve_by_id)
+    assert retriever(30, connection) == {"id": 30}
+    assert retriever(99, connection) is None
+    assert requested == [(30,), (99,)]
+
+def test_statistics_are_recomputed_when_version_changes(monkeypatch):
+    """The statistics are computed once per data version"""
+    version = ["v1"]
+    retrieved = []
+
+    def retrieve_scores(database_connection):
+        retrieved.append(version[0])
+        return ROWS
+
+    monkeypatch.setattr(statistics, "_retrieve_scores", retrieve_scores)
+    monkeypatch.setattr(statistics.data_version, "current",
+                        lambda database_connection: version[0])
+    cache = statistics.ScoreStatisticsCache()
+    first = cache.current(None)
+    assert cache.current(None) is first
+
+    version[0] = "v2"
+    assert cache.current(None) is not first
+    assert retrieved == ["v1", "v2"]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018-2021 Linh Pham
+# api.wwdt.me is relased under the terms of the Apache License 2.0
+"""Tests for the data version token and its last modified time"""
+
+from mysql.connector.errors import DatabaseError
+
+from resources import version
+
+def test_last_modified_changes_with_token(monkeypatch):
+    """The last modified time is set when the token is first seen or
+    changes, and is kept while the token stays the same"""
+    watermark = [(1083, None, 1083)]
+    times = iter(["first", "second", "third"])
+    monkeypatch.setattr(version, "_retrieve_watermark",
+                        lambda database_connection: watermark[0])
+    monkeypatch.setattr(version, "http_date", lambda value: next(times))
+
+    data_version = version.DataVersion(check_interval=0)
+    token = data_version.current(None)
+    assert data_version.last_modified == "first"
+
+    assert data_version.current(None) == token
+    assert data_version.last_modified == "first"
+
+    watermark[0] = (1084, None, 1084)
+    assert data_version.current(None) != token
+    assert data_version.last_modified == "second"
+
+def test_token_changes_with_watermark(monkeypatch):
+    """The token only changes when the watermark changes, and the last
+    known token is kept if the watermark cannot be retrieved"""
+    watermark = [(1083, None, 1083)]
+
+    def retrieve_watermark(database_connection):
+        if watermark[0] is None:
+            raise DatabaseError("Database is unavailable")
+        return watermark[0]
+
+    monkeypatch.setattr(version, "_retrieve_watermark", retrieve_watermark)
+    data_version = version.DataVersion(check_interval=0)
+    token = data_version.current(None)
+    assert data_version.current(None) == token
+
+    watermark[0] = (1084, None, 1084)
+    changed = data_version.current(None)
+    assert changed != token
+
+    watermark[0] = None
+    assert data_version.current(None) == changed
+
+def test_token_is_checked_once_per_interval(monkeypatch):
+    """The watermark is only queried again once the check interval has
+    passed"""
+    queries = []
+    monkeypatch.setattr(version, "_retrieve_watermark",
+                        lambda database_connection: queries.append(1)
+                        or (len(queries), None, 1083))
+    data_version = version.DataVersion(check_interval=60)
+    token = data_version.current(None)
+    assert data_version.current(None) == token
+    assert len(queries) == 1